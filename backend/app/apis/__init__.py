@@ -6,6 +6,7 @@ from . import spotify_search
 
 # Queue and Song Management
 from . import songs
+from . import search
 
 # Configuration
 from . import supabase
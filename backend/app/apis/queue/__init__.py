@@ -0,0 +1,239 @@
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+import time
+import uuid
+from app.utils.queue_engine import QueueEntry, QueueLoadError, get_queue_engine
+from app.utils.queue_store import format_timestamp
+
+router = APIRouter(prefix="/queue")
+
+# Votes one user can put on a song: a plain up-vote, so no client can
+# outweigh the rest of the room on its own
+MAX_VOTES_PER_USER = 1
+
+# Models
+class QueueSong(BaseModel):
+    id: str
+    queue_id: str
+    title: str
+    artist: str
+    album: Optional[str] = None
+    cover_url: Optional[str] = None
+    duration_ms: int
+    added_by: Optional[str] = None
+    added_at: str
+    total_votes: int
+    rank_key: Optional[str] = None  # orders songs with equal votes
+    track_uri: Optional[str] = None  # Spotify URI for playback
+    position: Optional[int] = None  # 0 = playing next
+    wait_ms: Optional[int] = None  # time until the song starts
+    eta: Optional[str] = None
+
+class QueueResponse(BaseModel):
+    queue_id: str
+    length: int
+    ranking: str
+    total_duration_ms: int
+    songs: List[QueueSong]
+
+class SongPosition(BaseModel):
+    queue_id: str
+    song_id: str
+    position: int  # songs ahead of this one
+    length: int
+    wait_ms: int
+    eta: str
+
+class VoteRequest(BaseModel):
+    user_id: str
+    # 0 withdraws the vote
+    vote_count: int = Field(1, ge=0, le=MAX_VOTES_PER_USER)
+
+class RankingRequest(BaseModel):
+    mode: str  # "votes", "hot" or "fair"
+
+class RankingResponse(BaseModel):
+    queue_id: str
+    mode: str
+    hot: Optional[Dict[str, Any]] = None  # ranker counters in hot mode
+    fair: Optional[Dict[str, Any]] = None  # scheduler counters in fair mode
+
+class MoveRequest(BaseModel):
+    # Exactly one: the id of the song to place this one before or after
+    before: Optional[str] = None
+    after: Optional[str] = None
+
+def eta_from_wait(wait_ms: int) -> str:
+    return format_timestamp(time.time() + wait_ms / 1000)
+
+def queue_song(entry: QueueEntry, position: Optional[int] = None, wait_ms: Optional[int] = None) -> QueueSong:
+    song = entry.to_dict()
+    song["added_at"] = format_timestamp(entry.added_at)
+    eta = eta_from_wait(wait_ms) if wait_ms is not None else None
+    return QueueSong(**song, position=position, wait_ms=wait_ms, eta=eta)
+
+def validate_queue_id(queue_id: str) -> str:
+    try:
+        return str(uuid.UUID(queue_id))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid queue_id format - must be a valid UUID")
+
+def live_queue(queue_id: str):
+    """The live queue for a validated id; 503 if it can't be loaded yet"""
+    try:
+        return get_queue_engine().queue(validate_queue_id(queue_id))
+    except QueueLoadError as e:
+        raise e.to_http_exception()
+
+def require_profile(user_id: str) -> str:
+    """
+    The user's profile id; 400 unless it is a UUID, 404 unless the profile
+    exists. Song and vote rows reference profiles, so writes for unknown
+    users would fail in the background after the engine took them.
+    """
+    try:
+        user_id = str(uuid.UUID(user_id))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid user_id format - must be a valid UUID")
+    try:
+        exists = get_queue_engine().store.profile_exists(user_id)
+    except Exception as e:
+        print(f"Profile lookup for {user_id} failed: {str(e)}")
+        raise HTTPException(status_code=503, detail="Could not verify user profile, please retry")
+    if not exists:
+        raise HTTPException(status_code=404, detail=f"User {user_id} not found")
+    return user_id
+
+@router.get("/stats")
+def get_queue_engine_stats():
+    """Counters for the in-memory queue engine and its write-behind persister"""
+    return get_queue_engine().stats()
+
+@router.get("/{queue_id}", response_model=QueueResponse, response_model_exclude_none=True)
+def get_queue(
+    queue_id: str,
+    limit: int = Query(50, description="Number of songs to return from the front of the queue", ge=1, le=1000)
+):
+    """Unplayed songs in play order with the wait until each starts, straight from memory"""
+    live = live_queue(queue_id)
+    with live.lock:
+        scheduled = live.schedule(limit)
+        length = len(live)
+        total_duration_ms = live.total_duration_ms()
+    return QueueResponse(
+        queue_id=live.queue_id,
+        length=length,
+        ranking=live.ranking,
+        total_duration_ms=total_duration_ms,
+        songs=[queue_song(entry, position, wait_ms) for entry, position, wait_ms in scheduled]
+    )
+
+def ranking_response(live) -> RankingResponse:
+    return RankingResponse(
+        queue_id=live.queue_id,
+        mode=live.ranking,
+        hot=live.hot.stats() if live.hot is not None else None,
+        fair=live.fair.stats() if live.fair is not None else None
+    )
+
+@router.get("/{queue_id}/ranking", response_model=RankingResponse, response_model_exclude_none=True)
+def get_ranking(queue_id: str):
+    """How the queue is ordered"""
+    return ranking_response(live_queue(queue_id))
+
+@router.put("/{queue_id}/ranking", response_model=RankingResponse, response_model_exclude_none=True)
+def set_ranking(queue_id: str, request: RankingRequest):
+    """
+    Order the queue by total votes ("votes"), by vote momentum ("hot"),
+    where recent votes weigh more, or round-robin between the guests who
+    added songs ("fair"), weighted by votes. Saved in the queue's settings.
+    """
+    try:
+        live = get_queue_engine().set_ranking(live_queue(queue_id).queue_id, request.mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    print(f"Queue {live.queue_id}: ranking by {live.ranking}")
+    return ranking_response(live)
+
+@router.get("/{queue_id}/next", response_model=QueueSong, response_model_exclude_none=True)
+def get_next_song(queue_id: str):
+    """The song that plays next"""
+    live = live_queue(queue_id)
+    with live.lock:
+        entry = live.peek()
+        wait_ms = live.remaining_ms()
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Queue is empty")
+    return queue_song(entry, 0, wait_ms)
+
+@router.post("/{queue_id}/next", response_model=QueueSong, response_model_exclude_none=True)
+def play_next_song(queue_id: str):
+    """Take the next song off the queue and mark it played"""
+    entry = get_queue_engine().pop_next(live_queue(queue_id).queue_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Queue is empty")
+    print(f"Queue {entry.queue_id}: playing {entry.song_id} ({entry.title} by {entry.artist})")
+    return queue_song(entry, 0)
+
+@router.post("/{queue_id}/songs/{song_id}/vote", response_model=QueueSong, response_model_exclude_none=True)
+def vote_for_song(queue_id: str, song_id: str, request: VoteRequest):
+    """Set a user's vote on a queued song; the queue reorders immediately and the new position is returned"""
+    engine = get_queue_engine()
+    live = live_queue(queue_id)
+    user_id = require_profile(request.user_id)
+    try:
+        with live.lock:
+            entry = engine.vote(live.queue_id, song_id, user_id, request.vote_count)
+            position, wait_ms = live.position(song_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Song {song_id} is not in the queue")
+    return queue_song(entry, position, wait_ms)
+
+@router.post("/{queue_id}/songs/{song_id}/move", response_model=QueueSong, response_model_exclude_none=True)
+def move_song(queue_id: str, song_id: str, request: MoveRequest):
+    """
+    Place a song right before or after another one (DJ drag and drop).
+    Votes still come first, so this orders songs with equal votes. Only the
+    moved song's row is written.
+    """
+    engine = get_queue_engine()
+    live = live_queue(queue_id)
+    try:
+        with live.lock:
+            entry = engine.move(live.queue_id, song_id, before=request.before, after=request.after)
+            position, wait_ms = live.position(song_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=f"Song {e.args[0]} is not in the queue")
+    return queue_song(entry, position, wait_ms)
+
+@router.get("/{queue_id}/songs/{song_id}/position", response_model=SongPosition)
+def get_song_position(queue_id: str, song_id: str):
+    """How many songs are ahead of a queued song and when it is expected to start"""
+    live = live_queue(queue_id)
+    try:
+        with live.lock:
+            position, wait_ms = live.position(song_id)
+            length = len(live)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Song {song_id} is not in the queue")
+    return SongPosition(
+        queue_id=live.queue_id,
+        song_id=song_id,
+        position=position,
+        length=length,
+        wait_ms=wait_ms,
+        eta=eta_from_wait(wait_ms)
+    )
+
+@router.delete("/{queue_id}/songs/{song_id}", response_model=QueueSong, response_model_exclude_none=True)
+def remove_song(queue_id: str, song_id: str):
+    """Remove a song from the queue"""
+    live = live_queue(queue_id)
+    try:
+        entry = get_queue_engine().remove(live.queue_id, song_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Song {song_id} is not in the queue")
+    return queue_song(entry)
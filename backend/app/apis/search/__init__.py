@@ -0,0 +1,153 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import List, Optional, Set
+import asyncio
+import json
+import os
+import time
+
+from app.apis.songs import SongSearchResult, find_songs
+from app.apis.spotify_search import SpotifyTrack, search_tracks
+from app.utils.canonical import canonical_key
+
+router = APIRouter(prefix="/search")
+
+# How long a federated search waits for Spotify before answering without it
+DEFAULT_BUDGET_MS = int(os.environ.get("FEDERATED_SEARCH_BUDGET_MS", "300"))
+
+# Spotify searches that outlived their budget keep running to warm the cache
+_late_searches: Set[asyncio.Task] = set()
+
+# Models
+class FederatedResult(SongSearchResult):
+    source: str  # "local" or "spotify"
+    uri: Optional[str] = None  # Spotify URI of Spotify results
+
+class FederatedSearchResponse(BaseModel):
+    # Local matches first, then Spotify tracks that aren't the same recording as one of them
+    results: List[FederatedResult]
+    spotify_status: str  # "ok", "timeout" or "error"
+    spotify_error: Optional[str] = None
+    elapsed_ms: int
+
+def _recording_key(title: str, artists: List[str]) -> Optional[str]:
+    # Titles rather than ISRCs: local songs don't have one
+    return canonical_key(None, title, artists)
+
+def _local_result(song: SongSearchResult) -> FederatedResult:
+    return FederatedResult(**song.model_dump(), source="local")
+
+def _spotify_result(track: SpotifyTrack) -> FederatedResult:
+    return FederatedResult(
+        id=track.id,
+        title=track.name,
+        artist=", ".join(track.artists),
+        album=track.album,
+        cover_url=track.album_art or None,
+        duration_ms=track.duration_ms,
+        source="spotify",
+        uri=track.uri
+    )
+
+def _new_spotify_results(local: List[SongSearchResult], spotify: List[SpotifyTrack]) -> List[FederatedResult]:
+    """Spotify tracks that aren't a release of a recording already found locally"""
+    seen = {_recording_key(song.title, [song.artist]) for song in local}
+    seen.discard(None)
+    results = []
+    for track in spotify:
+        key = _recording_key(track.name, track.artists)
+        if key is None or key not in seen:
+            results.append(_spotify_result(track))
+            if key is not None:
+                seen.add(key)
+    return results
+
+async def _wait_for_spotify(task: asyncio.Task, deadline: float):
+    """
+    Wait for the Spotify search until the deadline.
+    Returns (tracks, status, error).
+    """
+    remaining = max(0.0, deadline - time.monotonic())
+    done, _ = await asyncio.wait({task}, timeout=remaining)
+
+    if not done:
+        _late_searches.add(task)
+        task.add_done_callback(_late_searches.discard)
+        return [], "timeout", None
+
+    try:
+        return task.result(), "ok", None
+    except HTTPException as he:
+        return [], "error", str(he.detail)
+    except Exception as e:
+        print(f"Spotify part of federated search failed: {str(e)}")
+        return [], "error", str(e)
+
+def _retrieve_exception(task: asyncio.Task) -> None:
+    # Late searches may fail after nobody is waiting for them any more
+    if not task.cancelled():
+        task.exception()
+
+@router.get("/federated", response_model=FederatedSearchResponse, response_model_exclude_none=True)
+async def federated_search(
+    query: str = Query(..., min_length=1, description="Search query for songs"),
+    limit: int = Query(10, description="Maximum number of results per source", ge=1, le=50),
+    budget_ms: int = Query(DEFAULT_BUDGET_MS, description="How long to wait for Spotify results, in milliseconds", ge=0, le=10000),
+    stream: bool = Query(False, description="Stream NDJSON: the local batch first, then the Spotify batch"),
+    queue_id: Optional[str] = Query(None, description="Queue the search is made from, used for fair rate limiting")
+):
+    """
+    Search the local catalog and Spotify together. Local matches are returned
+    right away; Spotify results are merged only if they arrive within budget_ms.
+    Spotify tracks that are another release of a local match (same canonical
+    title and artist) are dropped, so a song is listed once.
+    """
+    started = time.monotonic()
+    deadline = started + budget_ms / 1000.0
+
+    print(f"Federated search request: query='{query}', limit={limit}, budget_ms={budget_ms}, stream={stream}")
+
+    # Start Spotify first so it runs while the local catalog is searched
+    spotify_task = asyncio.ensure_future(search_tracks(query, limit, 0, queue_id))
+    spotify_task.add_done_callback(_retrieve_exception)
+
+    try:
+        local = await run_in_threadpool(find_songs, query, limit)
+    except Exception:
+        spotify_task.cancel()
+        raise
+
+    def elapsed_ms() -> int:
+        return int((time.monotonic() - started) * 1000)
+
+    if not stream:
+        spotify, status, error = await _wait_for_spotify(spotify_task, deadline)
+        return FederatedSearchResponse(
+            results=[_local_result(song) for song in local] + _new_spotify_results(local, spotify),
+            spotify_status=status,
+            spotify_error=error,
+            elapsed_ms=elapsed_ms()
+        )
+
+    async def ndjson_batches():
+        yield json.dumps({
+            "source": "local",
+            "results": jsonable_encoder([_local_result(song) for song in local], exclude_none=True),
+            "elapsed_ms": elapsed_ms()
+        }) + "\n"
+
+        spotify, status, error = await _wait_for_spotify(spotify_task, deadline)
+        batch = {
+            "source": "spotify",
+            "status": status,
+            "results": jsonable_encoder(_new_spotify_results(local, spotify), exclude_none=True),
+            "elapsed_ms": elapsed_ms()
+        }
+        if error:
+            batch["error"] = error
+        yield json.dumps(batch) + "\n"
+
+    return StreamingResponse(ndjson_batches(), media_type="application/x-ndjson")
@@ -1,11 +1,23 @@
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Optional, Tuple
 import json
 import re
 import os
 import logging
 import uuid
+import time
+import anyio
+from app.apis.queue import require_profile
+from app.utils.canonical import canonical_key, group_duplicates
+from app.utils.catalog_file import get_catalog_file
+from app.utils.query_log import get_query_log
+from app.utils.queue_engine import QueueEntry, QueueLoadError, get_queue_engine
+from app.utils.queue_store import format_timestamp
+from app.utils.song_index import SongIndex
+from app.utils.spotify_rate_limit import SpotifyRateLimitError
+from app.utils.track_catalog import get_track_catalog
+from app.utils.track_resolver import get_track_resolver
 
 # Set up debug logging
 logging.basicConfig(level=logging.DEBUG)
@@ -24,6 +36,15 @@ class SongSearchResult(BaseModel):
 
 class SongSearchResponse(BaseModel):
     results: List[SongSearchResult]
+    suggestion: Optional[str] = None  # "did you mean" query in fuzzy mode
+
+class QuerySuggestion(BaseModel):
+    query: str
+    score: float
+    source: str  # "queue" or "global"
+
+class SuggestResponse(BaseModel):
+    suggestions: List[QuerySuggestion]
 
 class AddSongRequest(BaseModel):
     queue_id: str
@@ -39,6 +60,12 @@ class SongResponse(BaseModel):
     cover_url: Optional[str] = None
     added_by: str
     created_at: str
+    track_uri: Optional[str] = None  # Spotify URI for playback
+    position: Optional[int] = None  # songs ahead in the queue
+    wait_ms: Optional[int] = None  # time until the song starts
+
+# Spotify track ids are 22 base-62 characters
+SPOTIFY_TRACK_ID = re.compile(r"[0-9A-Za-z]{22}")
 
 # Mock data - popular songs
 MOCK_SONGS = [
@@ -249,17 +276,111 @@ def sanitize_storage_key(key: str) -> str:
     """Sanitize storage key to only allow alphanumeric and ._- symbols"""
     return re.sub(r'[^a-zA-Z0-9._-]', '', key)
 
-@router.get("/search", response_model=SongSearchResponse)
-def search_songs(query: str = Query(..., min_length=1)):
-    """Search for songs by title or artist"""
-    query = query.lower()
-    results = []
+_song_index: Optional[SongIndex] = None
+
+def get_song_index() -> SongIndex:
+    """
+    Index of the memory-mapped catalog file when one has been built,
+    otherwise an index over MOCK_SONGS built on first use
+    """
+    catalog = get_catalog_file()
+    if catalog is not None:
+        return catalog.index
+    
+    global _song_index
+    if _song_index is None:
+        _song_index = SongIndex(MOCK_SONGS)
+        print(f"Built song index: {_song_index.stats()}")
+    return _song_index
+
+def song_from_catalog(track: dict) -> SongSearchResult:
+    """Convert a track catalog row (Spotify track fields) to a search result"""
+    return SongSearchResult(
+        id=track["id"],
+        title=track["name"],
+        artist=", ".join(track.get("artists") or []),
+        album=track.get("album"),
+        cover_url=track.get("album_art"),
+        duration_ms=track.get("duration_ms")
+    )
+
+def search_track_catalog(query: str, limit: int, exclude: List[SongSearchResult]) -> List[SongSearchResult]:
+    """Tracks previously seen from Spotify that match query, skipping ids already found"""
+    if limit <= 0:
+        return []
+    seen = {song.id for song in exclude}
+    try:
+        tracks = get_track_catalog().search(query, limit + len(seen))
+    except Exception as e:
+        print(f"Track catalog search failed for query='{query}': {str(e)}")
+        return []
+    return [song_from_catalog(track) for track in tracks if track["id"] not in seen][:limit]
+
+def collapse_songs(songs: List[SongSearchResult]) -> List[SongSearchResult]:
+    """Keep the best-ranked release of songs that are the same recording"""
+    return [
+        group[0]
+        for group in group_duplicates(songs, lambda song: canonical_key(None, song.title, [song.artist]))
+    ]
+
+def find_songs(query: str, limit: int = 20) -> List[SongSearchResult]:
+    """Search the local catalog by title, artist or album, best matches first"""
+    results = [SongSearchResult(**song) for song in get_song_index().search(query, limit)]
+    return collapse_songs(results + search_track_catalog(query, limit - len(results), results))
+
+def find_songs_fuzzy(query: str, limit: int = 20) -> Tuple[List[SongSearchResult], Optional[str]]:
+    """Typo-tolerant search; also returns a corrected query when one was used"""
+    songs, suggestion = get_song_index().fuzzy_search(query, limit)
+    results = [SongSearchResult(**song) for song in songs]
+    return collapse_songs(results + search_track_catalog(suggestion or query, limit - len(results), results)), suggestion
+
+@router.get("/search", response_model=SongSearchResponse, response_model_exclude_none=True)
+def search_songs(
+    query: str = Query(..., min_length=1),
+    limit: int = Query(20, description="Maximum number of results", ge=1, le=100),
+    fuzzy: bool = Query(False, description="Tolerate misspellings and suggest a corrected query"),
+    queue_id: Optional[str] = Query(None, description="Queue the search is made from, for per-queue suggestions")
+):
+    """Search for songs by title, artist or album"""
+    started = time.perf_counter()
+    if fuzzy:
+        results, suggestion = find_songs_fuzzy(query, limit)
+    else:
+        results, suggestion = find_songs(query, limit), None
+    
+    # Only searches that found something are worth suggesting to others
+    if results:
+        get_query_log().record(suggestion or query, queue_id)
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"Song search ({'fuzzy' if fuzzy else 'exact'}): query='{query}', results={len(results)}, {elapsed_ms:.2f}ms")
+    return SongSearchResponse(results=results, suggestion=suggestion)
+
+@router.get("/suggest", response_model=SuggestResponse)
+def suggest_queries(
+    prefix: str = Query("", description="What the user has typed so far"),
+    queue_id: Optional[str] = Query(None, description="Prefer queries popular in this queue"),
+    limit: int = Query(10, description="Maximum number of suggestions", ge=1, le=50)
+):
+    """Popular recent searches starting with prefix, answered from memory"""
+    return SuggestResponse(suggestions=get_query_log().suggest(prefix, queue_id, limit))
+
+@router.get("/track/{track_id}", response_model=SongSearchResult, response_model_exclude_none=True)
+def get_track(track_id: str):
+    """Look up a song by id in the local catalog without calling Spotify"""
+    catalog = get_catalog_file()
+    song = catalog.get(track_id) if catalog is not None else None
+    if song is not None:
+        return SongSearchResult(**song)
     
     for song in MOCK_SONGS:
-        if query in song["title"].lower() or query in song["artist"].lower():
-            results.append(SongSearchResult(**song))
+        if song["id"] == track_id:
+            return SongSearchResult(**song)
     
-    return SongSearchResponse(results=results)
+    track = get_track_catalog().get(track_id)
+    if track is None:
+        raise HTTPException(status_code=404, detail=f"Track {track_id} not found in the local catalog")
+    return song_from_catalog(track)
 
 @router.get("/test-schema")
 def test_schema():
@@ -730,43 +851,47 @@ def add_test_song_direct():
         traceback.print_exc()
         return {"error": f"Error adding test song: {str(e)}"}
 
+def spotify_uri(track_id: str) -> Optional[str]:
+    """The Spotify URI for a Spotify track id; mock and local ids have none"""
+    return f"spotify:track:{track_id}" if SPOTIFY_TRACK_ID.fullmatch(track_id) else None
+
+def resolve_song(song_id: str) -> Optional[dict]:
+    """
+    Metadata for a song id: mock songs and the catalog file first, then
+    Spotify through the batched track resolver. Called from sync handlers,
+    which run in worker threads, so the resolver runs on the event loop.
+    """
+    for song in MOCK_SONGS:
+        if song["id"] == song_id:
+            return song
+    
+    catalog = get_catalog_file()
+    song = catalog.get(song_id) if catalog is not None else None
+    if song is not None:
+        return song
+    
+    try:
+        track = anyio.from_thread.run(get_track_resolver().resolve, song_id)
+    except SpotifyRateLimitError as e:
+        raise e.to_http_exception()
+    if track is None:
+        return None
+    return {
+        "id": track["id"],
+        "title": track["name"],
+        "artist": ", ".join(track.get("artists") or []),
+        "album": track.get("album"),
+        "cover_url": track.get("album_art"),
+        "duration_ms": track.get("duration_ms"),
+        "uri": track.get("uri") or spotify_uri(track["id"])
+    }
+
 @router.post("/add", response_model=SongResponse)
 def add_song_to_queue(request: AddSongRequest):
     """Add a song to a queue"""
     try:
         logger.info(f"Adding song to queue: {request.queue_id}, song: {request.song_id}")
         
-        # Find the song in our mock database
-        song = None
-        for s in MOCK_SONGS:
-            if s["id"] == request.song_id:
-                song = s
-                break
-        
-        # Fallback to first mock song if not found
-        if not song and MOCK_SONGS:
-            logger.warning(f"Song not found with ID: {request.song_id}, using fallback mock song")
-            song = MOCK_SONGS[0]
-        elif not song:
-            logger.error(f"Song not found: {request.song_id}")
-            raise HTTPException(status_code=404, detail="Song not found")
-        
-        # Get Supabase connection info
-        from app.apis.supabase_config import get_supabase_config_internal
-        from app.apis.supabase_shared import get_supabase_client
-        import uuid
-        import requests
-        
-        # Get connection information
-        supabase_url, supabase_key = get_supabase_config_internal()
-        
-        logger.debug(f"Using Supabase URL: {supabase_url}")
-        logger.debug(f"Supabase key available: {'Yes' if supabase_key else 'No'}")
-        
-        if not supabase_url or not supabase_key:
-            logger.error("Missing Supabase configuration")
-            raise HTTPException(status_code=500, detail="Missing Supabase configuration")
-        
         # Validate or convert UUID format for queue_id
         try:
             # Attempt to validate queue_id as UUID - will throw ValueError if not valid UUID
@@ -775,120 +900,56 @@ def add_song_to_queue(request: AddSongRequest):
             logger.error(f"Invalid queue_id format: {request.queue_id} - must be a valid UUID")
             raise HTTPException(status_code=400, detail="Invalid queue_id format - must be a valid UUID")
         
-        # First, check directly if the queue exists
-        headers = {
-            "apikey": supabase_key,
-            "Authorization": f"Bearer {supabase_key}",
-            "Content-Type": "application/json",
-            "Accept": "application/json"
-        }
-        
-        queue_check = requests.get(
-            f"{supabase_url}/rest/v1/queues?id=eq.{uuid_queue_id}&select=id",
-            headers=headers
-        )
+        # Checked before anything is queued; the row's added_by must reference a profile
+        user_id = require_profile(request.user_id)
         
-        if queue_check.status_code != 200 or len(queue_check.json()) == 0:
-            logger.warning(f"Queue not found: {uuid_queue_id}, but proceeding for testing purposes")
-            # For testing purposes, we'll proceed even if the queue doesn't exist
-            # In a production environment, this would raise a 404
-            # raise HTTPException(status_code=404, detail="Queue not found")
-            
-        logger.info(f"Queue exists: {uuid_queue_id}")
-        
-        # Generate a UUID for the song
-        song_uuid = str(uuid.uuid4())
-        
-        # DEVELOPMENT WORKAROUND: In real production, we would have proper RLS policies
-        # Since we're in development and the song wasn't added by the authenticated user,
-        # we'll use a simplified workround - a direct SQL RPC call
-        insert_sql = f"""
-        INSERT INTO songs (
-            id, queue_id, title, artist, album, cover_url, duration, played
-        ) VALUES (
-            '{song_uuid}', 
-            '{uuid_queue_id}',
-            '{song["title"]}',
-            '{song["artist"]}',
-            '{song.get("album", "")}',
-            '{song.get("cover_url", "https://images.unsplash.com/photo-1504609813442-a9c286d4b4e0?auto=format&fit=crop&q=80&w=200&h=200")}',
-            {song.get("duration_ms", 240000)},
-            false
-        ) RETURNING *
-        """
+        song = resolve_song(request.song_id)
+        if not song:
+            logger.error(f"Song not found: {request.song_id}")
+            raise HTTPException(status_code=404, detail=f"Song {request.song_id} not found")
         
-        # Try to execute the SQL directly
+        engine = get_queue_engine()
         try:
-            logger.info(f"Executing direct SQL insert")
-            sql_response = requests.post(
-                f"{supabase_url}/rest/v1/rpc/execute_sql",
-                headers=headers,
-                json={"sql": insert_sql}
-            )
-            
-            # Check if execute_sql RPC is available
-            if sql_response.status_code == 404:
-                logger.warning("execute_sql RPC not available, falling back to providing instructions")
-                return SongResponse(
-                    id=song_uuid,
-                    queue_id=uuid_queue_id,
-                    title=song["title"],
-                    artist=song["artist"],
-                    album=song.get("album"),
-                    cover_url=song.get("cover_url"),
-                    added_by="00000000-0000-0000-0000-000000000000",  # Default UUID
-                    created_at="2024-01-01T00:00:00"
-                )
-            
-            if sql_response.status_code >= 300:
-                logger.error(f"SQL execution failed: {sql_response.status_code} - {sql_response.text}")
-                # RLS error often comes as 500 with a message
-                if sql_response.status_code == 500 and "new row violates row-level security policy" in sql_response.text:
-                    # Create a non-RLS fallback response anyway for development
-                    return SongResponse(
-                        id=song_uuid,
-                        queue_id=uuid_queue_id,
-                        title=song["title"],
-                        artist=song["artist"],
-                        album=song.get("album"),
-                        cover_url=song.get("cover_url"),
-                        added_by="00000000-0000-0000-0000-000000000000",  # Default UUID
-                        created_at="2024-01-01T00:00:00"
-                    )
-                else:
-                    # Some other error
-                    raise HTTPException(status_code=500, detail=f"Database error: {sql_response.text}")
-            
-            # Process successful response
-            logger.info(f"Song inserted successfully via SQL: {song_uuid}")
-            
-            # Return a response with the inserted song
-            return SongResponse(
-                id=song_uuid,
-                queue_id=uuid_queue_id,
-                title=song["title"],
-                artist=song["artist"],
-                album=song.get("album"),
-                cover_url=song.get("cover_url"),
-                added_by="00000000-0000-0000-0000-000000000000",  # Default UUID
-                created_at="2024-01-01T00:00:00"
-            )
-                
-        except Exception as direct_error:
-            logger.error(f"Direct SQL error: {direct_error}", exc_info=True)
-            
-            # For development - just return a fallback response that works
-            logger.warning("Returning fallback response for development")
-            return SongResponse(
-                id=song_uuid,
-                queue_id=uuid_queue_id,
-                title=song["title"],
-                artist=song["artist"],
-                album=song.get("album"),
-                cover_url=song.get("cover_url"),
-                added_by="00000000-0000-0000-0000-000000000000",  # Default UUID
-                created_at="2024-01-01T00:00:00"
-            )
+            live = engine.queue(uuid_queue_id)
+        except QueueLoadError as e:
+            logger.error(f"Queue {uuid_queue_id} could not be loaded")
+            raise e.to_http_exception()
+        entry = QueueEntry(
+            song_id=str(uuid.uuid4()),
+            queue_id=uuid_queue_id,
+            title=song["title"],
+            artist=song["artist"],
+            album=song.get("album"),
+            cover_url=song.get("cover_url"),
+            duration_ms=song.get("duration_ms"),
+            added_by=user_id,
+            track_uri=song.get("uri") or spotify_uri(song["id"])
+        )
+        
+        # Another release of a recording that is already waiting in the queue
+        # (single vs album vs remaster) is a duplicate
+        with live.lock:
+            if live.find_recording(entry.canonical_key) is not None:
+                logger.info(f"Song already queued: {song['title']} by {song['artist']}")
+                raise HTTPException(status_code=409, detail=f"{song['title']} by {song['artist']} is already in the queue")
+            # The engine is updated now and the row is written in the background
+            engine.add(entry)
+            position, wait_ms = live.position(entry.song_id)
+        
+        logger.info(f"Song {entry.song_id} added to queue {uuid_queue_id}, {len(live)} songs queued")
+        return SongResponse(
+            id=entry.song_id,
+            queue_id=uuid_queue_id,
+            title=entry.title,
+            artist=entry.artist,
+            album=entry.album,
+            cover_url=entry.cover_url,
+            added_by=user_id,
+            created_at=format_timestamp(entry.added_at),
+            track_uri=entry.track_uri,
+            position=position,
+            wait_ms=wait_ms
+        )
             
     except HTTPException as he:
         # Re-raise HTTP exceptions
@@ -1,12 +1,14 @@
 from fastapi import APIRouter, HTTPException, Request, Depends, Header
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-import requests
 import json
 from typing import Optional
 from datetime import datetime, timedelta
 import os
 from supabase import create_client, Client
 from app.utils.auth import get_user_id
+from app.utils.spotify_client import get_spotify_client
+from app.utils.spotify_rate_limit import SpotifyRateLimitError
 
 router = APIRouter()
 
@@ -67,7 +69,7 @@ def get_spotify_config() -> SpotifyConfigResponse:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/token", response_model=SpotifyAuthResponse)
-def exchange_code_for_token(
+async def exchange_code_for_token(
     request: SpotifyAuthRequest, 
     authorization: Optional[str] = Header(None)
 ) -> SpotifyAuthResponse:
@@ -83,23 +85,16 @@ def exchange_code_for_token(
             raise HTTPException(status_code=500, detail="Spotify credentials not configured. Please set SPOTIFY_CLIENT_ID and SPOTIFY_CLIENT_SECRET environment variables.")
         
         # Exchange code for token
-        token_url = "https://accounts.spotify.com/api/token"
-        
-        auth_header = requests.auth._basic_auth_str(client_id, client_secret)
-        
         payload = {
             "grant_type": "authorization_code",
             "code": request.code,
             "redirect_uri": request.redirect_uri
         }
         
-        headers = {
-            "Authorization": auth_header,
-            "Content-Type": "application/x-www-form-urlencoded",
-            "Accept": "application/json"
-        }
-        
-        response = requests.post(token_url, data=payload, headers=headers)
+        try:
+            response = await get_spotify_client().post_token(payload, (client_id, client_secret))
+        except SpotifyRateLimitError as e:
+            raise e.to_http_exception()
         
         if response.status_code != 200:
             error_data = response.json()
@@ -124,14 +119,14 @@ def exchange_code_for_token(
                 # Calculate expiration time
                 expires_at = datetime.now() + timedelta(seconds=token_data["expires_in"])
                 
-                # Store tokens in Supabase
-                data, error = supabase.table("user_settings").upsert({
+                # Store tokens in Supabase (blocking client, keep it off the event loop)
+                data, error = await run_in_threadpool(supabase.table("user_settings").upsert({
                     "user_id": user_id,
                     "spotify_access_token": token_data["access_token"],
                     "spotify_refresh_token": token_data["refresh_token"],
                     "spotify_token_expires_at": expires_at.isoformat(),
                     "updated_at": datetime.now().isoformat()
-                }).execute()
+                }).execute)
                 
                 if error:
                     print(f"Error storing Spotify tokens: {error}")
@@ -150,7 +145,7 @@ def exchange_code_for_token(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/refresh", response_model=SpotifyAuthResponse)
-def refresh_token(
+async def refresh_token(
     request: SpotifyTokenRequest,
     authorization: Optional[str] = Header(None)
 ) -> SpotifyAuthResponse:
@@ -166,22 +161,15 @@ def refresh_token(
             raise HTTPException(status_code=500, detail="Spotify credentials not configured. Please set SPOTIFY_CLIENT_ID and SPOTIFY_CLIENT_SECRET environment variables.")
         
         # Refresh the token
-        token_url = "https://accounts.spotify.com/api/token"
-        
-        auth_header = requests.auth._basic_auth_str(client_id, client_secret)
-        
         payload = {
             "grant_type": "refresh_token",
             "refresh_token": request.refresh_token
         }
         
-        headers = {
-            "Authorization": auth_header,
-            "Content-Type": "application/x-www-form-urlencoded",
-            "Accept": "application/json"
-        }
-        
-        response = requests.post(token_url, data=payload, headers=headers)
+        try:
+            response = await get_spotify_client().post_token(payload, (client_id, client_secret))
+        except SpotifyRateLimitError as e:
+            raise e.to_http_exception()
         
         if response.status_code != 200:
             error_data = response.json()
@@ -209,14 +197,14 @@ def refresh_token(
                 # Calculate expiration time
                 expires_at = datetime.now() + timedelta(seconds=token_data["expires_in"])
                 
-                # Update tokens in Supabase
-                data, error = supabase.table("user_settings").upsert({
+                # Update tokens in Supabase (blocking client, keep it off the event loop)
+                data, error = await run_in_threadpool(supabase.table("user_settings").upsert({
                     "user_id": user_id,
                     "spotify_access_token": token_data["access_token"],
                     "spotify_refresh_token": refresh_token,
                     "spotify_token_expires_at": expires_at.isoformat(),
                     "updated_at": datetime.now().isoformat()
-                }).execute()
+                }).execute)
                 
                 if error:
                     print(f"Error updating Spotify tokens: {error}")
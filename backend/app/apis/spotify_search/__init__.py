@@ -1,11 +1,65 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-import requests
-from typing import List, Optional
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+import asyncio
 import os
+import time
+from app.utils.canonical import canonical_key, group_duplicates
+from app.utils.query_log import get_query_log
+from app.utils.search_cache import TTLCache, FRESH, STALE
+from app.utils.single_flight import SingleFlight
+from app.utils.spotify_client import SpotifyTimeoutError, get_spotify_client
+from app.utils.spotify_credentials import SpotifyCredential, get_credential_pool
+from app.utils.spotify_rate_limit import SpotifyRateLimitError
+from app.utils.text_normalize import query_cache_stats, query_key
+from app.utils.track_catalog import get_track_catalog
+from app.utils.track_resolver import get_track_resolver
+from app.utils.typeahead import TypeaheadSessions
 
 router = APIRouter()
 
+# Shared result cache for /spotify/search, keyed by normalized query and limit
+search_cache = TTLCache(
+    max_entries=int(os.environ.get("SPOTIFY_SEARCH_CACHE_SIZE", "2048")),
+    ttl=float(os.environ.get("SPOTIFY_SEARCH_CACHE_TTL", "300")),
+    stale_ttl=float(os.environ.get("SPOTIFY_SEARCH_CACHE_STALE_TTL", "900")),
+    negative_ttl=float(os.environ.get("SPOTIFY_SEARCH_CACHE_NEGATIVE_TTL", "15"))
+)
+
+# Identical searches in flight at the same time share one upstream call
+search_flights = SingleFlight()
+
+# Latest in-flight search per client typeahead session
+typeahead_sessions = TypeaheadSessions()
+
+# Spotify returns at most 50 tracks per page and no results past offset 1000
+SPOTIFY_PAGE_SIZE = 50
+SPOTIFY_MAX_OFFSET = 1000
+# Largest limit /spotify/search will fan out to in a single request
+MAX_SEARCH_LIMIT = int(os.environ.get("SPOTIFY_SEARCH_MAX_LIMIT", "200"))
+
+# Answer first-page searches from the local track catalog when it already
+# holds a full page of matches, instead of asking Spotify again. Off by
+# default: the catalog ranks by its own text match and only knows tracks it
+# has seen, so /songs/search is where it is used first. When on, a query is
+# only answered locally if Spotify itself answered it within CATALOG_MAX_AGE
+# seconds, so popular queries keep reaching Spotify and pick up new releases
+CATALOG_FIRST = os.environ.get("SPOTIFY_SEARCH_CATALOG_FIRST", "false").lower() in ("1", "true", "yes")
+CATALOG_MAX_AGE = float(os.environ.get("SPOTIFY_SEARCH_CATALOG_MAX_AGE", "3600"))
+catalog_hits = 0
+# Normalized query -> when Spotify last answered it, oldest first
+_upstream_answered: "OrderedDict[str, float]" = OrderedDict()
+MAX_UPSTREAM_QUERIES = 10000
+
+# Result types /spotify/search/all can combine, with their response field
+SEARCH_TYPES = {"track": "tracks", "artist": "artists", "album": "albums"}
+
+# Strong references to background revalidation tasks
+_background_tasks: Set[asyncio.Task] = set()
+
 # Models
 class SpotifyTrack(BaseModel):
     id: str
@@ -17,13 +71,57 @@ class SpotifyTrack(BaseModel):
     duration_ms: int
     popularity: Optional[int] = None
     preview_url: Optional[str] = None
+    isrc: Optional[str] = None
+    # Other Spotify ids of the same recording (single, album, remaster...)
+    aliases: Optional[List[str]] = None
+    # "catalog" when served from the local track catalog, which can lag behind Spotify
+    source: str = "spotify"
+
+class SpotifyArtist(BaseModel):
+    id: str
+    name: str
+    uri: str
+    image: str
+    genres: List[str] = []
+    popularity: Optional[int] = None
+
+class SpotifyAlbum(BaseModel):
+    id: str
+    name: str
+    uri: str
+    artists: List[str]
+    album_art: str
+    release_date: Optional[str] = None
+    total_tracks: Optional[int] = None
 
 class SearchResponse(BaseModel):
     tracks: List[SpotifyTrack]
 
+class MultiSearchResponse(BaseModel):
+    """Results per requested type; types that weren't requested are left out"""
+    tracks: Optional[List[SpotifyTrack]] = None
+    artists: Optional[List[SpotifyArtist]] = None
+    albums: Optional[List[SpotifyAlbum]] = None
+
 class SearchError(BaseModel):
     error: str
 
+def track_from_catalog(track: dict) -> SpotifyTrack:
+    """Build a SpotifyTrack from a local catalog row, filling fields it may lack"""
+    return SpotifyTrack(
+        id=track["id"],
+        name=track["name"],
+        uri=track.get("uri") or f"spotify:track:{track['id']}",
+        artists=track.get("artists") or [],
+        album=track.get("album") or "",
+        album_art=track.get("album_art") or "",
+        duration_ms=track.get("duration_ms") or 0,
+        popularity=track.get("popularity"),
+        preview_url=track.get("preview_url"),
+        isrc=track.get("isrc"),
+        source="catalog"
+    )
+
 def get_spotify_credentials():
     """Get Spotify credentials from environment variables"""
     client_id = os.environ.get("SPOTIFY_CLIENT_ID")
@@ -31,130 +129,522 @@ def get_spotify_credentials():
     
     return client_id, client_secret
 
-@router.get("/spotify/search", response_model=SearchResponse, response_model_exclude_none=True)
-def search_spotify_songs(
-    query: str = Query(..., description="Search query for songs"),
-    limit: int = Query(10, description="Maximum number of results to return", ge=1, le=50)
-) -> SearchResponse:
+async def fetch_spotify_tracks(
+    query: str,
+    limit: int,
+    queue_id: Optional[str] = None,
+    offset: int = 0
+) -> List[SpotifyTrack]:
     """
-    Search for songs on Spotify
+    Fetch one page (at most 50 tracks) from the Spotify API, bypassing the result cache.
+    Spread over the configured app credentials, failing over when one is throttled.
     """
+    pool = get_credential_pool()
+    
+    async def search_with(credential: SpotifyCredential) -> List[SpotifyTrack]:
+        # With other apps to fail over to, don't sit out a 429 on this one
+        return await _search_with_credential(
+            credential, query, limit, offset, queue_id,
+            max_retries=0 if pool.size > 1 else None
+        )
+    
     try:
-        # Log the incoming request parameters for debugging
-        print(f"Spotify search request: query='{query}', limit={limit}")
+        tracks = await pool.run(search_with, key=normalize_search_query(query))
+    except SpotifyRateLimitError as e:
+        print(f"Spotify search rate limited on all credentials: retry after {e.retry_after}s")
+        raise e.to_http_exception()
+    
+    # Keep the metadata so later searches and lookups can be served locally
+    get_track_catalog().upsert(jsonable_encoder(tracks))
+    return tracks
+
+async def _search_with_credential(
+    credential: SpotifyCredential,
+    query: str,
+    limit: int,
+    offset: int,
+    queue_id: Optional[str],
+    max_retries: Optional[int]
+) -> List[SpotifyTrack]:
+    """Search using one app credential; SpotifyRateLimitError propagates for failover"""
+    search_params = {
+        "q": query,
+        "type": "track",
+        "limit": limit
+    }
+    if offset:
+        search_params["offset"] = offset
+    
+    search_data = await _spotify_search_request(credential, search_params, queue_id, max_retries)
+    
+    # Check if tracks are present in response
+    if "tracks" not in search_data or "items" not in search_data["tracks"]:
+        print(f"Unexpected Spotify API response format: {search_data.keys()}")
+        raise HTTPException(status_code=500, detail="Unexpected Spotify API response format")
+    
+    result_tracks = _parse_items(search_data["tracks"]["items"], _track_from_item)
+    print(f"Processed {len(result_tracks)} tracks from Spotify search results")
+    return result_tracks
+
+async def _spotify_search_request(
+    credential: SpotifyCredential,
+    search_params: dict,
+    queue_id: Optional[str],
+    max_retries: Optional[int]
+) -> dict:
+    """One /search call with credential; returns the decoded response body"""
+    try:
+        # Get a cached Spotify access token (Client Credentials flow)
+        token_manager = credential.tokens
+        access_token = await token_manager.get_token()
+        client = get_spotify_client()
         
-        # Get client ID and secret from environment variables
-        client_id, client_secret = get_spotify_credentials()
+        print(f"Making Spotify search request: params={search_params}")
+        search_response = await client.get(
+            "/search", access_token, params=search_params, queue_key=queue_id,
+            governor=credential.governor, max_retries=max_retries, hedge=True
+        )
         
-        # Print debug info (redact sensitive information)
-        print(f"Spotify credentials available: client_id={client_id is not None}, client_secret={client_secret is not None}")
+        print(f"Spotify search response: status_code={search_response.status_code}")
+        
+        # A revoked or expired token: fetch a new one and retry once
+        if search_response.status_code == 401:
+            token_manager.invalidate()
+            access_token = await token_manager.get_token()
+            search_response = await client.get(
+                "/search", access_token, params=search_params, queue_key=queue_id,
+                governor=credential.governor, max_retries=max_retries
+            )
+            print(f"Spotify search retry response: status_code={search_response.status_code}")
         
-        if not client_id or not client_secret:
-            raise HTTPException(status_code=500, detail="Spotify credentials not configured. Please set SPOTIFY_CLIENT_ID and SPOTIFY_CLIENT_SECRET environment variables.")
+        if search_response.status_code != 200:
+            error_content = search_response.text
+            print(f"Search error content: {error_content}")
+            error_data = search_response.json() if search_response.text else {"error": {"message": "Unknown error"}}
+            error_msg = error_data.get("error", {}).get("message", "Unknown error")
+            raise HTTPException(status_code=search_response.status_code, detail=f"Spotify search failed: {error_msg}")
         
-        # Get Spotify access token using Client Credentials flow
-        token_url = "https://accounts.spotify.com/api/token"
-        auth_data = {
-            "grant_type": "client_credentials"
-        }
-        auth_headers = {
-            "Content-Type": "application/x-www-form-urlencoded",
-            "Accept": "application/json"
-        }
+        return search_response.json()
         
+    except SpotifyRateLimitError as e:
+        # Re-raised for the credential pool to fail over
+        print(f"Spotify search rate limited on {credential.label}: retry after {e.retry_after}s")
+        raise e
+    except SpotifyTimeoutError as e:
+        print(f"Spotify search timed out on {credential.label}: {str(e)}")
+        raise HTTPException(status_code=504, detail=f"Spotify search timed out: {str(e)}")
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        # Log the full exception for server-side debugging
+        import traceback
+        print(f"Unexpected error in Spotify search: {str(e)}")
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Error during Spotify search: {str(e)}")
+
+def _parse_items(items: list, parse) -> list:
+    """Convert Spotify result items, skipping (and logging) malformed ones"""
+    results = []
+    for item in items:
+        if not item:
+            continue
         try:
-            auth_response = requests.post(
-                token_url,
-                data=auth_data,
-                headers=auth_headers,
-                auth=(client_id, client_secret)
-            )
-            
-            print(f"Spotify auth response: status_code={auth_response.status_code}")
-            
-            if auth_response.status_code != 200:
-                error_content = auth_response.text
-                print(f"Auth error content: {error_content}")
-                raise HTTPException(status_code=500, detail=f"Failed to authenticate with Spotify: {error_content}")
-            
-            auth_data = auth_response.json()
-            access_token = auth_data["access_token"]
-            print("Successfully obtained Spotify access token")
-            
+            results.append(parse(item))
         except Exception as e:
-            print(f"Exception during Spotify authentication: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Error during Spotify authentication: {str(e)}")
+            print(f"Error processing item {item.get('id', 'unknown')}: {str(e)}")
+            # Continue processing other items instead of failing the whole request
+    return results
+
+def _track_from_item(item: dict) -> SpotifyTrack:
+    return SpotifyTrack(
+        id=item["id"],
+        name=item["name"],
+        uri=item["uri"],
+        artists=[artist["name"] for artist in item["artists"]],
+        album=item["album"]["name"],
+        album_art=item["album"]["images"][0]["url"] if item["album"]["images"] else "",
+        duration_ms=item["duration_ms"],
+        popularity=item["popularity"],
+        preview_url=item["preview_url"],
+        isrc=(item.get("external_ids") or {}).get("isrc")
+    )
+
+def _artist_from_item(item: dict) -> SpotifyArtist:
+    return SpotifyArtist(
+        id=item["id"],
+        name=item["name"],
+        uri=item["uri"],
+        image=item["images"][0]["url"] if item.get("images") else "",
+        genres=item.get("genres") or [],
+        popularity=item.get("popularity")
+    )
+
+def _album_from_item(item: dict) -> SpotifyAlbum:
+    return SpotifyAlbum(
+        id=item["id"],
+        name=item["name"],
+        uri=item["uri"],
+        artists=[artist["name"] for artist in item.get("artists", [])],
+        album_art=item["images"][0]["url"] if item.get("images") else "",
+        release_date=item.get("release_date"),
+        total_tracks=item.get("total_tracks")
+    )
+
+
+def normalize_search_query(query: str) -> str:
+    """
+    Normalize a query so trivially different spellings ("Beyoncé", "beyonce",
+    "ＢＥＹＯＮＣＥ") share a cache entry. Queries with Spotify field filters
+    (artist:..., year:...) keep their punctuation, since it changes the search.
+    """
+    key = query_key(query) if ":" not in query else ""
+    return key or " ".join(query.lower().split())
+
+async def fetch_spotify_track_pages(
+    query: str,
+    limit: int,
+    offset: int = 0,
+    queue_id: Optional[str] = None
+) -> List[SpotifyTrack]:
+    """
+    Fetch limit recordings starting at offset, after collapsing releases of
+    the same recording, so offset and limit count what the client sees.
+    Spotify pages are read from the top of the ranking, concurrently and
+    from the page cache when an earlier request already fetched them, until
+    enough recordings are found or Spotify has no more results.
+    """
+    wanted = offset + limit
+    merged: List[SpotifyTrack] = []
+    upstream_end = 0
+    exhausted = False
+    
+    while not exhausted and upstream_end < SPOTIFY_MAX_OFFSET:
+        missing = wanted - len(collapse_duplicates(merged))
+        if missing <= 0:
+            break
+        page_offsets = list(range(upstream_end, min(upstream_end + missing, SPOTIFY_MAX_OFFSET), SPOTIFY_PAGE_SIZE))
+        pages = await asyncio.gather(
+            *[_fetch_spotify_page(query, page_offset, queue_id) for page_offset in page_offsets],
+            return_exceptions=True
+        )
         
-        # Search for tracks using Spotify API
-        search_url = "https://api.spotify.com/v1/search"
-        search_params = {
-            "q": query,
-            "type": "track",
-            "limit": limit
-        }
-        search_headers = {
-            "Authorization": f"Bearer {access_token}",
-            "Accept": "application/json"
-        }
+        # The first page decides success; a later failure truncates the results
+        # at that page so what we return is still a contiguous ranked window
+        if not merged and isinstance(pages[0], BaseException):
+            raise pages[0]
         
+        for page_offset, page in zip(page_offsets, pages):
+            if isinstance(page, BaseException):
+                print(f"Spotify search page at offset {page_offset} failed, returning {len(merged)} tracks: {str(page)}")
+                exhausted = True
+                break
+            merged.extend(page)
+            upstream_end = page_offset + SPOTIFY_PAGE_SIZE
+            if len(page) < SPOTIFY_PAGE_SIZE:
+                # Short page: Spotify has no more results
+                exhausted = True
+                break
+    
+    tracks = collapse_duplicates(merged)
+    print(f"Collapsed {len(merged)} Spotify tracks to {len(tracks)} recordings")
+    return tracks[offset:wanted]
+
+async def _fetch_spotify_page(query: str, page_offset: int, queue_id: Optional[str]) -> List[SpotifyTrack]:
+    """One full Spotify page, shared between requests through the result cache"""
+    cache_key = ("page", normalize_search_query(query), page_offset)
+    cached, state = search_cache.get(cache_key)
+    if state == FRESH and not isinstance(cached, HTTPException):
+        return list(cached)
+    
+    page = await fetch_spotify_tracks(query, SPOTIFY_PAGE_SIZE, queue_id, page_offset)
+    if page:
+        search_cache.set(cache_key, page)
+    return page
+
+def collapse_duplicates(tracks: List[SpotifyTrack]) -> List[SpotifyTrack]:
+    """
+    Keep the best-ranked release of each recording, listing the other
+    releases' ids as its aliases
+    """
+    collapsed = []
+    for group in group_duplicates(tracks, _track_key):
+        aliases = list(dict.fromkeys(track.id for track in group[1:] if track.id != group[0].id))
+        best = group[0]
+        if aliases:
+            best = best.model_copy(update={"aliases": (best.aliases or []) + aliases})
+        collapsed.append(best)
+    return collapsed
+
+def _track_key(track: SpotifyTrack) -> str:
+    # Same id always collapses, even without enough for a canonical key
+    return canonical_key(track.isrc, track.name, track.artists) or f"id:{track.id}"
+
+async def _search_and_cache(
+    query: str,
+    limit: int,
+    offset: int,
+    cache_key: tuple,
+    queue_id: Optional[str] = None
+) -> List[SpotifyTrack]:
+    """Fetch from the local catalog or Spotify and record the outcome in the result cache"""
+    global catalog_hits
+    if CATALOG_FIRST and offset == 0 and _answered_upstream_recently(query):
         try:
-            print(f"Making Spotify search request: url={search_url}, params={search_params}")
-            search_response = requests.get(search_url, params=search_params, headers=search_headers)
-            
-            print(f"Spotify search response: status_code={search_response.status_code}")
-            
-            if search_response.status_code != 200:
-                error_content = search_response.text
-                print(f"Search error content: {error_content}")
-                error_data = search_response.json() if search_response.text else {"error": {"message": "Unknown error"}}
-                error_msg = error_data.get("error", {}).get("message", "Unknown error")
-                raise HTTPException(status_code=search_response.status_code, detail=f"Spotify search failed: {error_msg}")
-            
-            search_data = search_response.json()
-            
+            local = await run_in_threadpool(get_track_catalog().search, query, limit)
         except Exception as e:
-            print(f"Exception during Spotify search: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Error during Spotify search: {str(e)}")
-        
-        # Process results
-        result_tracks = []
+            print(f"Track catalog search failed for query='{query}': {str(e)}")
+            local = []
+        if len(local) >= limit:
+            catalog_hits += 1
+            tracks = [track_from_catalog(track) for track in local]
+            search_cache.set(cache_key, tracks)
+            return tracks
+    
+    try:
+        tracks = await fetch_spotify_track_pages(query, limit, offset, queue_id)
+    except HTTPException as he:
+        # Briefly remember failures so a broken query doesn't hammer Spotify;
+        # rate limiting and timeouts are transient and not remembered
+        if he.status_code not in (429, 504):
+            search_cache.set_negative(cache_key, he)
+        raise he
+    
+    if tracks:
+        search_cache.set(cache_key, tracks)
+        if offset == 0:
+            _note_upstream_answer(query)
+    else:
+        search_cache.set_negative(cache_key, tracks)
+    return tracks
+
+def _answered_upstream_recently(query: str) -> bool:
+    answered = _upstream_answered.get(normalize_search_query(query))
+    return answered is not None and time.monotonic() - answered < CATALOG_MAX_AGE
+
+def _note_upstream_answer(query: str) -> None:
+    key = normalize_search_query(query)
+    _upstream_answered[key] = time.monotonic()
+    _upstream_answered.move_to_end(key)
+    while len(_upstream_answered) > MAX_UPSTREAM_QUERIES:
+        _upstream_answered.popitem(last=False)
+
+def _refresh_in_background(query: str, cache_key: tuple, fetch: Callable[[], Awaitable[Any]]) -> None:
+    """Revalidate a stale entry with fetch(); the stale value stays in place on failure"""
+    async def worker():
         try:
-            # Check if tracks are present in response
-            if "tracks" not in search_data or "items" not in search_data["tracks"]:
-                print(f"Unexpected Spotify API response format: {search_data.keys()}")
-                raise HTTPException(status_code=500, detail="Unexpected Spotify API response format")
-            
-            for item in search_data["tracks"]["items"]:
-                try:
-                    track = SpotifyTrack(
-                        id=item["id"],
-                        name=item["name"],
-                        uri=item["uri"],
-                        artists=[artist["name"] for artist in item["artists"]],
-                        album=item["album"]["name"],
-                        album_art=item["album"]["images"][0]["url"] if item["album"]["images"] else "",
-                        duration_ms=item["duration_ms"],
-                        popularity=item["popularity"],
-                        preview_url=item["preview_url"]
-                    )
-                    result_tracks.append(track)
-                except Exception as e:
-                    print(f"Error processing track {item.get('id', 'unknown')}: {str(e)}")
-                    # Continue processing other tracks instead of failing the whole request
-            
-            print(f"Processed {len(result_tracks)} tracks from Spotify search results")
-            return SearchResponse(tracks=result_tracks)
-            
+            result = await fetch()
+            if result:
+                search_cache.set(cache_key, result)
         except Exception as e:
-            print(f"Exception processing search results: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Error processing search results: {str(e)}")
-        
+            print(f"Background refresh failed for query='{query}': {str(e)}")
+        finally:
+            search_cache.end_refresh(cache_key)
+    
+    task = asyncio.ensure_future(worker())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+@router.get("/spotify/search", response_model=SearchResponse, response_model_exclude_none=True)
+async def search_spotify_songs(
+    query: str = Query(..., description="Search query for songs"),
+    limit: int = Query(10, description="Maximum number of results to return; above 50 the pages are fetched in parallel", ge=1, le=MAX_SEARCH_LIMIT),
+    offset: int = Query(0, description="Index of the first result to return; releases of one recording count once", ge=0),
+    queue_id: Optional[str] = Query(None, description="Queue the search is made from, used for fair rate limiting"),
+    session_id: Optional[str] = Query(None, description="Client typeahead session; a newer query cancels this session's older in-flight searches"),
+    seq: Optional[int] = Query(None, description="Increasing sequence number of the query within session_id; arrival order is used if omitted")
+) -> SearchResponse:
+    """
+    Search for songs on Spotify
+    """
+    # Log the incoming request parameters for debugging
+    print(f"Spotify search request: query='{query}', limit={limit}, offset={offset}")
+    
+    if offset + limit > SPOTIFY_MAX_OFFSET:
+        raise HTTPException(status_code=400, detail=f"offset + limit must not exceed {SPOTIFY_MAX_OFFSET}")
+    
+    if session_id:
+        tracks = await _search_latest_in_session(session_id, seq, query, limit, offset, queue_id)
+    else:
+        tracks = await search_tracks(query, limit, offset, queue_id)
+    
+    # Later pages repeat a query already counted; field filters aren't suggestions
+    if tracks and offset == 0 and ":" not in query:
+        get_query_log().record(query, queue_id)
+    return SearchResponse(tracks=tracks)
+
+async def _search_latest_in_session(
+    session_id: str,
+    seq: Optional[int],
+    query: str,
+    limit: int,
+    offset: int,
+    queue_id: Optional[str]
+) -> List[SpotifyTrack]:
+    """
+    Run a typeahead search that is cancelled if a newer query from the same
+    session arrives, and never started if a newer one is already running
+    """
+    if seq is None:
+        seq = typeahead_sessions.next_seq(session_id)
+    
+    if typeahead_sessions.is_superseded(session_id, seq):
+        raise HTTPException(status_code=409, detail="Search superseded by a newer query in this session")
+    
+    task = asyncio.ensure_future(search_tracks(query, limit, offset, queue_id))
+    typeahead_sessions.begin(session_id, seq, task)
+    try:
+        return await task
+    except asyncio.CancelledError:
+        if asyncio.current_task().cancelling():
+            # The request itself was cancelled (e.g. client disconnected)
+            raise
+        print(f"Spotify search superseded: session={session_id}, seq={seq}, query='{query}'")
+        raise HTTPException(status_code=409, detail="Search superseded by a newer query in this session")
+    finally:
+        typeahead_sessions.finish(session_id, task)
+
+async def search_tracks(
+    query: str,
+    limit: int = 10,
+    offset: int = 0,
+    queue_id: Optional[str] = None
+) -> List[SpotifyTrack]:
+    """
+    Cached, coalesced Spotify track search for use by other modules.
+    Raises HTTPException on failure, like the endpoint.
+    """
+    cache_key = (normalize_search_query(query), limit, offset)
+    cached, state = search_cache.get(cache_key)
+    
+    if state is not None:
+        if state == STALE and search_cache.begin_refresh(cache_key):
+            _refresh_in_background(query, cache_key, lambda: fetch_spotify_track_pages(query, limit, offset))
+        if isinstance(cached, HTTPException):
+            raise cached
+        return list(cached)
+    
+    tracks = await search_flights.do(cache_key, _search_and_cache, query, limit, offset, cache_key, queue_id)
+    return list(tracks)
+
+@router.get("/spotify/search/all", response_model=MultiSearchResponse, response_model_exclude_none=True)
+async def search_spotify_all(
+    query: str = Query(..., description="Search query"),
+    types: str = Query("track,artist,album", description="Comma-separated result types: track, artist, album"),
+    limit: int = Query(10, description="Results per type unless overridden below", ge=1, le=SPOTIFY_PAGE_SIZE),
+    track_limit: Optional[int] = Query(None, ge=1, le=SPOTIFY_PAGE_SIZE),
+    artist_limit: Optional[int] = Query(None, ge=1, le=SPOTIFY_PAGE_SIZE),
+    album_limit: Optional[int] = Query(None, ge=1, le=SPOTIFY_PAGE_SIZE),
+    queue_id: Optional[str] = Query(None, description="Queue the search is made from, used for fair rate limiting")
+) -> MultiSearchResponse:
+    """
+    Search tracks, artists and albums in one request
+    """
+    requested = tuple(sorted({t.strip().lower() for t in types.split(",") if t.strip()}))
+    unknown = [t for t in requested if t not in SEARCH_TYPES]
+    if unknown or not requested:
+        raise HTTPException(status_code=400, detail=f"types must be a combination of {', '.join(SEARCH_TYPES)}")
+    
+    overrides = {"track": track_limit, "artist": artist_limit, "album": album_limit}
+    limits = {t: overrides[t] or limit for t in requested}
+    print(f"Spotify multi-type search request: query='{query}', limits={limits}")
+    
+    results = await search_all(query, requested, max(limits.values()), queue_id)
+    
+    if any(results.values()) and ":" not in query:
+        get_query_log().record(query, queue_id)
+    return MultiSearchResponse(**{SEARCH_TYPES[t]: results[t][:limits[t]] for t in requested})
+
+async def search_all(
+    query: str,
+    types: Tuple[str, ...],
+    limit: int,
+    queue_id: Optional[str] = None
+) -> Dict[str, list]:
+    """
+    Cached, coalesced multi-type search: up to limit results of each type.
+    Spotify applies limit per type, so one multi-type call covers them all.
+    """
+    cache_key = ("all", normalize_search_query(query), types, limit)
+    cached, state = search_cache.get(cache_key)
+    
+    if state is not None:
+        if state == STALE and search_cache.begin_refresh(cache_key):
+            _refresh_in_background(query, cache_key, lambda: fetch_spotify_all(query, types, limit))
+        if isinstance(cached, HTTPException):
+            raise cached
+        return cached
+    
+    return await search_flights.do(cache_key, _search_all_and_cache, query, types, limit, cache_key, queue_id)
+
+async def _search_all_and_cache(
+    query: str,
+    types: Tuple[str, ...],
+    limit: int,
+    cache_key: tuple,
+    queue_id: Optional[str] = None
+) -> Dict[str, list]:
+    try:
+        results = await fetch_spotify_all(query, types, limit, queue_id)
     except HTTPException as he:
-        # Re-raise HTTP exceptions
+        if he.status_code not in (429, 504):
+            search_cache.set_negative(cache_key, he)
         raise he
-    except Exception as e:
-        # Log the full exception for server-side debugging
-        import traceback
-        print(f"Unexpected error in Spotify search: {str(e)}")
-        print(traceback.format_exc())
-        raise HTTPException(status_code=500, detail=str(e))
+    
+    if any(results.values()):
+        search_cache.set(cache_key, results)
+        # The track part also answers a plain track search for the same page
+        if results.get("track"):
+            search_cache.set((cache_key[1], limit, 0), results["track"])
+    else:
+        search_cache.set_negative(cache_key, results)
+    return results
+
+async def fetch_spotify_all(
+    query: str,
+    types: Tuple[str, ...],
+    limit: int,
+    queue_id: Optional[str] = None
+) -> Dict[str, list]:
+    """One multi-type Spotify search, bypassing the result cache"""
+    pool = get_credential_pool()
+    search_params = {"q": query, "type": ",".join(types), "limit": limit}
+    
+    async def search_with(credential: SpotifyCredential) -> dict:
+        return await _spotify_search_request(
+            credential, search_params, queue_id,
+            max_retries=0 if pool.size > 1 else None
+        )
+    
+    try:
+        search_data = await pool.run(search_with, key=normalize_search_query(query))
+    except SpotifyRateLimitError as e:
+        print(f"Spotify search rate limited on all credentials: retry after {e.retry_after}s")
+        raise e.to_http_exception()
+    
+    parsers = {"track": _track_from_item, "artist": _artist_from_item, "album": _album_from_item}
+    results = {
+        t: _parse_items((search_data.get(SEARCH_TYPES[t]) or {}).get("items") or [], parsers[t])
+        for t in types
+    }
+    if results.get("track"):
+        get_track_catalog().upsert(jsonable_encoder(results["track"]))
+        results["track"] = collapse_duplicates(results["track"])
+    return results
+
+@router.get("/spotify/search/stats")
+def get_search_cache_stats():
+    """
+    Hit/miss/eviction counters for the Spotify search result cache
+    """
+    return {
+        **search_cache.stats(),
+        "single_flight": search_flights.stats(),
+        "typeahead": typeahead_sessions.stats(),
+        "credential_pool": get_credential_pool().stats(),
+        "upstream": get_spotify_client().stats(),
+        "catalog_hits": catalog_hits,
+        "query_normalization": query_cache_stats(),
+        "query_log": get_query_log().stats(),
+        "track_catalog": get_track_catalog().stats(),
+        "track_resolver": get_track_resolver().stats()
+    }
@@ -0,0 +1,68 @@
+"""
+Track canonicalization for QueueBeats backend
+Spotify lists the same recording many times: on the single, the album, the
+deluxe edition, a remaster. They share an ISRC (the recording's registration
+code), so the ISRC is the canonical key; tracks without one fall back to their
+normalized title with edition markers like "- Remastered 2011" removed, plus
+the normalized primary artist.
+"""
+
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, TypeVar
+
+from app.utils.text_normalize import normalize_text
+
+T = TypeVar("T")
+
+# Edition markers that don't make a different recording. Remixes, live and
+# acoustic versions are different recordings and are left alone.
+_EDITION_SUFFIX = re.compile(
+    r"\s*(?:[-–—]\s*|[(\[]\s*)"
+    r"(?:\d{4}\s+)?(?:digital(?:ly)?\s+)?"
+    r"(?:remaster(?:ed)?|deluxe(?:\s+edition)?|expanded(?:\s+edition)?|anniversary(?:\s+edition)?|"
+    r"bonus\s+track|album\s+version|single\s+version|explicit|clean)"
+    # Only a year or "version"/"edition" may follow, so "- Clean Bandit Remix" stays
+    r"(?:\s+(?:19|20)\d{2})?(?:\s+(?:version|edition))?"
+    r"\s*[)\]]?\s*$",
+    re.IGNORECASE
+)
+
+
+def base_title(title: str) -> str:
+    """Title without trailing edition markers: "Help! - Remastered 2009" -> "Help!" """
+    while True:
+        stripped = _EDITION_SUFFIX.sub("", title)
+        if stripped == title or not stripped:
+            return title
+        title = stripped
+
+
+def canonical_key(isrc: Optional[str], title: Optional[str], artists: Sequence[str]) -> Optional[str]:
+    """Key shared by every release of a recording, or None without enough to go on"""
+    if isrc and isrc.strip():
+        return f"isrc:{isrc.strip().upper()}"
+    name = normalize_text(base_title(title or ""))
+    artist = normalize_text(artists[0]) if artists else ""
+    if not name or not artist:
+        return None
+    return f"title:{name}|{artist}"
+
+
+def group_duplicates(items: Iterable[T], key: Callable[[T], Optional[str]]) -> List[List[T]]:
+    """
+    Group items that share a canonical key, in order of first appearance;
+    the first item of each group is the one to keep. Items without a key
+    are never grouped.
+    """
+    groups: List[List[T]] = []
+    by_key: Dict[str, List[T]] = {}
+    for item in items:
+        item_key = key(item)
+        if item_key is None:
+            groups.append([item])
+        elif item_key in by_key:
+            by_key[item_key].append(item)
+        else:
+            by_key[item_key] = [item]
+            groups.append(by_key[item_key])
+    return groups
@@ -0,0 +1,430 @@
+"""
+Immutable memory-mapped song catalog for QueueBeats backend
+A catalog file holds the songs as columns (string tables plus offset arrays)
+together with the prebuilt prefix search index. Workers mmap it read-only,
+so opening it is near-instant and every uvicorn worker shares the same
+physical pages instead of holding its own copy of the catalog as dicts.
+
+New versions are written next to the live file and renamed over it; readers
+notice the change and switch to the new file without a restart.
+
+Build a catalog from the command line (run from the backend directory):
+    python -m app.utils.catalog_file data/catalog.qbc --mock --sqlite data/track_catalog.sqlite3
+"""
+
+import argparse
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from app.utils.song_index import FIELDS, SongIndex
+from app.utils.text_normalize import normalize_text
+
+MAGIC = b"QBCATLG\0"
+VERSION = 2
+
+HEADER = struct.Struct("<8sII")        # magic, version, section count
+SECTION = struct.Struct("<24sQQ")      # name, offset, length
+ALIGNMENT = 8
+
+STRING_COLUMNS = ("id", "title", "artist", "album", "cover_url")
+INT_COLUMNS = ("duration_ms", "popularity")
+MISSING_INT = -1
+
+DEFAULT_CATALOG_FILE = Path(__file__).resolve().parent.parent.parent / "data" / "catalog.qbc"
+
+
+class CatalogFormatError(Exception):
+    """Raised when a file is not a catalog this version can read"""
+
+
+# Writing
+
+def _string_table(values: Iterable[Optional[str]]) -> Tuple[bytes, bytes]:
+    """Concatenated UTF-8 values and their n + 1 offsets; None is stored as empty"""
+    offsets = [0]
+    chunks = []
+    total = 0
+    for value in values:
+        encoded = (value or "").encode("utf-8")
+        chunks.append(encoded)
+        total += len(encoded)
+        offsets.append(total)
+    return struct.pack(f"<{len(offsets)}Q", *offsets), b"".join(chunks)
+
+
+def _posting_table(postings: Iterable[Sequence[int]]) -> Tuple[bytes, bytes]:
+    offsets = [0]
+    data = bytearray()
+    for posting in postings:
+        data += struct.pack(f"<{len(posting)}I", *posting)
+        offsets.append(offsets[-1] + len(posting))
+    return struct.pack(f"<{len(offsets)}Q", *offsets), bytes(data)
+
+
+def write_catalog(path: str, songs: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Build the index for songs and write a catalog file at path atomically:
+    the file is written under a temporary name and renamed into place.
+    """
+    started = time.monotonic()
+    index = SongIndex(songs)
+    ranked = index.songs
+    terms, postings, short_prefixes = index.structures()
+
+    sections: Dict[str, bytes] = {}
+    for column in STRING_COLUMNS:
+        sections[f"{column}.offsets"], sections[f"{column}.data"] = _string_table(
+            str(song[column]) if song.get(column) is not None else None for song in ranked
+        )
+    # Normalized search text per field, so readers never re-normalize songs
+    for field in FIELDS:
+        sections[f"{field}.tokens.offsets"], sections[f"{field}.tokens.data"] = _string_table(
+            normalize_text(song.get(field)) for song in ranked
+        )
+    for column in INT_COLUMNS:
+        sections[column] = struct.pack(
+            f"<{len(ranked)}q",
+            *(song[column] if song.get(column) is not None else MISSING_INT for song in ranked)
+        )
+
+    # Documents ordered by id, for lookups by id
+    id_order = sorted(range(len(ranked)), key=lambda doc_id: str(ranked[doc_id]["id"]))
+    sections["id_order"] = struct.pack(f"<{len(id_order)}I", *id_order)
+
+    sections["terms.offsets"], sections["terms.data"] = _string_table(terms)
+    sections["postings.offsets"], sections["postings.data"] = _posting_table(postings)
+
+    prefixes = sorted(short_prefixes)
+    sections["prefixes.offsets"], sections["prefixes.data"] = _string_table(prefixes)
+    sections["prefix_heads.offsets"], sections["prefix_heads.data"] = _posting_table(
+        short_prefixes[prefix] for prefix in prefixes
+    )
+
+    directory_size = HEADER.size + SECTION.size * len(sections)
+    offset = _align(directory_size)
+    directory = [HEADER.pack(MAGIC, VERSION, len(sections))]
+    layout = []
+    for name, payload in sections.items():
+        directory.append(SECTION.pack(name.encode("ascii"), offset, len(payload)))
+        layout.append((offset, payload))
+        offset = _align(offset + len(payload))
+
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    temporary = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    try:
+        with open(temporary, "wb") as f:
+            f.write(b"".join(directory))
+            for section_offset, payload in layout:
+                f.seek(section_offset)
+                f.write(payload)
+            f.truncate(offset)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, target)
+    finally:
+        if temporary.exists():
+            temporary.unlink()
+
+    return {
+        "path": str(target),
+        "songs": len(ranked),
+        "terms": len(terms),
+        "bytes": offset,
+        "seconds": round(time.monotonic() - started, 2)
+    }
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+# Reading
+
+class _StringColumn(Sequence):
+    """Read-only view of a string table"""
+
+    def __init__(self, offsets: memoryview, data: memoryview):
+        self._offsets = offsets
+        self._data = data
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("string column index out of range")
+        return str(self._data[self._offsets[index]:self._offsets[index + 1]], "utf-8")
+
+
+class _PostingColumn(Sequence):
+    """Read-only view of posting lists; each item is a memoryview of document ids"""
+
+    def __init__(self, offsets: memoryview, data: memoryview):
+        self._offsets = offsets
+        self._data = data
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("posting column index out of range")
+        return self._data[self._offsets[index]:self._offsets[index + 1]]
+
+
+class _PrefixHeads:
+    """Short prefix -> first candidates, looked up by binary search"""
+
+    def __init__(self, prefixes: _StringColumn, heads: _PostingColumn):
+        self._prefixes = prefixes
+        self._heads = heads
+
+    def __len__(self) -> int:
+        return len(self._prefixes)
+
+    def get(self, prefix: str) -> Optional[memoryview]:
+        position = bisect_left(self._prefixes, prefix)
+        if position < len(self._prefixes) and self._prefixes[position] == prefix:
+            return self._heads[position]
+        return None
+
+
+class _SongRows(Sequence):
+    """Songs as dicts, decoded from the columns on access"""
+
+    def __init__(self, catalog: "CatalogFile"):
+        self._catalog = catalog
+
+    def __len__(self) -> int:
+        return self._catalog.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("song index out of range")
+        return self._catalog.song(index)
+
+
+class _DocTokens(Sequence):
+    """Per-document field tokens, split from the stored normalized text"""
+
+    def __init__(self, fields: List[_StringColumn], count: int):
+        self._fields = fields
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, doc_id):
+        return tuple(tuple(column[doc_id].split()) for column in self._fields)
+
+
+class CatalogFile:
+    """A catalog file mapped read-only, with its search index"""
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        with open(self.path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self.identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        view = memoryview(self._mmap)
+        if len(view) < HEADER.size:
+            raise CatalogFormatError(f"{self.path} is too small to be a catalog file")
+        magic, version, section_count = HEADER.unpack_from(view, 0)
+        if magic != MAGIC or version != VERSION:
+            raise CatalogFormatError(f"{self.path} is not a version {VERSION} catalog file")
+
+        self._sections: Dict[str, memoryview] = {}
+        for i in range(section_count):
+            raw_name, offset, length = SECTION.unpack_from(view, HEADER.size + i * SECTION.size)
+            self._sections[raw_name.rstrip(b"\0").decode("ascii")] = view[offset:offset + length]
+
+        self.columns = {
+            column: _StringColumn(self._section(f"{column}.offsets", "Q"), self._section(f"{column}.data"))
+            for column in STRING_COLUMNS
+        }
+        self._ints = {column: self._section(column, "q") for column in INT_COLUMNS}
+        self._id_order = self._section("id_order", "I")
+        self.count = len(self.columns["id"])
+
+        postings_offsets = self._section("postings.offsets", "Q")
+        self.index = SongIndex.from_storage(
+            songs=_SongRows(self),
+            doc_tokens=_DocTokens(
+                [
+                    _StringColumn(self._section(f"{field}.tokens.offsets", "Q"), self._section(f"{field}.tokens.data"))
+                    for field in FIELDS
+                ],
+                self.count
+            ),
+            terms=_StringColumn(self._section("terms.offsets", "Q"), self._section("terms.data")),
+            postings=_PostingColumn(postings_offsets, self._section("postings.data", "I")),
+            # Posting offsets are the running document frequency totals
+            cumulative=postings_offsets,
+            short_prefixes=_PrefixHeads(
+                _StringColumn(self._section("prefixes.offsets", "Q"), self._section("prefixes.data")),
+                _PostingColumn(self._section("prefix_heads.offsets", "Q"), self._section("prefix_heads.data", "I"))
+            )
+        )
+
+    def _section(self, name: str, format: Optional[str] = None) -> memoryview:
+        try:
+            section = self._sections[name]
+        except KeyError:
+            raise CatalogFormatError(f"{self.path} has no {name} section")
+        return section.cast(format) if format else section
+
+    def song(self, doc_id: int) -> Dict[str, Any]:
+        song: Dict[str, Any] = {column: self.columns[column][doc_id] or None for column in STRING_COLUMNS}
+        for column, values in self._ints.items():
+            song[column] = values[doc_id] if values[doc_id] != MISSING_INT else None
+        return song
+
+    def get(self, song_id: str) -> Optional[Dict[str, Any]]:
+        ids = self.columns["id"]
+        low, high = 0, len(self._id_order)
+        while low < high:
+            middle = (low + high) // 2
+            if ids[self._id_order[middle]] < song_id:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self._id_order) and ids[self._id_order[low]] == song_id:
+            return self.song(self._id_order[low])
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "bytes": len(self._mmap),
+            **self.index.stats()
+        }
+
+
+class CatalogFileHandle:
+    """
+    The current version of a catalog file. At most every check_interval
+    seconds the path is stat'ed; if a new file was renamed into place it is
+    opened and swapped in. Searches already running keep using the old
+    mapping, which is released once nothing refers to it.
+    """
+
+    def __init__(self, path: str, check_interval: float = 5.0):
+        self.path = str(path)
+        self.check_interval = check_interval
+        self._current: Optional[CatalogFile] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    def get(self) -> Optional[CatalogFile]:
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval:
+            with self._lock:
+                if now - self._checked_at >= self.check_interval:
+                    self._checked_at = now
+                    self._reload_if_changed()
+        return self._current
+
+    def _reload_if_changed(self) -> None:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if self._current is not None and self._current.identity == identity:
+            return
+        try:
+            catalog = CatalogFile(self.path)
+        except (OSError, ValueError, CatalogFormatError) as e:
+            # Keep serving the previous version
+            print(f"Could not open catalog file {self.path}: {str(e)}")
+            return
+        self._current = catalog
+        self.reloads += 1
+        print(f"Loaded catalog file: {catalog.stats()}")
+
+
+_handle: Optional[CatalogFileHandle] = None
+
+
+def get_catalog_file() -> Optional[CatalogFile]:
+    """The current catalog file, or None when there is none at CATALOG_FILE"""
+    global _handle
+    if _handle is None:
+        _handle = CatalogFileHandle(
+            os.environ.get("CATALOG_FILE", str(DEFAULT_CATALOG_FILE)),
+            check_interval=float(os.environ.get("CATALOG_FILE_CHECK_INTERVAL", "5"))
+        )
+    return _handle.get()
+
+
+# Builder command
+
+def _songs_from_sqlite(path: str) -> Iterator[Dict[str, Any]]:
+    """Tracks from the persistent track catalog, as songs"""
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = connection.execute(
+            "SELECT id, name, artists, album, album_art, duration_ms, popularity FROM tracks"
+        )
+        for track_id, name, artists, album, album_art, duration_ms, popularity in rows:
+            yield {
+                "id": track_id,
+                "title": name,
+                "artist": ", ".join(json.loads(artists) if artists else []),
+                "album": album,
+                "cover_url": album_art,
+                "duration_ms": duration_ms,
+                "popularity": popularity
+            }
+    finally:
+        connection.close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Build an immutable catalog file and swap it into place")
+    parser.add_argument("output", nargs="?", default=str(DEFAULT_CATALOG_FILE), help="Catalog file to write")
+    parser.add_argument("--mock", action="store_true", help="Include the built-in MOCK_SONGS")
+    parser.add_argument("--sqlite", action="append", default=[], help="Include tracks from a track catalog database")
+    args = parser.parse_args(argv)
+
+    songs: Dict[str, Dict[str, Any]] = {}
+    if args.mock:
+        from app.apis.songs import MOCK_SONGS
+        for song in MOCK_SONGS:
+            songs[song["id"]] = song
+    for path in args.sqlite:
+        for song in _songs_from_sqlite(path):
+            songs[song["id"]] = song
+
+    if not songs:
+        parser.error("no songs to write; pass --mock and/or --sqlite")
+
+    print(json.dumps(write_catalog(args.output, list(songs.values()))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,412 @@
+"""
+Bulk track catalog ingestion for QueueBeats backend
+Streams NDJSON or JSON-array dumps of track metadata (optionally gzipped)
+into the track catalog in batches. Memory stays bounded by the batch size
+however large the dump is. Records are normalized to the catalog's track
+shape and deduplicated by id; the full-text index is updated in the same
+transaction as each batch.
+
+Re-ingesting is incremental. Unchanged tracks are skipped by content hash,
+and a checkpoint per dump file records how far it was committed, so an
+interrupted run resumes where it stopped and an NDJSON dump that was only
+appended to is read from the previous end.
+
+Run from the backend directory:
+    python -m app.utils.catalog_ingest tracks.ndjson.gz --catalog-file data/catalog.qbc
+"""
+
+import argparse
+import codecs
+import gzip
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from app.utils.track_catalog import DEFAULT_CATALOG_PATH, connect_catalog, create_catalog_schema, upsert_tracks
+
+CHECKPOINT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+    source TEXT PRIMARY KEY,
+    head_hash TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    records INTEGER NOT NULL,
+    complete INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+# Bytes hashed to recognise a dump that was appended to rather than replaced
+HEAD_BYTES = 64 * 1024
+READ_CHUNK = 1024 * 1024
+
+
+def normalize_record(record: Any) -> Optional[Dict[str, Any]]:
+    """
+    Map a dump record to the catalog track shape, or None if it is unusable.
+    Accepts Spotify API track objects as well as flat song records.
+    """
+    if not isinstance(record, dict):
+        return None
+    # Spotify "saved tracks"/playlist items wrap the track
+    if isinstance(record.get("track"), dict):
+        record = record["track"]
+
+    track_id = _clean(record.get("id"))
+    name = _clean(record.get("name") or record.get("title"))
+    if not track_id or not name:
+        return None
+
+    artists = record.get("artists")
+    if isinstance(artists, list):
+        artists = [_clean(a.get("name") if isinstance(a, dict) else a) for a in artists]
+    else:
+        artists = [_clean(part) for part in str(record.get("artist") or "").split(",")]
+    artists = [artist for artist in artists if artist]
+
+    album = record.get("album")
+    album_art = _clean(record.get("album_art") or record.get("cover_url"))
+    if isinstance(album, dict):
+        images = album.get("images") or []
+        if not album_art and images and isinstance(images[0], dict):
+            album_art = _clean(images[0].get("url"))
+        album = album.get("name")
+
+    return {
+        "id": track_id,
+        "name": name,
+        "uri": _clean(record.get("uri")) or f"spotify:track:{track_id}",
+        "artists": artists,
+        "album": _clean(album),
+        "album_art": album_art,
+        "duration_ms": _int_or_none(record.get("duration_ms")),
+        "popularity": _int_or_none(record.get("popularity")),
+        "preview_url": _clean(record.get("preview_url")),
+        "isrc": _clean((record.get("external_ids") or {}).get("isrc") or record.get("isrc"))
+    }
+
+
+def _clean(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    text = " ".join(str(value).split())
+    return text or None
+
+
+def _int_or_none(value: Any) -> Optional[int]:
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+# Reading
+
+def _open_dump(path: str) -> Tuple[BinaryIO, bool]:
+    """The dump opened for binary reading, and whether it is gzipped"""
+    with open(path, "rb") as f:
+        compressed = f.read(2) == b"\x1f\x8b"
+    return (gzip.open(path, "rb") if compressed else open(path, "rb")), compressed
+
+
+def _detect_format(f: BinaryIO) -> str:
+    """Tell a JSON-array dump from NDJSON by its first character, without consuming input"""
+    return "json" if f.peek(4096).lstrip().startswith(b"[") else "ndjson"
+
+
+def iter_ndjson(f: BinaryIO, offset: int = 0) -> Iterator[Tuple[Any, int]]:
+    """Yields (record, offset just past it); malformed lines yield None"""
+    if offset:
+        f.seek(offset)
+    position = offset
+    for line in f:
+        position += len(line)
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line), position
+        except ValueError:
+            yield None, position
+
+
+def iter_json_array(f: BinaryIO) -> Iterator[Tuple[Any, int]]:
+    """Yields (record, bytes consumed) from a top-level JSON array without loading it whole"""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    # Bytes before buffer[counted] are already included in consumed
+    counted = 0
+    consumed = 0
+    reader = _text_chunks(f)
+    started = False
+
+    while True:
+        # Skip whitespace and separators, refilling as needed
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position < len(buffer):
+                break
+            consumed += len(buffer[counted:].encode("utf-8"))
+            buffer, position, counted = next(reader, None), 0, 0
+            if buffer is None:
+                return
+
+        if not started:
+            if buffer[position] != "[":
+                raise ValueError("JSON dump must be a top-level array")
+            started = True
+            position += 1
+            continue
+        if buffer[position] == "]":
+            return
+
+        while True:
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+                break
+            except ValueError:
+                more = next(reader, None)
+                if more is None:
+                    raise
+                # Drop what has been parsed only when reading a new chunk, so
+                # records within a chunk are parsed without copying the buffer
+                consumed += len(buffer[counted:position].encode("utf-8"))
+                buffer, position, counted = buffer[position:] + more, 0, 0
+
+        consumed += len(buffer[counted:end].encode("utf-8"))
+        yield record, consumed
+        position = counted = end
+
+
+def _text_chunks(f: BinaryIO) -> Iterator[str]:
+    # The incremental decoder holds back characters split across chunks
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    while True:
+        chunk = f.read(READ_CHUNK)
+        text = decoder.decode(chunk, final=not chunk)
+        if text:
+            yield text
+        if not chunk:
+            return
+
+
+# Checkpoints
+
+def _file_identity(path: str) -> Dict[str, Any]:
+    stat = os.stat(path)
+    return {"path": path, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "head_hash": _head_hash(path, HEAD_BYTES)}
+
+
+def _head_hash(path: str, length: int) -> str:
+    with open(path, "rb") as f:
+        return hashlib.blake2b(f.read(length), digest_size=16).hexdigest()
+
+
+def _checkpoint_hash(identity: Dict[str, Any], offset: int) -> str:
+    """
+    Hash of the head as of a checkpoint at offset: only the bytes already
+    read, so rows appended to a dump smaller than HEAD_BYTES don't change it
+    """
+    length = min(HEAD_BYTES, offset) if offset else HEAD_BYTES
+    if length == HEAD_BYTES:
+        return identity["head_hash"]
+    return _head_hash(identity["path"], length)
+
+
+def _load_checkpoint(connection, source: str) -> Optional[Dict[str, Any]]:
+    row = connection.execute(
+        "SELECT head_hash, size, mtime_ns, offset, records, complete FROM ingest_checkpoints WHERE source = ?",
+        (source,)
+    ).fetchone()
+    return dict(row) if row else None
+
+
+def _save_checkpoint(
+    connection,
+    source: str,
+    identity: Dict[str, Any],
+    offset: int,
+    records: int,
+    complete: bool
+) -> None:
+    connection.execute(
+        """
+        INSERT INTO ingest_checkpoints (source, head_hash, size, mtime_ns, offset, records, complete, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(source) DO UPDATE SET
+            head_hash = excluded.head_hash, size = excluded.size, mtime_ns = excluded.mtime_ns,
+            offset = excluded.offset, records = excluded.records, complete = excluded.complete,
+            updated_at = excluded.updated_at
+        """,
+        (
+            source, _checkpoint_hash(identity, offset), identity["size"], identity["mtime_ns"],
+            offset, records, int(complete), time.time()
+        )
+    )
+
+
+def _resume_offset(checkpoint: Optional[Dict[str, Any]], identity: Dict[str, Any], resumable: bool) -> Optional[int]:
+    """
+    Where to start reading given the last checkpoint: None if the dump is
+    unchanged and already complete, otherwise a byte offset (0 = from the start)
+    """
+    if checkpoint is None or checkpoint["head_hash"] != _checkpoint_hash(identity, checkpoint["offset"]):
+        return 0
+    same_file = checkpoint["size"] == identity["size"] and checkpoint["mtime_ns"] == identity["mtime_ns"]
+    if checkpoint["complete"] and same_file:
+        return None
+    if not resumable:
+        return 0
+    if same_file or (checkpoint["complete"] and checkpoint["size"] < identity["size"]):
+        # Interrupted, or only appended to since: continue after the last commit
+        return checkpoint["offset"]
+    # Rewritten in place: read it all again; unchanged tracks are skipped by hash
+    return 0
+
+
+# Ingestion
+
+class IngestStats:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.read = 0
+        self.invalid = 0
+        self.duplicates = 0
+        self.changed = 0
+        self.batches = 0
+
+    def rate(self) -> float:
+        elapsed = time.monotonic() - self.started
+        return self.read / elapsed if elapsed > 0 else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "read": self.read,
+            "invalid": self.invalid,
+            "duplicates": self.duplicates,
+            "changed": self.changed,
+            "unchanged": self.read - self.invalid - self.duplicates - self.changed,
+            "batches": self.batches,
+            "seconds": round(time.monotonic() - self.started, 1),
+            "tracks_per_sec": int(self.rate())
+        }
+
+
+def ingest_dump(
+    dump_path: str,
+    catalog_path: Optional[str] = None,
+    batch_size: int = 5000,
+    progress_interval: float = 5.0,
+    full: bool = False
+) -> Dict[str, Any]:
+    """
+    Stream a dump into the track catalog. With full=True the checkpoint is
+    ignored and the whole dump is read again (unchanged tracks are still
+    skipped by hash).
+    """
+    catalog_path = str(catalog_path or DEFAULT_CATALOG_PATH)
+    Path(catalog_path).parent.mkdir(parents=True, exist_ok=True)
+    connection = connect_catalog(catalog_path)
+    create_catalog_schema(connection)
+    connection.executescript(CHECKPOINT_SCHEMA)
+
+    source = os.path.realpath(dump_path)
+    identity = _file_identity(dump_path)
+    checkpoint = None if full else _load_checkpoint(connection, source)
+    stats = IngestStats()
+
+    f, compressed = _open_dump(dump_path)
+    try:
+        dump_format = _detect_format(f)
+        # Byte offsets can only be resumed from in an uncompressed NDJSON file
+        resumable = dump_format == "ndjson" and not compressed
+
+        start_offset = _resume_offset(checkpoint, identity, resumable)
+        if start_offset is None:
+            print(f"{dump_path} is unchanged since the last ingest; nothing to do")
+            return {"source": source, "skipped": True, **stats.as_dict()}
+        records_before = checkpoint["records"] if start_offset and checkpoint else 0
+        if start_offset:
+            print(f"Resuming {dump_path} at byte {start_offset:,} ({records_before:,} records already ingested)")
+
+        records = iter_ndjson(f, start_offset) if dump_format == "ndjson" else iter_json_array(f)
+        batch: Dict[str, Dict[str, Any]] = {}
+        offset = start_offset
+        last_report = time.monotonic()
+
+        def commit(complete: bool = False) -> None:
+            with connection:
+                if batch:
+                    stats.changed += upsert_tracks(connection, batch.values())
+                _save_checkpoint(
+                    connection, source, identity,
+                    offset if resumable else 0, records_before + stats.read, complete
+                )
+            stats.batches += 1
+            batch.clear()
+
+        for record, offset in records:
+            stats.read += 1
+            track = normalize_record(record)
+            if track is None:
+                stats.invalid += 1
+            elif track["id"] in batch:
+                # Later copies in a dump win; earlier batches are reconciled by hash
+                stats.duplicates += 1
+                batch[track["id"]] = track
+            else:
+                batch[track["id"]] = track
+
+            if len(batch) >= batch_size:
+                commit()
+
+            if time.monotonic() - last_report >= progress_interval:
+                last_report = time.monotonic()
+                _report_progress(stats, offset, identity["size"])
+
+        commit(complete=True)
+    finally:
+        f.close()
+        connection.close()
+
+    result = {"source": source, "skipped": False, **stats.as_dict()}
+    print(f"Ingested {dump_path}: {result}")
+    return result
+
+
+def _report_progress(stats: IngestStats, offset: int, size: int) -> None:
+    percent = f", {100.0 * min(offset, size) / size:.1f}%" if size else ""
+    print(
+        f"  {stats.read:,} records ({stats.changed:,} changed, {stats.invalid:,} invalid)"
+        f"{percent}, {int(stats.rate()):,} tracks/sec"
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Stream NDJSON/JSON track dumps into the local track catalog")
+    parser.add_argument("dumps", nargs="+", help="NDJSON or JSON-array dump files, optionally gzipped")
+    parser.add_argument("--catalog", default=os.environ.get("TRACK_CATALOG_PATH"), help="Track catalog database")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--progress-interval", type=float, default=5.0, help="Seconds between progress reports")
+    parser.add_argument("--full", action="store_true", help="Ignore checkpoints and re-read every dump")
+    parser.add_argument("--catalog-file", help="Rebuild this memory-mapped catalog file afterwards if anything changed")
+    args = parser.parse_args(argv)
+
+    changed = 0
+    for dump in args.dumps:
+        result = ingest_dump(dump, args.catalog, args.batch_size, args.progress_interval, args.full)
+        changed += result["changed"]
+
+    if args.catalog_file and changed:
+        from app.utils.catalog_file import main as build_catalog_file
+        build_catalog_file([args.catalog_file, "--sqlite", str(args.catalog or DEFAULT_CATALOG_PATH)])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Fair round-robin ordering for QueueBeats backend
+In fair mode songs are interleaved by who added them, so one guest adding
+thirty songs can't push everybody else down. It is start-time fair queueing:
+each user has a sub-queue of their songs (best voted first) and a virtual
+start time, and a song costs its user 1 / (1 + votes) of virtual time. The
+next song is the head of the user whose head finishes first, so plain songs
+alternate between users while voted songs get their user served sooner.
+
+Users are kept in a lazy min-heap keyed by their head song's finish tag. An
+add, vote or pop touches one sub-queue (O(log songs of that user)) and
+pushes one heap entry (O(log users)); nothing is ever re-sorted.
+"""
+
+import heapq
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.utils.order_tree import OrderTree
+
+
+def song_cost(entry) -> float:
+    """Virtual time a song uses up: votes make it cheaper"""
+    return 1.0 / (1 + max(0, entry.total_votes))
+
+
+def user_key(entry) -> str:
+    # Songs without an adder share one anonymous turn
+    return entry.added_by or ""
+
+
+class _UserQueue:
+    __slots__ = ("songs", "start", "tag", "head_seq")
+
+    def __init__(self, start: float):
+        # sort_key -> entry: most votes, then rank key
+        self.songs: OrderTree = OrderTree()
+        self.start = start
+        self.tag: Optional[float] = None
+        self.head_seq: Optional[int] = None
+
+
+class FairScheduler:
+    """
+    Round-robin order over the users of one queue.
+
+    Entries are QueueEntry objects; the scheduler reads their sort_key,
+    total_votes, rank_key, seq and added_by. Call reposition() after an
+    entry's sort key changes and serve() just before the next song is taken
+    off the queue.
+    """
+
+    def __init__(self):
+        self._users: Dict[str, _UserQueue] = {}
+        # (finish tag, head rank key, head seq, user); stale entries are skipped
+        self._heap: List[Tuple[float, str, int, str]] = []
+        # Finish tag of the last song served
+        self.virtual_time = 0.0
+
+    def add(self, entry) -> None:
+        key = user_key(entry)
+        user = self._users.get(key)
+        if user is None:
+            # Users are dropped once they have no songs, so a returning user
+            # starts at the current virtual time and can't bank turns. Their
+            # old start was never past it: serve() moves virtual_time up to
+            # every tag it charges
+            user = self._users[key] = _UserQueue(self.virtual_time)
+        user.songs.insert(entry.sort_key, entry)
+        self._refresh(key, user)
+
+    def remove(self, entry) -> None:
+        key = user_key(entry)
+        user = self._users[key]
+        user.songs.remove(entry.sort_key)
+        self._refresh(key, user)
+
+    def reposition(self, entry, old_sort_key) -> None:
+        """Move an entry within its user's sub-queue after its sort key changed"""
+        key = user_key(entry)
+        user = self._users[key]
+        user.songs.remove(old_sort_key)
+        user.songs.insert(entry.sort_key, entry)
+        self._refresh(key, user)
+
+    def rekey(self) -> None:
+        """Pick up changed sort keys that kept their order (rank rebalancing)"""
+        for user in self._users.values():
+            user.songs.rekey(lambda entry: entry.sort_key)
+        self._rebuild_heap()
+
+    def _refresh(self, key: str, user: _UserQueue) -> None:
+        """Recompute the user's head tag and push it; old heap entries go stale"""
+        first = user.songs.first()
+        if first is None:
+            # Stale heap entries for the user fail _valid once it is gone
+            del self._users[key]
+            return
+        head = first[1]
+        tag = user.start + song_cost(head)
+        user.tag = tag
+        user.head_seq = head.seq
+        heapq.heappush(self._heap, (tag, head.rank_key, head.seq, key))
+        if len(self._heap) > 2 * len(self._users) + 64:
+            self._rebuild_heap()
+
+    def _rebuild_heap(self) -> None:
+        self._heap = []
+        for key, user in self._users.items():
+            first = user.songs.first()
+            if first is not None:
+                self._heap.append((user.tag, first[1].rank_key, first[1].seq, key))
+        heapq.heapify(self._heap)
+
+    def _valid(self, item: Tuple[float, str, int, str]) -> bool:
+        tag, rank_key, seq, key = item
+        user = self._users.get(key)
+        if user is None or user.tag != tag or user.head_seq != seq:
+            return False
+        # A move can change the head's rank key without changing its tag
+        return user.songs.first()[1].rank_key == rank_key
+
+    def peek(self):
+        """The entry that plays next, or None"""
+        while self._heap and not self._valid(self._heap[0]):
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return None
+        user = self._users[self._heap[0][3]]
+        return user.songs.first()[1]
+
+    def serve(self, entry) -> None:
+        """Charge the entry's user for playing it; call before removing it"""
+        user = self._users[user_key(entry)]
+        tag = user.start + song_cost(entry)
+        user.start = tag
+        self.virtual_time = max(self.virtual_time, tag)
+
+    def ordered(self, limit: Optional[int] = None) -> Iterator:
+        """
+        Entries in play order, stopping after limit: the scheduler run
+        forward on iterators over each sub-queue, without changing state.
+        O(users + k log users) for the first k.
+        """
+        heap = []
+        for key, user in self._users.items():
+            songs = user.songs.values()
+            head = next(songs, None)
+            if head is not None:
+                heap.append((user.start + song_cost(head), head.rank_key, head.seq, key, head, songs))
+        heapq.heapify(heap)
+
+        produced = 0
+        while heap and (limit is None or produced < limit):
+            tag, _, _, key, entry, songs = heapq.heappop(heap)
+            yield entry
+            produced += 1
+            following = next(songs, None)
+            if following is not None:
+                heapq.heappush(heap, (tag + song_cost(following), following.rank_key, following.seq, key, following, songs))
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "users": len(self._users),
+            "heap": len(self._heap),
+            "virtual_time": round(self.virtual_time, 3)
+        }
@@ -0,0 +1,109 @@
+"""
+Trigram index over search vocabulary for QueueBeats backend
+Finds catalog terms that look like a misspelled query token ("beleiver" ->
+"believer"). Trigram overlap picks a short list of candidates, which are then
+checked by edit distance so transposed letters ("lvoe") still match. The
+index covers distinct terms rather than songs, so it stays small as the
+catalog grows, and terms are bucketed by length so only plausible candidates
+are counted.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+# Candidates sharing the most trigrams with the token that are verified
+VERIFY_CANDIDATES = 64
+
+
+def trigrams(term: str) -> List[str]:
+    """Distinct trigrams of a term padded like pg_trgm, so word starts weigh more"""
+    padded = f"  {term} "
+    return list(dict.fromkeys(padded[i:i + 3] for i in range(len(padded) - 2)))
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance where swapping two adjacent letters costs one edit"""
+    previous_row: List[int] = []
+    row = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before_previous, previous_row = previous_row, row
+        row = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            row[j] = min(previous_row[j] + 1, row[j - 1] + 1, previous_row[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                row[j] = min(row[j], before_previous[j - 2] + 1)
+    return row[-1]
+
+
+class TrigramIndex:
+    """
+    Maps trigrams to the terms containing them, each posting sorted by term
+    length. A candidate's similarity is the better of its trigram Dice
+    coefficient and its edit similarity; ties go to the term found in more
+    songs.
+    """
+
+    def __init__(self, terms: Sequence[str], frequencies: Optional[Sequence[int]] = None, threshold: float = 0.5):
+        self.terms = list(terms)
+        self.frequencies = list(frequencies) if frequencies is not None else [1] * len(self.terms)
+        self.threshold = threshold
+
+        self._trigram_counts = array("H")
+        buckets: Dict[str, List[int]] = {}
+        for term_id, term in enumerate(self.terms):
+            grams = trigrams(term)
+            self._trigram_counts.append(min(len(grams), 65535))
+            for gram in grams:
+                buckets.setdefault(gram, []).append(term_id)
+
+        # Per trigram: term ids and their lengths, both ordered by length
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        for gram, term_ids in buckets.items():
+            term_ids.sort(key=lambda term_id: len(self.terms[term_id]))
+            self._postings[gram] = (
+                array("I", term_ids),
+                array("H", (min(len(self.terms[term_id]), 65535) for term_id in term_ids))
+            )
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def similar(self, token: str, limit: int = 5, threshold: Optional[float] = None) -> List[Tuple[str, float]]:
+        """Terms similar to token as (term, similarity), most similar first"""
+        threshold = self.threshold if threshold is None else threshold
+        grams = trigrams(token)
+        if not grams:
+            return []
+
+        # Terms much shorter or longer than the token can't reach the threshold
+        slack = max(2, len(token) // 3)
+        shortest, longest = len(token) - slack, len(token) + slack
+
+        counts: Counter = Counter()
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if posting is None:
+                continue
+            term_ids, lengths = posting
+            counts.update(term_ids[bisect_left(lengths, shortest):bisect_right(lengths, longest)])
+
+        scored = []
+        for term_id, common in counts.most_common(VERIFY_CANDIDATES):
+            term = self.terms[term_id]
+            dice = 2.0 * common / (len(grams) + self._trigram_counts[term_id])
+            similarity = max(dice, 1.0 - edit_distance(token, term) / max(len(token), len(term)))
+            if similarity >= threshold:
+                scored.append((-similarity, -self.frequencies[term_id], term))
+
+        scored.sort()
+        return [(term, -negative) for negative, _, term in scored[:limit]]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "terms": len(self.terms),
+            "trigrams": len(self._postings)
+        }
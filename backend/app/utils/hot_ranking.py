@@ -0,0 +1,250 @@
+"""
+Hot-score ranking for QueueBeats backend
+In hot mode a queue is ordered by vote momentum instead of raw totals. Each
+vote counts for vote_count / (1 + age / time_scale) ** gravity, so a burst of
+recent votes beats an older pile. Those weights decay at different rates, so
+the order changes as time passes and the whole queue has to be scored again
+from time to time. HotRanker keeps vote counts and times in NumPy arrays and
+re-ranks every song in one vectorized pass. python_hot_order is the plain loop
+it replaces, kept as the benchmark baseline.
+"""
+
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DEFAULT_GRAVITY = 1.5
+DEFAULT_TIME_SCALE = 600.0
+DEFAULT_INTERVAL = 5.0
+
+
+def hot_ranking_available() -> bool:
+    return np is not None
+
+
+def python_hot_order(
+    votes: Iterable[Tuple[str, float, float]],
+    song_ids: List[str],
+    now: float,
+    gravity: float = DEFAULT_GRAVITY,
+    time_scale: float = DEFAULT_TIME_SCALE
+) -> List[str]:
+    """
+    Song ids by descending hot score, ties in the order of song_ids.
+    votes are (song_id, vote_count, voted_at) tuples.
+    """
+    scores = dict.fromkeys(song_ids, 0.0)
+    for song_id, count, voted_at in votes:
+        if song_id in scores:
+            age = max(0.0, now - voted_at)
+            scores[song_id] += count / (1 + age / time_scale) ** gravity
+    tie = {song_id: i for i, song_id in enumerate(song_ids)}
+    return sorted(song_ids, key=lambda song_id: (-scores[song_id], tie[song_id]))
+
+
+class HotRanker:
+    """
+    Vote momentum for one queue, stored column-wise.
+
+    Songs own slots in the song arrays and every (song, user) vote owns a
+    row in the vote arrays; changing a vote overwrites its row. Removed
+    songs leave dead slots and rows behind until there are as many dead as
+    live, when the arrays are compacted.
+
+    rank() scores every song and caches the resulting order with each
+    song's start offset (sum of the durations before it). The cache is
+    rebuilt when something changes or when it is older than `interval`
+    seconds, since scores keep decaying.
+    """
+
+    def __init__(
+        self,
+        gravity: float = DEFAULT_GRAVITY,
+        time_scale: float = DEFAULT_TIME_SCALE,
+        interval: float = DEFAULT_INTERVAL,
+        capacity: int = 64
+    ):
+        if np is None:
+            raise RuntimeError("hot ranking needs numpy")
+        self.gravity = gravity
+        self.time_scale = time_scale
+        self.interval = interval
+
+        self._slot_of: Dict[str, int] = {}
+        self._song_of: List[Optional[str]] = []
+        self._alive = np.zeros(capacity, dtype=bool)
+        # Order of songs with equal scores (rank key order)
+        self._tie = np.zeros(capacity, dtype=np.int64)
+        self._duration = np.zeros(capacity, dtype=np.int64)
+        self._next_tie = 0
+        self.ties_stale = False
+
+        # song id -> user id -> vote row
+        self._rows_of_song: Dict[str, Dict[str, int]] = {}
+        self._row_slot = np.zeros(capacity, dtype=np.int64)
+        self._row_count = np.zeros(capacity, dtype=np.float64)
+        self._row_time = np.zeros(capacity, dtype=np.float64)
+        self._rows = 0
+        self._dead_rows = 0
+
+        self._order = np.zeros(0, dtype=np.int64)
+        self._position = np.zeros(capacity, dtype=np.int64)
+        self._offset_ms = np.zeros(0, dtype=np.int64)
+        self.ranked_at: Optional[float] = None
+        self.dirty = True
+
+        self.ranks = 0
+        self.last_rank_ms = 0.0
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+    @staticmethod
+    def _grow(array, size: int):
+        if size <= len(array):
+            return array
+        grown = np.zeros(max(size, 2 * len(array)), dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
+
+    def add(self, song_id: str, duration_ms: int, appended: bool = True) -> None:
+        """
+        Track a song. appended means it sorts after every song already here
+        among equal scores; otherwise the tie order must be rebuilt.
+        """
+        slot = len(self._song_of)
+        self._song_of.append(song_id)
+        self._slot_of[song_id] = slot
+        for name in ("_alive", "_tie", "_duration", "_position"):
+            setattr(self, name, self._grow(getattr(self, name), slot + 1))
+        self._alive[slot] = True
+        self._tie[slot] = self._next_tie
+        self._next_tie += 1
+        self._duration[slot] = duration_ms
+        self._rows_of_song[song_id] = {}
+        if not appended:
+            self.ties_stale = True
+        self.dirty = True
+
+    def vote(self, song_id: str, user_id: str, vote_count: int, voted_at: float) -> None:
+        song_rows = self._rows_of_song[song_id]
+        row = song_rows.get(user_id)
+        if row is None:
+            row = self._rows
+            self._rows += 1
+            for name in ("_row_slot", "_row_count", "_row_time"):
+                setattr(self, name, self._grow(getattr(self, name), self._rows))
+            song_rows[user_id] = row
+            self._row_slot[row] = self._slot_of[song_id]
+        self._row_count[row] = vote_count
+        self._row_time[row] = voted_at
+        self.dirty = True
+
+    def remove(self, song_id: str) -> None:
+        slot = self._slot_of.pop(song_id)
+        self._song_of[slot] = None
+        self._alive[slot] = False
+        rows = list(self._rows_of_song.pop(song_id).values())
+        self._row_count[rows] = 0
+        self._dead_rows += len(rows)
+        self.dirty = True
+        if len(self._song_of) > 2 * len(self._slot_of) + 64:
+            self._compact()
+
+    def set_ties(self, song_ids: Iterable[str]) -> None:
+        """Rebuild the tie order from song ids in rank key order"""
+        for tie, song_id in enumerate(song_ids):
+            self._tie[self._slot_of[song_id]] = tie
+            self._next_tie = tie + 1
+        self.ties_stale = False
+        self.dirty = True
+
+    def _compact(self) -> None:
+        """Drop dead slots and rows, renumbering what is left"""
+        live_slots = np.flatnonzero(self._alive[:len(self._song_of)])
+        new_slot = np.full(len(self._song_of), -1, dtype=np.int64)
+        new_slot[live_slots] = np.arange(len(live_slots))
+
+        live_rows = np.flatnonzero(new_slot[self._row_slot[:self._rows]] >= 0)
+        new_row = np.full(self._rows, -1, dtype=np.int64)
+        new_row[live_rows] = np.arange(len(live_rows))
+
+        self._song_of = [self._song_of[slot] for slot in live_slots]
+        self._slot_of = {song_id: slot for slot, song_id in enumerate(self._song_of)}
+        self._alive = self._alive[live_slots].copy()
+        self._tie = self._tie[live_slots].copy()
+        self._duration = self._duration[live_slots].copy()
+        self._position = np.zeros(len(live_slots), dtype=np.int64)
+
+        self._row_slot = new_slot[self._row_slot[live_rows]]
+        self._row_count = self._row_count[live_rows].copy()
+        self._row_time = self._row_time[live_rows].copy()
+        self._rows = len(live_rows)
+        self._dead_rows = 0
+        self._rows_of_song = {
+            song_id: {user_id: int(new_row[row]) for user_id, row in rows.items()}
+            for song_id, rows in self._rows_of_song.items()
+        }
+        self.dirty = True
+
+    def needs_rank(self, now: float) -> bool:
+        return self.dirty or self.ranked_at is None or now - self.ranked_at >= self.interval
+
+    def rank(self, now: float) -> None:
+        """Score every song and cache the order; one vectorized pass"""
+        started = time.perf_counter()
+        slots = len(self._song_of)
+        rows = self._rows
+
+        ages = np.maximum(now - self._row_time[:rows], 0.0)
+        weights = self._row_count[:rows] * (1 + ages / self.time_scale) ** -self.gravity
+        scores = np.bincount(self._row_slot[:rows], weights=weights, minlength=slots)
+
+        live_slots = np.flatnonzero(self._alive[:slots])
+        order = live_slots[np.lexsort((self._tie[live_slots], -scores[live_slots]))]
+        self._order = order
+        self._position[order] = np.arange(len(order))
+        durations = self._duration[order]
+        self._offset_ms = np.cumsum(durations) - durations
+
+        self.ranked_at = now
+        self.dirty = False
+        self.ranks += 1
+        self.last_rank_ms = (time.perf_counter() - started) * 1000
+
+    def song_ids(self, limit: Optional[int] = None) -> List[str]:
+        """Song ids in the cached order"""
+        order = self._order if limit is None else self._order[:limit]
+        return [self._song_of[slot] for slot in order.tolist()]
+
+    def offsets_ms(self, limit: Optional[int] = None) -> List[int]:
+        """Start offset of each song in the cached order"""
+        offsets = self._offset_ms if limit is None else self._offset_ms[:limit]
+        return offsets.tolist()
+
+    def position(self, song_id: str) -> Tuple[int, int]:
+        """(songs ahead, milliseconds of songs ahead) in the cached order"""
+        position = int(self._position[self._slot_of[song_id]])
+        return position, int(self._offset_ms[position])
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "songs": len(self._slot_of),
+            "votes": self._rows - self._dead_rows,
+            "ranks": self.ranks,
+            "last_rank_ms": round(self.last_rank_ms, 3)
+        }
+
+
+def make_hot_ranker() -> HotRanker:
+    """A ranker configured from the environment"""
+    return HotRanker(
+        gravity=float(os.environ.get("HOT_RANK_GRAVITY", str(DEFAULT_GRAVITY))),
+        time_scale=float(os.environ.get("HOT_RANK_TIME_SCALE", str(DEFAULT_TIME_SCALE))),
+        interval=float(os.environ.get("HOT_RANK_INTERVAL", str(DEFAULT_INTERVAL)))
+    )
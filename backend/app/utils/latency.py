@@ -0,0 +1,124 @@
+"""
+Latency tracking for outbound calls in QueueBeats backend
+Keeps a sliding window of observed latencies per upstream endpoint to derive
+adaptive timeouts and hedging delays, plus a budget that caps how many hedged
+(duplicate) requests may be sent relative to normal traffic.
+"""
+
+import math
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+
+class LatencyTracker:
+    """Sliding window of latencies (seconds) with cached percentiles"""
+
+    def __init__(
+        self,
+        window: int = 512,
+        min_samples: int = 20,
+        default_timeout: float = 5.0,
+        min_timeout: float = 1.0,
+        max_timeout: float = 10.0,
+        timeout_multiplier: float = 2.0
+    ):
+        self.min_samples = min_samples
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.timeout_multiplier = timeout_multiplier
+
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._sorted: Optional[list] = None
+        self.timeouts = 0
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self._sorted = None
+
+    def record_timeout(self, timeout: float) -> None:
+        """A timed-out call counts as taking at least the timeout"""
+        self.timeouts += 1
+        self.record(timeout)
+
+    def has_enough_samples(self) -> bool:
+        return len(self._samples) >= self.min_samples
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        if self._sorted is None:
+            self._sorted = sorted(self._samples)
+        index = min(len(self._sorted) - 1, max(0, math.ceil(p / 100.0 * len(self._sorted)) - 1))
+        return self._sorted[index]
+
+    def timeout(self) -> float:
+        """Timeout for the next call: a multiple of p99, clamped to bounds"""
+        if not self.has_enough_samples():
+            return self.default_timeout
+        p99 = self.percentile(99)
+        return min(self.max_timeout, max(self.min_timeout, p99 * self.timeout_multiplier))
+
+    def hedge_delay(self) -> Optional[float]:
+        """How long to wait before hedging: the observed p95, or None while warming up"""
+        if not self.has_enough_samples():
+            return None
+        return self.percentile(95)
+
+    def stats(self) -> Dict[str, Any]:
+        def ms(value: Optional[float]) -> Optional[int]:
+            return int(value * 1000) if value is not None else None
+
+        return {
+            "samples": len(self._samples),
+            "p50_ms": ms(self.percentile(50)),
+            "p95_ms": ms(self.percentile(95)),
+            "p99_ms": ms(self.percentile(99)),
+            "timeout_ms": ms(self.timeout()),
+            "timeouts": self.timeouts
+        }
+
+
+class HedgeBudget:
+    """
+    Allows at most `ratio` hedges per normal request, with a small burst.
+    Every request earns `ratio` credit; a hedge spends one.
+    """
+
+    def __init__(self, ratio: float = 0.05, burst: float = 5.0):
+        self.ratio = ratio
+        self.burst = burst
+        self._credit = burst
+
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.denied = 0
+
+    def on_request(self) -> None:
+        self.requests += 1
+        self._credit = min(self.burst, self._credit + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self._credit >= 1:
+            self._credit -= 1
+            self.hedges += 1
+            return True
+        self.denied += 1
+        return False
+
+    def refund(self) -> None:
+        """Return the credit of a hedge that was spent but not sent"""
+        self._credit = min(self.burst, self._credit + 1)
+        self.hedges -= 1
+        self.denied += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ratio": self.ratio,
+            "credit": round(self._credit, 2),
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "denied": self.denied
+        }
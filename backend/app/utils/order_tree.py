@@ -0,0 +1,221 @@
+"""
+Ordered containers for QueueBeats backend
+OrderTree is a treap (a binary search tree kept balanced by random heap
+priorities) whose nodes also track their subtree size and the sum of their
+subtree's weights. That gives O(log n) insert, remove, min and rank lookups
+(how many items, and how much weight, come before a key) plus in-order
+iteration that costs O(k) for the first k items, with no dependency outside
+the standard library.
+"""
+
+import random
+from typing import Any, Callable, Generic, Iterator, Optional, Tuple, TypeVar
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+class _Node:
+    __slots__ = ("key", "value", "priority", "left", "right", "size", "weight", "total")
+
+    def __init__(self, key, value, priority: float, weight: float):
+        self.key = key
+        self.value = value
+        self.priority = priority
+        self.left: Optional["_Node"] = None
+        self.right: Optional["_Node"] = None
+        self.size = 1
+        self.weight = weight
+        # Sum of weights in this subtree
+        self.total = weight
+
+
+def _size(node: Optional[_Node]) -> int:
+    return node.size if node is not None else 0
+
+
+def _total(node: Optional[_Node]) -> float:
+    return node.total if node is not None else 0
+
+
+class OrderTree(Generic[K, V]):
+    """
+    Map from unique, comparable keys to values, kept in key order.
+
+    Implemented as a split/merge treap. Keys must not change while stored;
+    to move an item, remove it and insert it again under its new key. Each
+    item carries a weight (e.g. a song's duration) so rank() can report the
+    total weight ahead of any key.
+    """
+
+    def __init__(self, seed: Optional[int] = None):
+        self._root: Optional[_Node] = None
+        self._random = random.Random(seed)
+
+    def __len__(self) -> int:
+        return _size(self._root)
+
+    @property
+    def total_weight(self) -> float:
+        return _total(self._root)
+
+    def _update(self, node: _Node) -> None:
+        node.size = 1 + _size(node.left) + _size(node.right)
+        node.total = node.weight + _total(node.left) + _total(node.right)
+
+    def _split(self, node: Optional[_Node], key) -> Tuple[Optional[_Node], Optional[_Node]]:
+        """Split into keys < key and keys >= key"""
+        if node is None:
+            return None, None
+        if node.key < key:
+            node.right, right = self._split(node.right, key)
+            self._update(node)
+            return node, right
+        left, node.left = self._split(node.left, key)
+        self._update(node)
+        return left, node
+
+    def _merge(self, left: Optional[_Node], right: Optional[_Node]) -> Optional[_Node]:
+        """Merge two treaps where every key in left is below every key in right"""
+        if left is None:
+            return right
+        if right is None:
+            return left
+        if left.priority > right.priority:
+            left.right = self._merge(left.right, right)
+            self._update(left)
+            return left
+        right.left = self._merge(left, right.left)
+        self._update(right)
+        return right
+
+    def insert(self, key: K, value: V, weight: float = 0) -> None:
+        """Add key; raises KeyError if it is already present"""
+        left, right = self._split(self._root, key)
+        if right is not None and self._min_node(right).key == key:
+            self._root = self._merge(left, right)
+            raise KeyError(key)
+        node = _Node(key, value, self._random.random(), weight)
+        self._root = self._merge(self._merge(left, node), right)
+
+    def remove(self, key: K) -> V:
+        """Remove key and return its value; raises KeyError if absent"""
+        parent: Optional[_Node] = None
+        node = self._root
+        path = []
+        while node is not None and node.key != key:
+            path.append(node)
+            parent = node
+            node = node.left if key < node.key else node.right
+        if node is None:
+            raise KeyError(key)
+
+        merged = self._merge(node.left, node.right)
+        if parent is None:
+            self._root = merged
+        elif parent.left is node:
+            parent.left = merged
+        else:
+            parent.right = merged
+        for ancestor in reversed(path):
+            self._update(ancestor)
+        return node.value
+
+    def rank(self, key: K) -> Tuple[int, float]:
+        """Number of keys below key and the sum of their weights; raises KeyError if absent"""
+        node = self._root
+        count = 0
+        weight: float = 0
+        while node is not None:
+            if key < node.key:
+                node = node.left
+            elif node.key < key:
+                count += _size(node.left) + 1
+                weight += _total(node.left) + node.weight
+                node = node.right
+            else:
+                return count + _size(node.left), weight + _total(node.left)
+        raise KeyError(key)
+
+    def first(self) -> Optional[Tuple[K, V]]:
+        """Smallest (key, value), or None when empty"""
+        if self._root is None:
+            return None
+        node = self._min_node(self._root)
+        return node.key, node.value
+
+    def pop_first(self) -> Optional[Tuple[K, V]]:
+        item = self.first()
+        if item is not None:
+            self.remove(item[0])
+        return item
+
+    def last(self) -> Optional[Tuple[K, V]]:
+        """Largest (key, value), or None when empty"""
+        node = self._root
+        if node is None:
+            return None
+        while node.right is not None:
+            node = node.right
+        return node.key, node.value
+
+    def before(self, key: K) -> Optional[Tuple[K, V]]:
+        """The item with the largest key below key, or None"""
+        node = self._root
+        best: Optional[_Node] = None
+        while node is not None:
+            if node.key < key:
+                best = node
+                node = node.right
+            else:
+                node = node.left
+        return (best.key, best.value) if best is not None else None
+
+    def after(self, key: K) -> Optional[Tuple[K, V]]:
+        """The item with the smallest key above key, or None"""
+        node = self._root
+        best: Optional[_Node] = None
+        while node is not None:
+            if key < node.key:
+                best = node
+                node = node.left
+            else:
+                node = node.right
+        return (best.key, best.value) if best is not None else None
+
+    def rekey(self, key_fn: Callable[[V], K]) -> None:
+        """
+        Replace every key with key_fn(value) in O(n) without restructuring.
+        The new keys must sort in the same order as the old ones.
+        """
+        for node in self._nodes():
+            node.key = key_fn(node.value)
+
+    def _min_node(self, node: _Node) -> _Node:
+        while node.left is not None:
+            node = node.left
+        return node
+
+    def _nodes(self, limit: Optional[int] = None) -> Iterator[_Node]:
+        stack = []
+        node = self._root
+        produced = 0
+        while stack or node is not None:
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            if limit is not None and produced >= limit:
+                return
+            yield node
+            produced += 1
+            node = node.right
+
+    def items(self, limit: Optional[int] = None) -> Iterator[Tuple[K, V]]:
+        """(key, value) pairs in key order, stopping after limit"""
+        for node in self._nodes(limit):
+            yield node.key, node.value
+
+    def values(self, limit: Optional[int] = None) -> Iterator[Any]:
+        for _, value in self.items(limit):
+            yield value
@@ -0,0 +1,256 @@
+"""
+Popular search queries for QueueBeats backend
+Every search is recorded into bounded streaming heavy-hitter counters (the
+space-saving algorithm), one globally and one per queue, so suggestions for a
+typed prefix come straight from memory without any upstream call.
+
+Counts decay exponentially over time so yesterday's trends fade out. Decay is
+applied as "forward decay": each hit is weighted by 2^(age of the log /
+half-life) instead of periodically shrinking every counter, and the weights
+are rescaled once they grow large.
+
+Memory is fixed: each counter set keeps at most `capacity` queries, and only
+the most recently active `max_queues` queues keep their own counters.
+"""
+
+import heapq
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.utils.text_normalize import query_key
+
+# Rescale forward-decay weights before they lose float precision
+MAX_DECAY_EXPONENT = 60.0
+
+# Prefixes matching more queries than this (empty or one-letter ones) are
+# answered from a cached list of the overall most frequent queries
+HEAD_SIZE = 256
+
+
+class SpaceSaving:
+    """
+    Top-k heavy hitters over a stream in at most `capacity` counters.
+
+    A new query takes over the counter with the smallest count when the set
+    is full, inheriting that count as its possible overestimate (`error`).
+    Queries are also kept sorted so a prefix selects its range by bisection.
+    Short prefixes whose range is wider than HEAD_SIZE instead look at the
+    cached head (the HEAD_SIZE largest counts when it was built) plus the
+    queries recorded since; every other query is still at or below the
+    head's smallest count, so when enough candidates beat it the answer is
+    exact without scanning the range.
+    Not thread-safe; QueryLog serializes access.
+    """
+
+    def __init__(self, capacity: int, half_life: float, clock=time.monotonic):
+        self.capacity = capacity
+        self.half_life = half_life
+        self._clock = clock
+        self._landmark = clock()
+
+        # query -> [weighted count, weighted error]
+        self._counts: Dict[str, List[float]] = {}
+        # One (count, query) entry per tracked query; counts only grow, so a
+        # stale entry is a lower bound and is refreshed when it reaches the top
+        self._heap: List[Tuple[float, str]] = []
+        self._sorted: List[str] = []
+        # Most frequent queries when last built, their smallest count, and
+        # the queries recorded since; None until a wide prefix needs it
+        self._head: Optional[List[str]] = None
+        self._head_floor = 0.0
+        self._touched: Set[str] = set()
+
+        self.recorded = 0
+        self.evicted = 0
+
+    def _weight(self, now: float) -> float:
+        exponent = (now - self._landmark) / self.half_life
+        if exponent > MAX_DECAY_EXPONENT:
+            self._rescale(now)
+            exponent = 0.0
+        return 2.0 ** exponent
+
+    def _rescale(self, now: float) -> None:
+        factor = 2.0 ** ((now - self._landmark) / self.half_life)
+        for counter in self._counts.values():
+            counter[0] /= factor
+            counter[1] /= factor
+        self._heap = [(count / factor, query) for count, query in self._heap]
+        self._head_floor /= factor
+        self._landmark = now
+
+    def record(self, query: str, now: Optional[float] = None) -> None:
+        weight = self._weight(self._clock() if now is None else now)
+        self.recorded += 1
+        self._touch(query)
+
+        counter = self._counts.get(query)
+        if counter is not None:
+            counter[0] += weight
+            return
+
+        if len(self._counts) < self.capacity:
+            self._counts[query] = [weight, 0.0]
+            heapq.heappush(self._heap, (weight, query))
+            insort(self._sorted, query)
+            return
+
+        floor, victim = self._pop_min()
+        del self._counts[victim]
+        del self._sorted[bisect_left(self._sorted, victim)]
+        self.evicted += 1
+
+        self._counts[query] = [floor + weight, floor]
+        heapq.heappush(self._heap, (floor + weight, query))
+        insort(self._sorted, query)
+
+    def _pop_min(self) -> Tuple[float, str]:
+        while True:
+            count, query = heapq.heappop(self._heap)
+            current = self._counts[query][0]
+            if current == count:
+                return count, query
+            heapq.heappush(self._heap, (current, query))
+
+    def _touch(self, query: str) -> None:
+        if self._head is None:
+            return
+        self._touched.add(query)
+        if len(self._touched) > HEAD_SIZE:
+            # Too many changes to merge cheaply; rebuild on the next wide prefix
+            self._head = None
+
+    def _top_from_head(self, prefix: str, limit: int) -> Optional[List[str]]:
+        """Top queries for prefix from the head, or None if it can't be sure"""
+        if self._head is None:
+            self._head = heapq.nlargest(HEAD_SIZE, self._counts, key=lambda query: self._counts[query][0])
+            self._head_floor = self._counts[self._head[-1]][0] if self._head else 0.0
+            self._touched = set()
+
+        # Evicted queries are dropped; sorting keeps ties in the range scan's order
+        candidates = sorted({
+            query for query in self._head + list(self._touched)
+            if query in self._counts and query.startswith(prefix)
+        })
+        matches = heapq.nlargest(limit, candidates, key=lambda query: self._counts[query][0])
+        if len(matches) < limit or self._counts[matches[-1]][0] < self._head_floor:
+            return None
+        return matches
+
+    def top(self, prefix: str = "", limit: int = 10, now: Optional[float] = None) -> List[Tuple[str, float]]:
+        """Most frequent queries starting with prefix, with their decayed counts"""
+        start = bisect_left(self._sorted, prefix)
+        end = bisect_left(self._sorted, prefix + "\uffff") if prefix else len(self._sorted)
+        matches = self._top_from_head(prefix, limit) if end - start > HEAD_SIZE else None
+        if matches is None:
+            matches = heapq.nlargest(limit, self._sorted[start:end], key=lambda query: self._counts[query][0])
+
+        scale = 2.0 ** (((self._clock() if now is None else now) - self._landmark) / self.half_life)
+        return [(query, self._counts[query][0] / scale) for query in matches]
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+
+class QueryLog:
+    """Global and per-queue popular queries; safe to use from any thread"""
+
+    def __init__(
+        self,
+        capacity: int = 5000,
+        queue_capacity: int = 200,
+        max_queues: int = 1000,
+        half_life: float = 6 * 3600,
+        min_length: int = 2
+    ):
+        self.queue_capacity = queue_capacity
+        self.max_queues = max_queues
+        self.half_life = half_life
+        self.min_length = min_length
+
+        self._lock = threading.Lock()
+        self._global = SpaceSaving(capacity, half_life)
+        self._queues: "OrderedDict[str, SpaceSaving]" = OrderedDict()
+
+        self.skipped = 0
+
+    def record(self, query: str, queue_id: Optional[str] = None) -> None:
+        """Count a search; the query is normalized so spellings share a counter"""
+        key = query_key(query)
+        if len(key) < self.min_length:
+            self.skipped += 1
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            self._global.record(key, now)
+            if queue_id:
+                counters = self._queues.get(queue_id)
+                if counters is None:
+                    counters = self._queues[queue_id] = SpaceSaving(self.queue_capacity, self.half_life)
+                    while len(self._queues) > self.max_queues:
+                        self._queues.popitem(last=False)
+                else:
+                    self._queues.move_to_end(queue_id)
+                counters.record(key, now)
+
+    def suggest(self, prefix: str, queue_id: Optional[str] = None, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Popular queries starting with prefix: the queue's own first, then
+        global ones it doesn't already have
+        """
+        key = query_key(prefix)
+        # Keep a trailing space so "the " only suggests multi-word queries
+        if key and prefix[-1:].isspace():
+            key += " "
+
+        now = time.monotonic()
+        with self._lock:
+            counters = self._queues.get(queue_id) if queue_id else None
+            local = counters.top(key, limit, now) if counters is not None else []
+            popular = self._global.top(key, limit, now)
+
+        suggestions = [{"query": query, "score": round(score, 3), "source": "queue"} for query, score in local]
+        seen = {query for query, _ in local}
+        for query, score in popular:
+            if len(suggestions) >= limit:
+                break
+            if query not in seen:
+                suggestions.append({"query": query, "score": round(score, 3), "source": "global"})
+        return suggestions
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "queries": len(self._global),
+                "capacity": self._global.capacity,
+                "recorded": self._global.recorded,
+                "evicted": self._global.evicted,
+                "skipped": self.skipped,
+                "queues": len(self._queues),
+                "max_queues": self.max_queues,
+                "half_life_seconds": self.half_life
+            }
+
+
+_query_log: Optional[QueryLog] = None
+_query_log_lock = threading.Lock()
+
+
+def get_query_log() -> QueryLog:
+    """Return the process-wide query log"""
+    global _query_log
+    if _query_log is None:
+        with _query_log_lock:
+            if _query_log is None:
+                _query_log = QueryLog(
+                    capacity=int(os.environ.get("QUERY_LOG_CAPACITY", "5000")),
+                    queue_capacity=int(os.environ.get("QUERY_LOG_QUEUE_CAPACITY", "200")),
+                    max_queues=int(os.environ.get("QUERY_LOG_MAX_QUEUES", "1000")),
+                    half_life=float(os.environ.get("QUERY_LOG_HALF_LIFE", str(6 * 3600)))
+                )
+    return _query_log
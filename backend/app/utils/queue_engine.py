@@ -0,0 +1,656 @@
+"""
+In-memory queue engine for QueueBeats backend
+The engine is the authority on what plays next. Each active queue keeps its
+unplayed songs in an OrderTree keyed by (-total votes, rank key, sequence),
+so adding, voting, removing and popping the next song are O(log n) and
+reading the first k songs is O(k). The tree also sums song durations, so a
+song's position and its wait until it plays are O(log n) as well. Rank
+keys are fractional (see rank_keys), so moving a song by hand changes one
+key and one row. A queue can instead be ranked by vote momentum (see
+hot_ranking); the tree is still kept up to date so switching back is
+instant. A third mode interleaves songs by who added them (see fair_queue).
+Supabase is loaded once when a queue is
+first touched and is written to asynchronously afterwards; reads never wait
+on the database. Queues nobody has used for a while are dropped from memory
+and loaded again if they come back.
+"""
+
+import itertools
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.utils.canonical import canonical_key
+from app.utils.fair_queue import FairScheduler
+from app.utils.hot_ranking import HotRanker, hot_ranking_available, make_hot_ranker
+from app.utils.order_tree import OrderTree
+from app.utils.rank_keys import key_after, key_between, spread_keys, spread_width
+from app.utils.queue_store import DEFAULT_DURATION_MS, QueuePersister, SupabaseQueueStore, parse_timestamp
+
+# Tie-breaker for songs added in the same instant
+_sequence = itertools.count()
+
+# "votes": total votes, then rank key. "hot": recent votes weigh more.
+# "fair": round-robin between the guests who added songs, weighted by votes.
+RANKING_MODES = ("votes", "hot", "fair")
+
+
+class QueueLoadError(Exception):
+    """Raised when a queue can't be loaded from the store; nothing is cached"""
+
+    def to_http_exception(self) -> HTTPException:
+        """Surface as a 503 so clients retry; the next access loads again"""
+        return HTTPException(status_code=503, detail=str(self), headers={"Retry-After": "1"})
+
+
+class QueueEntry:
+    """One unplayed song in a queue and the votes it has received"""
+
+    __slots__ = (
+        "song_id", "queue_id", "title", "artist", "album", "cover_url", "duration_ms",
+        "added_by", "added_at", "seq", "votes", "total_votes", "canonical_key", "rank_key",
+        "voted_at", "track_uri"
+    )
+
+    def __init__(
+        self,
+        song_id: str,
+        queue_id: str,
+        title: str,
+        artist: str,
+        album: Optional[str] = None,
+        cover_url: Optional[str] = None,
+        duration_ms: Optional[int] = None,
+        added_by: Optional[str] = None,
+        added_at: Optional[float] = None,
+        rank_key: Optional[str] = None,
+        track_uri: Optional[str] = None
+    ):
+        self.song_id = song_id
+        self.queue_id = queue_id
+        self.title = title
+        self.artist = artist
+        self.album = album
+        self.cover_url = cover_url
+        self.duration_ms = duration_ms or DEFAULT_DURATION_MS
+        self.added_by = added_by
+        self.added_at = time.time() if added_at is None else added_at
+        self.seq = next(_sequence)
+        # user id -> vote count, as in the votes table
+        self.votes: Dict[str, int] = {}
+        # user id -> when that vote was cast, for hot ranking
+        self.voted_at: Dict[str, float] = {}
+        self.total_votes = 0
+        self.canonical_key = canonical_key(None, title, [artist])
+        # Order among songs with equal votes; assigned by LiveQueue.add when None
+        self.rank_key = rank_key
+        # Spotify URI of the resolved track, for playback
+        self.track_uri = track_uri
+
+    @property
+    def sort_key(self) -> Tuple[int, str, int]:
+        return (-self.total_votes, self.rank_key, self.seq)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.song_id,
+            "queue_id": self.queue_id,
+            "title": self.title,
+            "artist": self.artist,
+            "album": self.album,
+            "cover_url": self.cover_url,
+            "duration_ms": self.duration_ms,
+            "added_by": self.added_by,
+            "added_at": self.added_at,
+            "total_votes": self.total_votes,
+            "rank_key": self.rank_key,
+            "track_uri": self.track_uri
+        }
+
+
+class LiveQueue:
+    """
+    The unplayed songs of one queue in play order. Every method takes the
+    queue's lock, so a queue can be used from any thread.
+
+    Wait times assume songs play back to back: the song taken by the last
+    pop_next is playing until its duration has elapsed, then the queue plays
+    in order.
+
+    Votes decide first; rank keys order songs with equal votes. New songs get
+    a key after every other, and move() puts a song next to another by giving
+    it a key between two neighbours. Once keys grow REBALANCE_SLACK digits
+    past the width of the last rebalance, needs_rebalance is set.
+
+    In "hot" ranking mode a HotRanker decides the order instead, re-ranking
+    the whole queue when a read finds its ranking out of date. In "fair"
+    mode a FairScheduler does, updated on every change.
+    """
+
+    REBALANCE_SLACK = 4
+
+    def __init__(self, queue_id: str, clock: Callable[[], float] = time.time):
+        self.queue_id = queue_id
+        self.lock = threading.RLock()
+        self._clock = clock
+        self._order: OrderTree = OrderTree()
+        self._entries: Dict[str, QueueEntry] = {}
+        # canonical recording key -> song id, to spot duplicate adds
+        self._recordings: Dict[str, str] = {}
+        # rank key -> entry, in rank order regardless of votes
+        self._ranks: OrderTree = OrderTree()
+        self.key_width = spread_width(1)
+        self.needs_rebalance = False
+        self.rebalance_scheduled = False
+        self.playing: Optional[QueueEntry] = None
+        self.playing_since = 0.0
+        self.ranking = "votes"
+        self.hot: Optional[HotRanker] = None
+        self.fair: Optional[FairScheduler] = None
+        # When a request last used the queue, for idle eviction
+        self.last_used = clock()
+        self.eviction_scheduled = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, song_id: str) -> Optional[QueueEntry]:
+        return self._entries.get(song_id)
+
+    def find_recording(self, key: Optional[str]) -> Optional[QueueEntry]:
+        """The queued entry of the same recording, if any"""
+        if key is None:
+            return None
+        with self.lock:
+            song_id = self._recordings.get(key)
+            return self._entries.get(song_id) if song_id is not None else None
+
+    def add(self, entry: QueueEntry) -> QueueEntry:
+        with self.lock:
+            if entry.song_id in self._entries:
+                raise ValueError(f"song {entry.song_id} is already queued")
+            appended = entry.rank_key is None
+            if appended:
+                last = self._ranks.last()
+                self._set_rank(entry, key_after(last[0], self.key_width) if last is not None else spread_keys(1)[0])
+            self._ranks.insert(entry.rank_key, entry)
+            if self.hot is not None:
+                self.hot.add(entry.song_id, entry.duration_ms, appended)
+            if self.fair is not None:
+                self.fair.add(entry)
+            self._entries[entry.song_id] = entry
+            self._order.insert(entry.sort_key, entry, entry.duration_ms)
+            if entry.canonical_key is not None:
+                self._recordings.setdefault(entry.canonical_key, entry.song_id)
+            return entry
+
+    def vote(self, song_id: str, user_id: str, vote_count: int = 1) -> QueueEntry:
+        """Set user_id's vote on a song (0 withdraws it) and move the song; KeyError if not queued"""
+        with self.lock:
+            entry = self._entries[song_id]
+            previous = entry.votes.get(user_id, 0)
+            if vote_count == previous:
+                return entry
+
+            now = self._clock()
+            old_sort_key = entry.sort_key
+            self._order.remove(old_sort_key)
+            if vote_count > 0:
+                entry.votes[user_id] = vote_count
+                entry.voted_at[user_id] = now
+            else:
+                entry.votes.pop(user_id, None)
+                entry.voted_at.pop(user_id, None)
+            entry.total_votes += vote_count - previous
+            self._order.insert(entry.sort_key, entry, entry.duration_ms)
+            if self.hot is not None:
+                self.hot.vote(song_id, user_id, vote_count, now)
+            if self.fair is not None:
+                self.fair.reposition(entry, old_sort_key)
+            return entry
+
+    def remove(self, song_id: str) -> QueueEntry:
+        """Take a song out of the queue; KeyError if not queued"""
+        with self.lock:
+            entry = self._entries.pop(song_id)
+            self._order.remove(entry.sort_key)
+            self._ranks.remove(entry.rank_key)
+            if self.hot is not None:
+                self.hot.remove(song_id)
+            if self.fair is not None:
+                self.fair.remove(entry)
+            if self._recordings.get(entry.canonical_key) == song_id:
+                del self._recordings[entry.canonical_key]
+            return entry
+
+    def move(self, song_id: str, before: Optional[str] = None, after: Optional[str] = None) -> QueueEntry:
+        """
+        Give a song the rank right before `before` or right after `after`
+        (another queued song). Only the moved song's key changes. KeyError
+        if either song is not queued.
+        """
+        if (before is None) == (after is None):
+            raise ValueError("give exactly one of before and after")
+        anchor_id = before if before is not None else after
+        if anchor_id == song_id:
+            raise ValueError("a song can't be moved next to itself")
+
+        with self.lock:
+            entry = self._entries[song_id]
+            anchor = self._entries[anchor_id]
+            old_sort_key = entry.sort_key
+            self._ranks.remove(entry.rank_key)
+            self._order.remove(old_sort_key)
+            if before is not None:
+                lower = self._ranks.before(anchor.rank_key)
+                self._set_rank(entry, key_between(lower[0] if lower else None, anchor.rank_key))
+            else:
+                upper = self._ranks.after(anchor.rank_key)
+                self._set_rank(entry, key_between(anchor.rank_key, upper[0] if upper else None))
+            self._ranks.insert(entry.rank_key, entry)
+            self._order.insert(entry.sort_key, entry, entry.duration_ms)
+            if self.hot is not None:
+                self.hot.ties_stale = True
+                self.hot.dirty = True
+            if self.fair is not None:
+                self.fair.reposition(entry, old_sort_key)
+            return entry
+
+    def _set_rank(self, entry: QueueEntry, rank_key: str) -> None:
+        entry.rank_key = rank_key
+        if len(rank_key) > self.key_width + self.REBALANCE_SLACK:
+            self.needs_rebalance = True
+
+    def rebalance(self) -> Dict[str, str]:
+        """
+        Give every song a fresh, evenly spaced key in the current rank order
+        and return the new keys by song id. O(n); the order doesn't change,
+        so neither tree is rebuilt.
+        """
+        with self.lock:
+            entries = list(self._ranks.values())
+            for entry, rank_key in zip(entries, spread_keys(len(entries))):
+                entry.rank_key = rank_key
+            self._ranks.rekey(lambda entry: entry.rank_key)
+            self._order.rekey(lambda entry: entry.sort_key)
+            if self.fair is not None:
+                self.fair.rekey()
+            self.key_width = spread_width(len(entries))
+            self.needs_rebalance = False
+            return {entry.song_id: entry.rank_key for entry in entries}
+
+    def set_ranking(self, mode: str) -> None:
+        """Switch between the RANKING_MODES orderings"""
+        if mode not in RANKING_MODES:
+            raise ValueError(f"unknown ranking mode {mode!r}, expected one of {', '.join(RANKING_MODES)}")
+        if mode == "hot" and not hot_ranking_available():
+            raise ValueError("hot ranking needs numpy, which is not installed")
+        with self.lock:
+            if mode == self.ranking:
+                return
+            self.hot = None
+            self.fair = None
+            if mode == "hot":
+                hot = make_hot_ranker()
+                for entry in self._ranks.values():
+                    hot.add(entry.song_id, entry.duration_ms)
+                    for user_id, count in entry.votes.items():
+                        hot.vote(entry.song_id, user_id, count, entry.voted_at.get(user_id, entry.added_at))
+                self.hot = hot
+            elif mode == "fair":
+                fair = FairScheduler()
+                for entry in self._ranks.values():
+                    fair.add(entry)
+                self.fair = fair
+            self.ranking = mode
+
+    def _hot_ranked(self) -> HotRanker:
+        """The hot ranker, re-ranked first if its order is out of date"""
+        hot = self.hot
+        now = self._clock()
+        if hot.needs_rank(now):
+            if hot.ties_stale:
+                hot.set_ties(entry.song_id for entry in self._ranks.values())
+            hot.rank(now)
+        return hot
+
+    def peek(self) -> Optional[QueueEntry]:
+        with self.lock:
+            if self.hot is not None:
+                song_ids = self._hot_ranked().song_ids(1)
+                return self._entries[song_ids[0]] if song_ids else None
+            if self.fair is not None:
+                return self.fair.peek()
+            first = self._order.first()
+            return first[1] if first is not None else None
+
+    def pop_next(self) -> Optional[QueueEntry]:
+        """Remove and return the song that plays next; it becomes the playing song"""
+        with self.lock:
+            entry = self.peek()
+            if entry is not None:
+                if self.fair is not None:
+                    self.fair.serve(entry)
+                self.remove(entry.song_id)
+                self.playing = entry
+                self.playing_since = self._clock()
+            return entry
+
+    def top(self, limit: Optional[int] = None) -> List[QueueEntry]:
+        """The first limit songs in play order (all when limit is None)"""
+        with self.lock:
+            if self.hot is not None:
+                return [self._entries[song_id] for song_id in self._hot_ranked().song_ids(limit)]
+            if self.fair is not None:
+                return list(self.fair.ordered(limit))
+            return list(self._order.values(limit))
+
+    def remaining_ms(self) -> int:
+        """Time left on the playing song, 0 when nothing is playing"""
+        if self.playing is None:
+            return 0
+        elapsed_ms = (self._clock() - self.playing_since) * 1000
+        return max(0, int(self.playing.duration_ms - elapsed_ms))
+
+    def position(self, song_id: str) -> Tuple[int, int]:
+        """(songs ahead, milliseconds until it starts) for a queued song; KeyError if not queued"""
+        with self.lock:
+            entry = self._entries[song_id]
+            if self.hot is not None:
+                ahead, ahead_ms = self._hot_ranked().position(song_id)
+            elif self.fair is not None:
+                # Interleaving has no rank index: walk the schedule up to the song
+                ahead, ahead_ms = 0, 0
+                for queued in self.fair.ordered():
+                    if queued is entry:
+                        break
+                    ahead += 1
+                    ahead_ms += queued.duration_ms
+            else:
+                ahead, ahead_ms = self._order.rank(entry.sort_key)
+            return ahead, self.remaining_ms() + int(ahead_ms)
+
+    def schedule(self, limit: Optional[int] = None) -> List[Tuple[QueueEntry, int, int]]:
+        """(entry, position, milliseconds until it starts) for the first limit songs"""
+        with self.lock:
+            wait_ms = self.remaining_ms()
+            if self.hot is not None:
+                hot = self._hot_ranked()
+                return [
+                    (self._entries[song_id], position, wait_ms + offset_ms)
+                    for position, (song_id, offset_ms) in enumerate(zip(hot.song_ids(limit), hot.offsets_ms(limit)))
+                ]
+            scheduled = []
+            entries = self.fair.ordered(limit) if self.fair is not None else self._order.values(limit)
+            for position, entry in enumerate(entries):
+                scheduled.append((entry, position, wait_ms))
+                wait_ms += entry.duration_ms
+            return scheduled
+
+    def total_duration_ms(self) -> int:
+        """Play time of every queued song, not counting the playing one"""
+        return int(self._order.total_weight)
+
+
+class QueueEngine:
+    """
+    Live queues by id. A queue is loaded from the store the first time it
+    is used; every change is applied in memory first and then handed to the
+    persister.
+
+    Whenever a queue is loaded, queues unused for idle_ttl seconds, and the
+    least recently used ones beyond max_queues, are evicted. Eviction goes
+    through the persister, so it happens after the queue's pending writes,
+    and is skipped if the queue was used again in the meantime.
+    """
+
+    def __init__(
+        self,
+        store: Optional[SupabaseQueueStore] = None,
+        persister: Optional[QueuePersister] = None,
+        clock: Callable[[], float] = time.time,
+        idle_ttl: float = 6 * 3600,
+        max_queues: int = 1000
+    ):
+        self.store = store or SupabaseQueueStore()
+        self.persister = persister or QueuePersister()
+        self._clock = clock
+        self.idle_ttl = idle_ttl
+        self.max_queues = max_queues
+        self._queues: Dict[str, LiveQueue] = {}
+        self._lock = threading.Lock()
+        # One lock per queue id while it is being loaded
+        self._loading: Dict[str, threading.Lock] = {}
+
+        self.loads = 0
+        self.load_errors = 0
+        self.rebalances = 0
+        self.evictions = 0
+
+    def queue(self, queue_id: str) -> LiveQueue:
+        """The live queue, loading it from the store on first use (QueueLoadError if that fails)"""
+        live = self._queues.get(queue_id)
+        if live is not None:
+            live.last_used = self._clock()
+            return live
+
+        with self._lock:
+            loading = self._loading.setdefault(queue_id, threading.Lock())
+        with loading:
+            live = self._queues.get(queue_id)
+            if live is None:
+                try:
+                    live = self._load(queue_id)
+                except QueueLoadError:
+                    with self._lock:
+                        self._loading.pop(queue_id, None)
+                    raise
+                with self._lock:
+                    self._queues[queue_id] = live
+                    self._loading.pop(queue_id, None)
+                self._evict_idle()
+            live.last_used = self._clock()
+        return live
+
+    def _evict_idle(self) -> None:
+        """Schedule eviction of idle queues and of the least recently used beyond max_queues"""
+        now = self._clock()
+        with self._lock:
+            by_use = sorted(self._queues.values(), key=lambda live: live.last_used)
+        excess = len(by_use) - self.max_queues
+        for i, live in enumerate(by_use):
+            if i >= excess and now - live.last_used <= self.idle_ttl:
+                break
+            if live.eviction_scheduled:
+                continue
+            live.eviction_scheduled = True
+            last_used = live.last_used
+            self.persister.submit(
+                f"evict queue {live.queue_id}",
+                lambda live=live, last_used=last_used: self._evict(live, last_used)
+            )
+
+    def _evict(self, live: LiveQueue, last_used: float) -> None:
+        # Runs on the persister thread after the queue's earlier writes
+        with self._lock:
+            live.eviction_scheduled = False
+            if self._queues.get(live.queue_id) is not live or live.last_used != last_used:
+                return
+            del self._queues[live.queue_id]
+        self.evictions += 1
+        print(f"Queue engine: evicted idle queue {live.queue_id}")
+
+    def _load(self, queue_id: str) -> LiveQueue:
+        live = LiveQueue(queue_id, self._clock)
+        self.loads += 1
+        try:
+            rows = self.store.load_queue(queue_id)
+            settings = self.store.load_settings(queue_id)
+        except Exception as e:
+            # Don't serve (or cache) an empty queue that isn't really empty
+            self.load_errors += 1
+            print(f"Queue engine: could not load queue {queue_id}: {str(e)}")
+            raise QueueLoadError(f"Queue {queue_id} is temporarily unavailable") from e
+
+        entries = []
+        for row in rows:
+            entry = QueueEntry(
+                song_id=row["id"],
+                queue_id=queue_id,
+                title=row.get("title") or "",
+                artist=row.get("artist") or "",
+                album=row.get("album"),
+                cover_url=row.get("cover_url"),
+                duration_ms=row.get("duration"),
+                added_by=row.get("added_by"),
+                added_at=parse_timestamp(row.get("created_at")),
+                rank_key=row.get("rank_key"),
+                track_uri=row.get("track_uri")
+            )
+            for vote in row.get("votes") or []:
+                count = vote.get("vote_count") or 0
+                if count > 0 and vote.get("profile_id"):
+                    entry.votes[vote["profile_id"]] = count
+                    entry.voted_at[vote["profile_id"]] = parse_timestamp(vote.get("created_at"))
+                    entry.total_votes += count
+            entries.append((entry, row.get("position")))
+
+        rank_keys = [entry.rank_key for entry, _ in entries]
+        if None in rank_keys or len(set(rank_keys)) < len(rank_keys):
+            # Rows from before rank keys (or added around the engine): keep
+            # the order the queue view used, integer position then age
+            entries.sort(key=lambda item: (
+                item[0].rank_key is None, item[0].rank_key or "",
+                item[1] is None, item[1] or 0, item[0].added_at
+            ))
+            for (entry, _), rank_key in zip(entries, spread_keys(len(entries))):
+                entry.rank_key = rank_key
+            live.key_width = spread_width(len(entries))
+            ranks = {entry.song_id: entry.rank_key for entry, _ in entries}
+            self.persister.submit(f"assign rank keys in queue {queue_id}", lambda: self.store.set_ranks(ranks))
+
+        for entry, _ in entries:
+            live.add(entry)
+        try:
+            live.set_ranking(settings.get("ranking") or "votes")
+        except ValueError as e:
+            print(f"Queue engine: queue {queue_id} keeps votes ranking: {str(e)}")
+        print(f"Queue engine: loaded queue {queue_id} with {len(live)} songs, ranked by {live.ranking}")
+        return live
+
+    def add(self, entry: QueueEntry) -> QueueEntry:
+        live = self.queue(entry.queue_id)
+        live.add(entry)
+        # Writes read the rank key when they run: a rebalance queued ahead of
+        # them may have replaced it
+        self.persister.submit(f"insert song {entry.song_id}", lambda: self.store.insert_song(entry.to_dict()))
+        self._schedule_rebalance(live)
+        return entry
+
+    def move(self, queue_id: str, song_id: str, before: Optional[str] = None, after: Optional[str] = None) -> QueueEntry:
+        """Move one song by hand; a single-row write"""
+        live = self.queue(queue_id)
+        entry = live.move(song_id, before=before, after=after)
+        self.persister.submit(
+            f"move song {song_id}",
+            lambda: self.store.update_song(song_id, {"rank_key": entry.rank_key})
+        )
+        self._schedule_rebalance(live)
+        return entry
+
+    def _schedule_rebalance(self, live: LiveQueue) -> None:
+        """Queue a rebalance behind the pending writes once keys have grown long"""
+        with live.lock:
+            if not live.needs_rebalance or live.rebalance_scheduled:
+                return
+            live.rebalance_scheduled = True
+        self.persister.submit(f"rebalance queue {live.queue_id}", lambda: self._rebalance(live))
+
+    def _rebalance(self, live: LiveQueue) -> None:
+        # Runs on the persister thread, so writes made before it are already
+        # applied and writes made after it land on top of the new keys
+        with live.lock:
+            ranks = live.rebalance()
+            live.rebalance_scheduled = False
+        self.rebalances += 1
+        print(f"Queue engine: rebalanced {len(ranks)} rank keys in queue {live.queue_id}")
+        self.store.set_ranks(ranks)
+
+    def vote(self, queue_id: str, song_id: str, user_id: str, vote_count: int = 1) -> QueueEntry:
+        entry = self.queue(queue_id).vote(song_id, user_id, vote_count)
+        self.persister.submit(
+            f"vote on {song_id} by {user_id}",
+            lambda: self.store.set_vote(song_id, user_id, vote_count)
+        )
+        return entry
+
+    def set_ranking(self, queue_id: str, mode: str) -> LiveQueue:
+        """Change how a queue is ordered and save it in the queue's settings"""
+        live = self.queue(queue_id)
+        live.set_ranking(mode)
+        self.persister.submit(
+            f"set ranking of queue {queue_id}",
+            lambda: self.store.update_settings(queue_id, {"ranking": mode})
+        )
+        return live
+
+    def remove(self, queue_id: str, song_id: str) -> QueueEntry:
+        entry = self.queue(queue_id).remove(song_id)
+        self.persister.submit(f"delete song {song_id}", lambda: self.store.delete_song(song_id))
+        return entry
+
+    def pop_next(self, queue_id: str) -> Optional[QueueEntry]:
+        live = self.queue(queue_id)
+        with live.lock:
+            entry = live.pop_next()
+            played_at = live.playing_since
+        if entry is not None:
+            self.persister.submit(
+                f"mark {entry.song_id} played",
+                lambda: self.store.mark_played(entry.song_id, played_at)
+            )
+        return entry
+
+    def forget(self, queue_id: str) -> None:
+        """Drop a queue from memory; it is loaded again on next use"""
+        with self._lock:
+            self._queues.pop(queue_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queues": len(self._queues),
+            "songs": sum(len(live) for live in list(self._queues.values())),
+            "loads": self.loads,
+            "load_errors": self.load_errors,
+            "rebalances": self.rebalances,
+            "evictions": self.evictions,
+            "hot_queues": sum(1 for live in list(self._queues.values()) if live.hot is not None),
+            "fair_queues": sum(1 for live in list(self._queues.values()) if live.fair is not None),
+            "persister": self.persister.stats()
+        }
+
+
+_engine: Optional[QueueEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_queue_engine() -> QueueEngine:
+    """Return the process-wide queue engine"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = QueueEngine(
+                    idle_ttl=float(os.environ.get("QUEUE_ENGINE_IDLE_TTL", str(6 * 3600))),
+                    max_queues=int(os.environ.get("QUEUE_ENGINE_MAX_QUEUES", "1000"))
+                )
+    return _engine
+
+
+def close_queue_engine() -> None:
+    """Finish queued writes and stop the persister thread"""
+    if _engine is not None:
+        _engine.persister.close()
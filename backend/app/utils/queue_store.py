@@ -0,0 +1,330 @@
+"""
+Queue persistence for QueueBeats backend
+Loads a queue's unplayed songs and votes from Supabase when the queue engine
+first needs them, and writes engine changes back through a write-behind
+thread, so request handlers never wait on PostgREST.
+"""
+
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import requests
+
+# Cover shown for songs added without artwork
+DEFAULT_COVER_URL = "https://images.unsplash.com/photo-1504609813442-a9c286d4b4e0?auto=format&fit=crop&q=80&w=200&h=200"
+DEFAULT_DURATION_MS = 240000
+RANK_KEY_MIGRATION = "supabase/migrations/20261017000000_add_songs_rank_key.sql"
+
+
+def sql_string(value) -> str:
+    """Escape a value for a single-quoted SQL literal"""
+    return str(value).replace("'", "''")
+
+
+def parse_timestamp(value: Optional[str]) -> float:
+    """Epoch seconds from a PostgREST timestamp, or now when missing"""
+    if not value:
+        return time.time()
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return time.time()
+
+
+def format_timestamp(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).isoformat()
+
+
+class SupabaseQueueStore:
+    """PostgREST reads and writes for queue songs and votes"""
+
+    def __init__(self, timeout: float = 10.0):
+        self.timeout = timeout
+        # Whether songs.rank_key exists; checked on first use
+        self._has_rank_key: Optional[bool] = None
+        # Profile ids known to exist, so repeat adds by a guest skip the lookup
+        self._profiles: Set[str] = set()
+        self.max_profiles = 10000
+
+    def _connection(self) -> Tuple[str, Dict[str, str]]:
+        from app.apis.supabase_config import get_supabase_config_internal
+
+        supabase_url, supabase_key = get_supabase_config_internal()
+        headers = {
+            "apikey": supabase_key,
+            "Authorization": f"Bearer {supabase_key}",
+            "Content-Type": "application/json",
+            "Accept": "application/json"
+        }
+        return supabase_url, headers
+
+    def has_rank_key(self) -> bool:
+        """
+        Whether the rank_key migration has run. Until it has, songs are read
+        and written without rank keys (PostgREST rejects unknown columns), so
+        the order of equal-vote songs isn't saved. Checked once per process.
+        """
+        if self._has_rank_key is None:
+            supabase_url, headers = self._connection()
+            response = requests.get(
+                f"{supabase_url}/rest/v1/songs",
+                params={"select": "rank_key", "limit": "1"},
+                headers=headers,
+                timeout=self.timeout
+            )
+            if response.status_code == 200:
+                self._has_rank_key = True
+            elif response.status_code == 400 and "rank_key" in response.text:
+                self._has_rank_key = False
+                print(f"WARNING: songs.rank_key is missing, apply {RANK_KEY_MIGRATION} and restart; song moves won't be saved until then")
+            else:
+                raise RuntimeError(f"checking songs.rank_key failed: {response.status_code} - {response.text}")
+        return self._has_rank_key
+
+    def profile_exists(self, profile_id: str) -> bool:
+        """Whether a profile row exists; songs.added_by and votes.profile_id reference it"""
+        if profile_id in self._profiles:
+            return True
+        supabase_url, headers = self._connection()
+        response = requests.get(
+            f"{supabase_url}/rest/v1/profiles",
+            params={"id": f"eq.{profile_id}", "select": "id"},
+            headers=headers,
+            timeout=self.timeout
+        )
+        if response.status_code != 200:
+            raise RuntimeError(f"profile lookup failed: {response.status_code} - {response.text}")
+        if not response.json():
+            return False
+        if len(self._profiles) >= self.max_profiles:
+            self._profiles.clear()
+        self._profiles.add(profile_id)
+        return True
+
+    def load_queue(self, queue_id: str) -> List[Dict[str, Any]]:
+        """Unplayed songs of a queue with their votes embedded"""
+        columns = "id,title,artist,album,cover_url,duration,added_by,track_uri,created_at,position"
+        if self.has_rank_key():
+            columns += ",rank_key"
+        supabase_url, headers = self._connection()
+        response = requests.get(
+            f"{supabase_url}/rest/v1/songs",
+            params={
+                "queue_id": f"eq.{queue_id}",
+                "played": "eq.false",
+                "select": f"{columns},votes(profile_id,vote_count,created_at)"
+            },
+            headers=headers,
+            timeout=self.timeout
+        )
+        if response.status_code != 200:
+            raise RuntimeError(f"loading queue {queue_id} failed: {response.status_code} - {response.text}")
+        return response.json()
+
+    def load_settings(self, queue_id: str) -> Dict[str, Any]:
+        """The queue's settings JSON, empty when unset"""
+        supabase_url, headers = self._connection()
+        response = requests.get(
+            f"{supabase_url}/rest/v1/queues",
+            params={"id": f"eq.{queue_id}", "select": "settings"},
+            headers=headers,
+            timeout=self.timeout
+        )
+        if response.status_code != 200:
+            raise RuntimeError(f"loading settings of queue {queue_id} failed: {response.status_code} - {response.text}")
+        rows = response.json()
+        return (rows[0].get("settings") if rows else None) or {}
+
+    def update_settings(self, queue_id: str, changes: Dict[str, Any]) -> None:
+        """Merge changes into the queue's settings JSON"""
+        supabase_url, headers = self._connection()
+        settings = {**self.load_settings(queue_id), **changes}
+        response = requests.patch(
+            f"{supabase_url}/rest/v1/queues",
+            params={"id": f"eq.{queue_id}"},
+            headers=headers,
+            json={"settings": settings},
+            timeout=self.timeout
+        )
+        if response.status_code >= 300:
+            raise RuntimeError(f"settings update failed: {response.status_code} - {response.text}")
+
+    def insert_song(self, song: Dict[str, Any]) -> None:
+        """
+        Insert a song row. Goes through the execute_sql RPC because the
+        backend isn't the user who added the song, so RLS blocks a plain insert.
+        """
+        values = {
+            "id": f"'{sql_string(song['id'])}'",
+            "queue_id": f"'{sql_string(song['queue_id'])}'",
+            "title": f"'{sql_string(song['title'])}'",
+            "artist": f"'{sql_string(song['artist'])}'",
+            "album": f"'{sql_string(song.get('album') or '')}'",
+            "cover_url": f"'{sql_string(song.get('cover_url') or DEFAULT_COVER_URL)}'",
+            "duration": str(int(song.get("duration_ms") or DEFAULT_DURATION_MS)),
+            # Required by the schema; add_song_to_queue checks the profile exists
+            "added_by": f"'{sql_string(song['added_by'])}'",
+            "track_uri": f"'{sql_string(song['track_uri'])}'" if song.get("track_uri") else "NULL",
+            "played": "false"
+        }
+        if self.has_rank_key():
+            values["rank_key"] = f"'{sql_string(song['rank_key'])}'" if song.get("rank_key") else "NULL"
+        insert_sql = f"""
+        INSERT INTO songs ({", ".join(values)})
+        VALUES ({", ".join(values.values())})
+        RETURNING *
+        """
+        self._execute_sql(insert_sql, "insert")
+
+    def set_ranks(self, ranks: Dict[str, str], chunk_size: int = 500) -> None:
+        """Write many songs' rank keys with one UPDATE per chunk"""
+        if not self.has_rank_key():
+            return
+        items = list(ranks.items())
+        for start in range(0, len(items), chunk_size):
+            values = ",\n".join(
+                f"('{sql_string(song_id)}'::uuid, '{sql_string(rank_key)}')"
+                for song_id, rank_key in items[start:start + chunk_size]
+            )
+            self._execute_sql(f"""
+            UPDATE songs SET rank_key = ranks.rank_key
+            FROM (VALUES {values}) AS ranks(id, rank_key)
+            WHERE songs.id = ranks.id
+            """, "rank update")
+
+    def _execute_sql(self, sql: str, action: str) -> None:
+        supabase_url, headers = self._connection()
+        response = requests.post(
+            f"{supabase_url}/rest/v1/rpc/execute_sql",
+            headers=headers,
+            json={"sql": sql},
+            timeout=self.timeout
+        )
+        if response.status_code == 404:
+            raise RuntimeError("execute_sql RPC not available; see SUPABASE_SETUP.md")
+        if response.status_code >= 300:
+            raise RuntimeError(f"{action} failed: {response.status_code} - {response.text}")
+
+    def set_vote(self, song_id: str, user_id: str, vote_count: int) -> None:
+        """Upsert a user's vote on a song; a count of 0 withdraws it"""
+        supabase_url, headers = self._connection()
+        if vote_count <= 0:
+            response = requests.delete(
+                f"{supabase_url}/rest/v1/votes",
+                params={"song_id": f"eq.{song_id}", "profile_id": f"eq.{user_id}"},
+                headers=headers,
+                timeout=self.timeout
+            )
+        else:
+            response = requests.post(
+                f"{supabase_url}/rest/v1/votes",
+                params={"on_conflict": "song_id,profile_id"},
+                headers={**headers, "Prefer": "resolution=merge-duplicates"},
+                json={"song_id": song_id, "profile_id": user_id, "vote_count": vote_count},
+                timeout=self.timeout
+            )
+        if response.status_code >= 300:
+            raise RuntimeError(f"vote write failed: {response.status_code} - {response.text}")
+
+    def update_song(self, song_id: str, fields: Dict[str, Any]) -> None:
+        if "rank_key" in fields and not self.has_rank_key():
+            fields = {name: value for name, value in fields.items() if name != "rank_key"}
+            if not fields:
+                return
+        supabase_url, headers = self._connection()
+        response = requests.patch(
+            f"{supabase_url}/rest/v1/songs",
+            params={"id": f"eq.{song_id}"},
+            headers=headers,
+            json=fields,
+            timeout=self.timeout
+        )
+        if response.status_code >= 300:
+            raise RuntimeError(f"song update failed: {response.status_code} - {response.text}")
+
+    def mark_played(self, song_id: str, played_at: float) -> None:
+        self.update_song(song_id, {"played": True, "played_at": format_timestamp(played_at)})
+
+    def delete_song(self, song_id: str) -> None:
+        """
+        Delete a song and its votes in one statement; votes.song_id has no
+        ON DELETE CASCADE, so deleting the song row alone fails once voted.
+        """
+        song_id = sql_string(song_id)
+        self._execute_sql(f"""
+        WITH song_votes AS (DELETE FROM votes WHERE song_id = '{song_id}')
+        DELETE FROM songs WHERE id = '{song_id}'
+        """, "song delete")
+
+
+class QueuePersister:
+    """
+    Applies queue writes in the background, in the order they were made.
+
+    Writes are plain callables; a failed write is logged and counted, and
+    the engine keeps its in-memory state either way.
+    """
+
+    def __init__(self, max_pending: int = 100000):
+        self._queue: "queue.Queue[Optional[Tuple[str, Callable[[], None]]]]" = queue.Queue(maxsize=max_pending)
+        self._closed = False
+
+        self.submitted = 0
+        self.written = 0
+        self.failed = 0
+        self.dropped = 0
+
+        self._writer = threading.Thread(target=self._write_loop, name="queue-persister", daemon=True)
+        self._writer.start()
+
+    def submit(self, description: str, write: Callable[[], None]) -> None:
+        """Queue a write; never blocks"""
+        if self._closed:
+            return
+        try:
+            self._queue.put_nowait((description, write))
+            self.submitted += 1
+        except queue.Full:
+            self.dropped += 1
+            print(f"Queue persister backlog full, dropped write: {description}")
+
+    def _write_loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            description, write = item
+            try:
+                write()
+                self.written += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"Queue persister: {description} failed: {str(e)}")
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until every write submitted so far has been attempted"""
+        deadline = time.monotonic() + timeout
+        while self.written + self.failed < self.submitted:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join(timeout=10)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self._queue.qsize(),
+            "submitted": self.submitted,
+            "written": self.written,
+            "failed": self.failed,
+            "dropped": self.dropped
+        }
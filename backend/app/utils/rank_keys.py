@@ -0,0 +1,98 @@
+"""
+Fractional rank keys for QueueBeats backend
+Songs are ordered by short base-62 strings that compare correctly as plain
+text (Postgres COLLATE "C"). A key can always be made between any two
+others, so moving a song rewrites only that song's key. Keys get longer as
+songs are squeezed into the same gap; spread_keys() hands out fresh, evenly
+spaced keys when a queue is rebalanced.
+"""
+
+from typing import List, Optional
+
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+BASE = len(DIGITS)
+_INDEX = {digit: i for i, digit in enumerate(DIGITS)}
+
+# Room left between neighbouring keys after a rebalance: two digits' worth,
+# so roughly a dozen moves into the same gap before keys grow
+MIN_GAP = BASE ** 2
+
+
+def _midpoint(lower: str, upper: Optional[str]) -> str:
+    """A key strictly between lower and upper (None is past the end)"""
+    if upper is not None:
+        # Keep the shared prefix and recurse on the rest; missing digits in lower count as 0
+        n = 0
+        while n < len(upper) and (lower[n] if n < len(lower) else "0") == upper[n]:
+            n += 1
+        if n > 0:
+            return upper[:n] + _midpoint(lower[n:], upper[n:])
+
+    digit_lower = _INDEX[lower[0]] if lower else 0
+    digit_upper = _INDEX[upper[0]] if upper is not None else BASE
+    if digit_upper - digit_lower > 1:
+        return DIGITS[(digit_lower + digit_upper + 1) // 2]
+    if upper is not None and len(upper) > 1:
+        return upper[0]
+    return DIGITS[digit_lower] + _midpoint(lower[1:], None)
+
+
+def validate_key(key: str) -> None:
+    if not key or key.endswith(DIGITS[0]) or any(digit not in _INDEX for digit in key):
+        raise ValueError(f"invalid rank key {key!r}")
+
+
+def key_between(lower: Optional[str], upper: Optional[str]) -> str:
+    """
+    A key that sorts after lower and before upper. Either bound may be None
+    for the start or end of the order.
+    """
+    if lower is not None:
+        validate_key(lower)
+    if upper is not None:
+        validate_key(upper)
+        if lower is not None and lower >= upper:
+            raise ValueError(f"rank key {lower!r} is not below {upper!r}")
+    return _midpoint(lower or "", upper)
+
+
+def key_after(key: str, width: int = 1) -> str:
+    """
+    The next key after key, counting in steps of one at `width` digits (or
+    the key's own length if longer). Songs appended one after another then
+    keep keys of the same length instead of growing.
+    """
+    validate_key(key)
+    digits = [_INDEX[digit] for digit in key.ljust(width, DIGITS[0])]
+    i = len(digits) - 1
+    while i >= 0 and digits[i] == BASE - 1:
+        i -= 1
+    if i < 0:
+        # All top digits: only a longer key fits after it
+        return _midpoint(key, None)
+    digits[i] += 1
+    return "".join(DIGITS[digit] for digit in digits[:i + 1])
+
+
+def spread_width(count: int) -> int:
+    """Key length that leaves MIN_GAP between count evenly spaced keys"""
+    width = 1
+    while BASE ** width // (count + 1) < MIN_GAP:
+        width += 1
+    return width
+
+
+def spread_keys(count: int) -> List[str]:
+    """count ascending keys spaced evenly over the key space"""
+    width = spread_width(count)
+    gap = BASE ** width // (count + 1)
+    keys = []
+    for i in range(1, count + 1):
+        value = i * gap
+        digits = []
+        for _ in range(width):
+            value, digit = divmod(value, BASE)
+            digits.append(DIGITS[digit])
+        # Trailing zeros add nothing to the order; stripping them keeps keys valid
+        keys.append("".join(reversed(digits)).rstrip(DIGITS[0]))
+    return keys
@@ -0,0 +1,148 @@
+"""
+Bounded result cache for QueueBeats search endpoints
+LRU eviction with per-entry TTLs, short-lived negative entries and a stale
+window during which entries are still served while a refresh runs.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+# Lookup states returned by TTLCache.get
+FRESH = "fresh"
+STALE = "stale"
+
+
+class _Entry:
+    __slots__ = ("value", "fresh_until", "stale_until", "negative")
+
+    def __init__(self, value: Any, fresh_until: float, stale_until: float, negative: bool):
+        self.value = value
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+        self.negative = negative
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with TTLs and stale-while-revalidate.
+
+    Positive entries are fresh for `ttl` seconds and may then be served stale
+    for another `stale_ttl` seconds while the caller refreshes them. Negative
+    entries (empty results, upstream errors) live for `negative_ttl` seconds
+    and are never served stale.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: float = 300.0,
+        stale_ttl: float = 600.0,
+        negative_ttl: float = 15.0
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._refreshing: set = set()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Tuple[Any, Optional[str]]:
+        """
+        Look up a key.
+
+        Returns (value, FRESH), (value, STALE) or (None, None) on a miss.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, None
+
+            if now < entry.fresh_until:
+                self._entries.move_to_end(key)
+                if entry.negative:
+                    self.negative_hits += 1
+                else:
+                    self.hits += 1
+                return entry.value, FRESH
+
+            if now < entry.stale_until:
+                self._entries.move_to_end(key)
+                self.stale_hits += 1
+                return entry.value, STALE
+
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None, None
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a positive result"""
+        ttl = self.ttl if ttl is None else ttl
+        now = time.monotonic()
+        self._store(key, _Entry(value, now + ttl, now + ttl + self.stale_ttl, False))
+
+    def set_negative(self, key: Hashable, value: Any = None) -> None:
+        """Store an empty or failed result for a short time"""
+        now = time.monotonic()
+        expires = now + self.negative_ttl
+        self._store(key, _Entry(value, expires, expires, True))
+
+    def begin_refresh(self, key: Hashable) -> bool:
+        """
+        Claim the background refresh for a stale key.
+
+        Returns False if another caller is already refreshing it.
+        """
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def end_refresh(self, key: Hashable) -> None:
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.negative_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "refreshing": len(self._refreshing),
+                "hit_ratio": (
+                    (self.hits + self.stale_hits + self.negative_hits) / lookups
+                    if lookups else 0.0
+                )
+            }
+
+    def _store(self, key: Hashable, entry: _Entry) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
@@ -0,0 +1,352 @@
+"""
+Inverted prefix index over the local song catalog for QueueBeats backend
+Built once when the catalog is loaded so a search no longer lowercases and
+scans every title and artist. Each query token is matched as a prefix of a
+title, artist or album token; candidates are produced in catalog rank order
+and only a bounded number are scored, so search cost follows the result size
+rather than the catalog size.
+"""
+
+import heapq
+import itertools
+import math
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.utils.fuzzy_index import TrigramIndex
+from app.utils.text_normalize import query_tokens as tokenize_query, tokenize
+
+# Field weights for ranking: a title hit beats an artist hit beats an album hit
+TITLE, ARTIST, ALBUM = 0, 1, 2
+FIELD_WEIGHTS = (3.0, 2.0, 1.0)
+FIELDS = ("title", "artist", "album")
+
+# Prefixes this short match a large share of the catalog; their first
+# candidates in rank order are precomputed instead of merged per query
+SHORT_PREFIX_LENGTH = 2
+SHORT_PREFIX_KEEP = 1024
+
+# Prefixes expanding to at most this many terms are checked against their
+# posting lists by binary search; broader ones by scanning document tokens
+NARROW_PREFIX_TERMS = 8
+
+# Multi-token queries over narrow prefixes are intersected as sets when
+# their posting lists hold at most this many entries in total
+SET_INTERSECT_MAX_POSTINGS = 500000
+
+# How many matching candidates are scored per result slot requested
+CANDIDATES_PER_RESULT = 8
+MIN_CANDIDATES = 64
+
+# Fuzzy mode: lookalike terms tried per misspelled token, and how many
+# combinations of corrections are searched
+FUZZY_ALTERNATIVES = 3
+FUZZY_MAX_COMBINATIONS = 8
+
+
+class SongIndex:
+    """
+    Token postings over title, artist and album.
+
+    Songs get document ids in rank order (popularity, then catalog order), so
+    every posting list is sorted by rank and the best candidates come first.
+    The vocabulary is kept sorted, which turns a prefix into a contiguous
+    range of terms found by binary search.
+
+    Searching only needs sequence access to the structures built here, so an
+    index can also be assembled over other storage with from_storage().
+    """
+
+    def __init__(self, songs: Sequence[Dict[str, Any]]):
+        order = sorted(range(len(songs)), key=lambda i: -(songs[i].get("popularity") or 0))
+        self.songs: List[Dict[str, Any]] = [songs[i] for i in order]
+
+        # Per document: a tuple of token tuples, one per field
+        self._doc_tokens: List[Tuple[Tuple[str, ...], ...]] = []
+        postings: Dict[str, array] = {}
+
+        for doc_id, song in enumerate(self.songs):
+            fields = tuple(
+                tuple(sys.intern(token) for token in tokenize(song.get(field)))
+                for field in FIELDS
+            )
+            self._doc_tokens.append(fields)
+            for token in {token for field_tokens in fields for token in field_tokens}:
+                posting = postings.get(token)
+                if posting is None:
+                    posting = postings[token] = array("I")
+                posting.append(doc_id)
+
+        self._terms: List[str] = sorted(postings)
+        self._postings: List[array] = [postings[term] for term in self._terms]
+
+        # Cumulative document frequencies, to size a prefix range in O(1)
+        self._cumulative = array("Q", [0])
+        total = 0
+        for posting in self._postings:
+            total += len(posting)
+            self._cumulative.append(total)
+
+        self._short_prefixes: Dict[str, array] = {}
+        self._build_short_prefixes()
+
+        self._init_fuzzy()
+
+    @classmethod
+    def from_storage(
+        cls,
+        songs: Sequence[Dict[str, Any]],
+        doc_tokens: Sequence[Tuple[Tuple[str, ...], ...]],
+        terms: Sequence[str],
+        postings: Sequence[Sequence[int]],
+        cumulative: Sequence[int],
+        short_prefixes: Any
+    ) -> "SongIndex":
+        """
+        Wrap prebuilt index structures (e.g. views over a memory-mapped file).
+        songs must already be in rank order; short_prefixes needs get() and len().
+        """
+        index = cls.__new__(cls)
+        index.songs = songs
+        index._doc_tokens = doc_tokens
+        index._terms = terms
+        index._postings = postings
+        index._cumulative = cumulative
+        index._short_prefixes = short_prefixes
+        index._init_fuzzy()
+        return index
+
+    def structures(self) -> Tuple[Sequence[str], Sequence[Sequence[int]], Dict[str, Sequence[int]]]:
+        """The sorted terms, their postings and the short prefix heads, for serializing"""
+        return self._terms, self._postings, dict(self._short_prefixes)
+
+    def _init_fuzzy(self) -> None:
+        # Only needed for fuzzy searches, so built on first use
+        self._fuzzy: Optional[TrigramIndex] = None
+        self._fuzzy_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.songs)
+
+    @property
+    def vocabulary_size(self) -> int:
+        return len(self._terms)
+
+    def _term_range(self, prefix: str) -> Tuple[int, int]:
+        start = bisect_left(self._terms, prefix)
+        # Every term with this prefix sorts before prefix + the highest code point
+        end = bisect_left(self._terms, prefix + "\U0010ffff", start)
+        return start, end
+
+    def _build_short_prefixes(self) -> None:
+        prefixes = {term[:length] for term in self._terms for length in range(1, SHORT_PREFIX_LENGTH + 1)}
+        for prefix in prefixes:
+            start, end = self._term_range(prefix)
+            head = array("I")
+            for doc_id in self._merge(start, end):
+                head.append(doc_id)
+                if len(head) >= SHORT_PREFIX_KEEP:
+                    break
+            self._short_prefixes[prefix] = head
+
+    def _merge(self, start: int, end: int) -> Iterator[int]:
+        """Document ids matching any term in [start, end), in rank order without repeats"""
+        if end - start == 1:
+            yield from self._postings[start]
+            return
+        previous = -1
+        for doc_id in heapq.merge(*self._postings[start:end]):
+            if doc_id != previous:
+                previous = doc_id
+                yield doc_id
+
+    def _candidates(self, prefix: str) -> Iterator[int]:
+        start, end = self._term_range(prefix)
+        head = self._short_prefixes.get(prefix)
+        if head is None:
+            yield from self._merge(start, end)
+            return
+        yield from head
+        if len(head) >= SHORT_PREFIX_KEEP:
+            # Rarely needed: continue past the precomputed head
+            last = head[-1]
+            for doc_id in self._merge(start, end):
+                if doc_id > last:
+                    yield doc_id
+
+    def _has_prefix(self, doc_id: int, prefix: str) -> bool:
+        return any(token.startswith(prefix) for field_tokens in self._doc_tokens[doc_id] for token in field_tokens)
+
+    def _in_postings(self, doc_id: int, start: int, end: int) -> bool:
+        for posting in self._postings[start:end]:
+            position = bisect_left(posting, doc_id)
+            if position < len(posting) and posting[position] == doc_id:
+                return True
+        return False
+
+    def _score(self, doc_id: int, query_tokens: List[str]) -> float:
+        fields = self._doc_tokens[doc_id]
+        score = 0.0
+        for query_token in query_tokens:
+            best = 0.0
+            for field, field_tokens in enumerate(fields):
+                for position, token in enumerate(field_tokens):
+                    if not token.startswith(query_token):
+                        continue
+                    hit = FIELD_WEIGHTS[field]
+                    if token == query_token:
+                        hit *= 2
+                    if position == 0:
+                        hit += 0.5
+                    best = max(best, hit)
+            score += best
+
+        # The whole query as the start of the title is what typeahead users expect
+        title_tokens = fields[TITLE]
+        count = len(query_tokens)
+        if (
+            len(title_tokens) >= count and
+            list(title_tokens[:count - 1]) == query_tokens[:-1] and
+            title_tokens[count - 1].startswith(query_tokens[-1])
+        ):
+            score += 2.0
+        return score
+
+    def search_ids(self, query: str, limit: int = 20) -> List[int]:
+        """Document ids of the best matches for query, best first"""
+        query_tokens = list(tokenize_query(query))
+        if not query_tokens or limit <= 0:
+            return []
+
+        prefixes = list(dict.fromkeys(query_tokens))
+        ranges = []
+        for prefix in prefixes:
+            start, end = self._term_range(prefix)
+            if start == end:
+                return []
+            ranges.append((self._cumulative[end] - self._cumulative[start], prefix, start, end))
+
+        # Drive from the most selective token and check the rest per document
+        ranges.sort()
+        driver = ranges[0][1]
+        others = ranges[1:]
+
+        wanted = max(MIN_CANDIDATES, limit * CANDIDATES_PER_RESULT)
+        if others and self._can_intersect(ranges):
+            matched = self._intersect(ranges, wanted)
+        else:
+            matched = self._filter_candidates(driver, others, wanted)
+
+        scored = [(-self._score(doc_id, query_tokens), doc_id) for doc_id in matched]
+        return [doc_id for _, doc_id in heapq.nsmallest(limit, scored)]
+
+    def _can_intersect(self, ranges: List[Tuple[int, str, int, int]]) -> bool:
+        return (
+            all(end - start <= NARROW_PREFIX_TERMS for _, _, start, end in ranges) and
+            sum(size for size, _, _, _ in ranges) <= SET_INTERSECT_MAX_POSTINGS
+        )
+
+    def _intersect(self, ranges: List[Tuple[int, str, int, int]], wanted: int) -> List[int]:
+        """Documents matching every prefix, intersected smallest first"""
+        _, _, start, end = ranges[0]
+        docs = set(itertools.chain.from_iterable(self._postings[start:end]))
+        for _, _, start, end in ranges[1:]:
+            if not docs:
+                break
+            docs = docs.intersection(itertools.chain.from_iterable(self._postings[start:end]))
+        return heapq.nsmallest(wanted, docs)
+
+    def _filter_candidates(self, driver: str, others: List[Tuple[int, str, int, int]], wanted: int) -> List[int]:
+        """Walk the driver's candidates in rank order, keeping those matching the other prefixes"""
+        matched: List[int] = []
+        for doc_id in self._candidates(driver):
+            if all(
+                self._in_postings(doc_id, start, end) if end - start <= NARROW_PREFIX_TERMS
+                else self._has_prefix(doc_id, prefix)
+                for _, prefix, start, end in others
+            ):
+                matched.append(doc_id)
+                if len(matched) >= wanted:
+                    break
+        return matched
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        return [self.songs[doc_id] for doc_id in self.search_ids(query, limit)]
+
+    @property
+    def fuzzy(self) -> TrigramIndex:
+        if self._fuzzy is None:
+            with self._fuzzy_lock:
+                if self._fuzzy is None:
+                    frequencies = [len(posting) for posting in self._postings]
+                    self._fuzzy = TrigramIndex(self._terms, frequencies)
+        return self._fuzzy
+
+    def fuzzy_search_ids(self, query: str, limit: int = 20) -> Tuple[List[int], Optional[str]]:
+        """
+        Like search_ids, but tokens that match nothing are replaced by similar
+        catalog terms. Returns the document ids and a "did you mean" query
+        when a correction was made.
+        """
+        query_tokens = list(tokenize_query(query))
+        if not query_tokens or limit <= 0:
+            return [], None
+
+        alternatives: List[List[Tuple[str, float]]] = []
+        suggested: List[str] = []
+        for token in query_tokens:
+            start, end = self._term_range(token)
+            if start < end:
+                alternatives.append([(token, 1.0)])
+                suggested.append(token)
+                continue
+            similar = self.fuzzy.similar(token, limit=FUZZY_ALTERNATIVES)
+            # A token with no lookalike is left out rather than failing the query
+            if similar:
+                alternatives.append(similar)
+                suggested.append(similar[0][0])
+            else:
+                suggested.append(token)
+
+        if not alternatives:
+            return [], None
+
+        suggestion = " ".join(suggested)
+        if suggestion == " ".join(query_tokens):
+            suggestion = None
+
+        # Search the most similar combinations of corrections first; long
+        # queries with many misspellings only try the best correction each
+        if math.prod(len(options) for options in alternatives) > FUZZY_MAX_COMBINATIONS * 32:
+            alternatives = [options[:1] for options in alternatives]
+        combinations = sorted(
+            itertools.product(*alternatives),
+            key=lambda combination: -sum(similarity for _, similarity in combination)
+        )[:FUZZY_MAX_COMBINATIONS]
+
+        results: List[int] = []
+        seen = set()
+        for combination in combinations:
+            for doc_id in self.search_ids(" ".join(term for term, _ in combination), limit):
+                if doc_id not in seen:
+                    seen.add(doc_id)
+                    results.append(doc_id)
+            if len(results) >= limit:
+                break
+
+        return results[:limit], suggestion
+
+    def fuzzy_search(self, query: str, limit: int = 20) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        doc_ids, suggestion = self.fuzzy_search_ids(query, limit)
+        return [self.songs[doc_id] for doc_id in doc_ids], suggestion
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "songs": len(self.songs),
+            "terms": len(self._terms),
+            "postings": self._cumulative[-1],
+            "short_prefixes": len(self._short_prefixes)
+        }
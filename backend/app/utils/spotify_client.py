@@ -0,0 +1,283 @@
+"""
+Shared async HTTP client for Spotify calls in QueueBeats backend
+One pooled httpx.AsyncClient per process so calls to accounts.spotify.com and
+api.spotify.com reuse keep-alive connections (HTTP/2 when the h2 package is
+installed) instead of paying a TCP+TLS handshake each time.
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.utils.latency import HedgeBudget, LatencyTracker
+
+from app.utils.spotify_rate_limit import (
+    INTERACTIVE,
+    SpotifyGovernor,
+    SpotifyRateLimitError,
+    get_governor,
+    parse_retry_after
+)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+SPOTIFY_API_URL = "https://api.spotify.com/v1"
+SPOTIFY_TOKEN_URL = "https://accounts.spotify.com/api/token"
+
+
+class SpotifyTimeoutError(Exception):
+    """Raised when a Spotify call exceeds its adaptive timeout"""
+
+    def __init__(self, timeout: float):
+        super().__init__(f"Spotify did not respond within {timeout:.1f}s")
+        self.timeout = timeout
+
+
+class SpotifyClient:
+    """
+    Thin wrapper around a lazily created, pooled httpx.AsyncClient.
+
+    Every call is admitted by the rate governor first. A 429 pauses the
+    governor for Retry-After and the call is retried while the wait is short;
+    otherwise SpotifyRateLimitError is raised.
+
+    Each call gets a timeout derived from the observed latency of its
+    endpoint. Idempotent calls may be hedged: if no response has arrived
+    after the endpoint's p95 latency, an identical second request is sent
+    and whichever answers first wins, within a budget on hedge volume.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 60.0,
+        timeout: float = 10.0,
+        connect_timeout: float = 5.0,
+        max_retries: int = 2,
+        max_retry_wait: float = 5.0,
+        min_timeout: float = 1.0,
+        hedge_ratio: float = 0.05
+    ):
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self._timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self._client: Optional[httpx.AsyncClient] = None
+        self.max_retries = max_retries
+        self.max_retry_wait = max_retry_wait
+
+        self._connect_timeout = connect_timeout
+        self._min_timeout = min_timeout
+        self._max_timeout = timeout
+        # Per endpoint path, e.g. "/v1/search" or "/api/token"
+        self._latency: Dict[str, LatencyTracker] = {}
+        self.hedge_budget = HedgeBudget(ratio=hedge_ratio)
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                limits=self._limits,
+                timeout=self._timeout,
+                headers={"Accept": "application/json"}
+            )
+        return self._client
+
+    async def get(
+        self,
+        path: str,
+        access_token: str,
+        params: Optional[Dict[str, Any]] = None,
+        priority: int = INTERACTIVE,
+        queue_key: Optional[str] = None,
+        governor: Optional[SpotifyGovernor] = None,
+        max_retries: Optional[int] = None,
+        hedge: bool = False
+    ) -> httpx.Response:
+        """GET a Web API path such as "/search" with a bearer token"""
+        return await self._send(
+            "GET",
+            f"{SPOTIFY_API_URL}{path}",
+            priority,
+            queue_key,
+            governor,
+            max_retries,
+            hedge,
+            params=params,
+            headers={"Authorization": f"Bearer {access_token}"}
+        )
+
+    async def post_token(
+        self,
+        data: Dict[str, str],
+        credentials: Tuple[str, str],
+        priority: int = INTERACTIVE,
+        governor: Optional[SpotifyGovernor] = None
+    ) -> httpx.Response:
+        """POST a grant to the accounts token endpoint with HTTP basic auth"""
+        return await self._send(
+            "POST",
+            SPOTIFY_TOKEN_URL,
+            priority,
+            None,
+            governor,
+            None,
+            False,
+            data=data,
+            auth=credentials,
+            headers={"Content-Type": "application/x-www-form-urlencoded"}
+        )
+
+    async def _send(
+        self,
+        method: str,
+        url: str,
+        priority: int,
+        queue_key: Optional[str],
+        governor: Optional[SpotifyGovernor],
+        max_retries: Optional[int],
+        hedge: bool,
+        **kwargs
+    ) -> httpx.Response:
+        governor = governor or get_governor()
+        max_retries = self.max_retries if max_retries is None else max_retries
+        tracker = self._tracker(url)
+        attempt = 0
+        while True:
+            await governor.acquire(priority, queue_key)
+            if hedge:
+                response = await self._hedged_request(tracker, governor, method, url, **kwargs)
+            else:
+                response = await self._timed_request(tracker, method, url, **kwargs)
+            if response.status_code != 429:
+                return response
+
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            governor.penalize(retry_after)
+            print(f"Spotify rate limited {method} {url}: retry after {retry_after}s")
+
+            attempt += 1
+            if attempt > max_retries or retry_after > self.max_retry_wait:
+                raise SpotifyRateLimitError(retry_after)
+
+    def _tracker(self, url: str) -> LatencyTracker:
+        path = urlsplit(url).path
+        tracker = self._latency.get(path)
+        if tracker is None:
+            tracker = LatencyTracker(
+                default_timeout=self._max_timeout,
+                min_timeout=self._min_timeout,
+                max_timeout=self._max_timeout
+            )
+            self._latency[path] = tracker
+        return tracker
+
+    async def _timed_request(self, tracker: LatencyTracker, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send one request with the endpoint's adaptive timeout and record its latency"""
+        timeout = tracker.timeout()
+        started = time.monotonic()
+        try:
+            response = await self.http.request(
+                method,
+                url,
+                timeout=httpx.Timeout(timeout, connect=min(timeout, self._connect_timeout)),
+                **kwargs
+            )
+        except httpx.TimeoutException:
+            tracker.record_timeout(timeout)
+            raise SpotifyTimeoutError(timeout)
+        tracker.record(time.monotonic() - started)
+        return response
+
+    async def _hedged_request(
+        self,
+        tracker: LatencyTracker,
+        governor: SpotifyGovernor,
+        method: str,
+        url: str,
+        **kwargs
+    ) -> httpx.Response:
+        """Send a request and, if it is slower than p95, race an identical second one"""
+        self.hedge_budget.on_request()
+        primary = asyncio.ensure_future(self._timed_request(tracker, method, url, **kwargs))
+
+        try:
+            delay = tracker.hedge_delay()
+            if delay is None:
+                return await primary
+
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done or not self.hedge_budget.try_spend():
+                return await primary
+            # Hedges are optional: skip them rather than queue behind the rate limit
+            if not governor.try_acquire():
+                self.hedge_budget.refund()
+                return await primary
+        except asyncio.CancelledError:
+            # asyncio.wait doesn't cancel what it waits on; don't leave the request running
+            primary.cancel()
+            raise
+
+        secondary = asyncio.ensure_future(self._timed_request(tracker, method, url, **kwargs))
+        pending = {primary, secondary}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is secondary:
+                            self.hedge_budget.hedge_wins += 1
+                        return task.result()
+                # Both failed: surface the primary's error
+                if not pending:
+                    return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "http2": HTTP2_AVAILABLE,
+            "latency": {path: tracker.stats() for path, tracker in self._latency.items()},
+            "hedging": self.hedge_budget.stats()
+        }
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+_client: Optional[SpotifyClient] = None
+
+
+def get_spotify_client() -> SpotifyClient:
+    """Return the process-wide Spotify client"""
+    global _client
+    if _client is None:
+        _client = SpotifyClient(
+            max_connections=int(os.environ.get("SPOTIFY_HTTP_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.environ.get("SPOTIFY_HTTP_MAX_KEEPALIVE", "20")),
+            timeout=float(os.environ.get("SPOTIFY_HTTP_MAX_TIMEOUT", "10")),
+            min_timeout=float(os.environ.get("SPOTIFY_HTTP_MIN_TIMEOUT", "1")),
+            hedge_ratio=float(os.environ.get("SPOTIFY_HEDGE_RATIO", "0.05"))
+        )
+    return _client
+
+
+async def close_spotify_client() -> None:
+    """Close pooled connections; called on application shutdown"""
+    if _client is not None:
+        await _client.aclose()
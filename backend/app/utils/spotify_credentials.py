@@ -0,0 +1,183 @@
+"""
+Sharded Spotify app credentials for QueueBeats backend
+Spreads client-credentials traffic (searches, metadata lookups) over several
+Spotify apps, each with its own cached token and rate-limit governor, so the
+aggregate throughput is not capped by a single app's quota. Throttled
+credentials are skipped and calls fail over to the next one.
+
+Configure with SPOTIFY_CLIENT_CREDENTIALS="id1:secret1,id2:secret2"; the
+SPOTIFY_CLIENT_ID/SPOTIFY_CLIENT_SECRET pair is always included first.
+SPOTIFY_CREDENTIAL_STRATEGY selects "least_loaded" (default) or "hash"
+(rendezvous hashing on the query so repeats hit the same app).
+"""
+
+import hashlib
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from fastapi import HTTPException
+
+from app.utils.spotify_rate_limit import SpotifyGovernor, SpotifyRateLimitError, get_governor
+from app.utils.spotify_token import SpotifyTokenManager
+
+T = TypeVar("T")
+
+LEAST_LOADED = "least_loaded"
+HASH = "hash"
+
+
+class SpotifyCredential:
+    """One Spotify app: its token cache, governor and usage counters"""
+
+    def __init__(self, client_id: str, client_secret: str, governor: SpotifyGovernor):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.governor = governor
+        self.tokens = SpotifyTokenManager(client_id, client_secret, governor=governor)
+
+        self.in_flight = 0
+        self.requests = 0
+        self.rate_limited = 0
+        self.errors = 0
+
+    @property
+    def label(self) -> str:
+        # Enough of the client ID to tell apps apart without logging it whole
+        return f"{self.client_id[:6]}..."
+
+    def load(self) -> int:
+        return self.in_flight + self.governor.waiting
+
+    def is_throttled(self) -> bool:
+        return self.governor.blocked_for() > 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "client_id": self.label,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "rate_limited": self.rate_limited,
+            "errors": self.errors,
+            "token_valid": self.tokens.has_valid_token(),
+            "governor": self.governor.stats()
+        }
+
+
+class SpotifyCredentialPool:
+    """Chooses a credential per call and fails over when one is throttled"""
+
+    def __init__(self, credentials: List[SpotifyCredential], strategy: str = LEAST_LOADED):
+        self.credentials = credentials
+        self.strategy = strategy
+        self.failovers = 0
+
+    @property
+    def size(self) -> int:
+        return len(self.credentials)
+
+    def candidates(self, key: Optional[str] = None) -> List[SpotifyCredential]:
+        """Credentials in preference order; throttled ones go last"""
+        available = list(self.credentials)
+
+        if self.strategy == HASH and key is not None:
+            available.sort(key=lambda c: _rendezvous_score(key, c.client_id), reverse=True)
+        else:
+            available.sort(key=lambda c: c.load())
+
+        return (
+            [c for c in available if not c.is_throttled()] +
+            sorted((c for c in available if c.is_throttled()), key=lambda c: c.governor.blocked_for())
+        )
+
+    async def run(self, fn: Callable[[SpotifyCredential], Awaitable[T]], key: Optional[str] = None) -> T:
+        """
+        Call fn with the preferred credential, retrying on the next one when
+        it is rate limited. Raises the last SpotifyRateLimitError when every
+        credential is throttled.
+        """
+        if not self.credentials:
+            raise HTTPException(status_code=500, detail="Spotify credentials not configured. Please set SPOTIFY_CLIENT_ID and SPOTIFY_CLIENT_SECRET environment variables.")
+
+        tried: List[SpotifyCredential] = []
+        last_error: Optional[SpotifyRateLimitError] = None
+
+        for credential in self.candidates(key):
+            if tried:
+                self.failovers += 1
+                print(f"Spotify credential {tried[-1].label} throttled, failing over to {credential.label}")
+            tried.append(credential)
+
+            credential.in_flight += 1
+            credential.requests += 1
+            try:
+                return await fn(credential)
+            except SpotifyRateLimitError as e:
+                credential.rate_limited += 1
+                last_error = e
+            except Exception:
+                credential.errors += 1
+                raise
+            finally:
+                credential.in_flight -= 1
+
+        raise last_error
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "strategy": self.strategy,
+            "failovers": self.failovers,
+            "credentials": [c.stats() for c in self.credentials]
+        }
+
+
+def _rendezvous_score(key: str, client_id: str) -> int:
+    digest = hashlib.blake2b(f"{client_id}:{key}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def get_spotify_credential_list() -> List[Tuple[str, str]]:
+    """All configured (client_id, client_secret) pairs, primary app first"""
+    pairs: List[Tuple[str, str]] = []
+
+    client_id = os.environ.get("SPOTIFY_CLIENT_ID")
+    client_secret = os.environ.get("SPOTIFY_CLIENT_SECRET")
+    if client_id and client_secret:
+        pairs.append((client_id, client_secret))
+
+    for entry in os.environ.get("SPOTIFY_CLIENT_CREDENTIALS", "").split(","):
+        entry = entry.strip()
+        if not entry or ":" not in entry:
+            continue
+        extra_id, extra_secret = (part.strip() for part in entry.split(":", 1))
+        if extra_id and extra_secret and (extra_id, extra_secret) not in pairs:
+            pairs.append((extra_id, extra_secret))
+
+    return pairs
+
+
+_pool: Optional[SpotifyCredentialPool] = None
+_pool_config: List[Tuple[str, str]] = []
+
+
+def get_credential_pool() -> SpotifyCredentialPool:
+    """Return the process-wide credential pool, rebuilt if the configuration changed"""
+    global _pool, _pool_config
+    pairs = get_spotify_credential_list()
+    if _pool is None or pairs != _pool_config:
+        default_governor = get_governor()
+        credentials = []
+        for index, (client_id, client_secret) in enumerate(pairs):
+            # The primary app shares the default governor with the user auth routes
+            governor = default_governor if index == 0 else SpotifyGovernor(
+                rate=default_governor.rate,
+                burst=default_governor.burst,
+                max_waiting=default_governor.max_waiting,
+                max_wait=default_governor.max_wait
+            )
+            credentials.append(SpotifyCredential(client_id, client_secret, governor))
+        _pool = SpotifyCredentialPool(
+            credentials,
+            strategy=os.environ.get("SPOTIFY_CREDENTIAL_STRATEGY", LEAST_LOADED)
+        )
+        _pool_config = pairs
+    return _pool
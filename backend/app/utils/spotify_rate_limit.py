@@ -0,0 +1,229 @@
+"""
+Outbound rate governor for Spotify calls in QueueBeats backend
+A token bucket sized to the app's quota paces every Spotify request. When the
+bucket is empty, callers wait in a small priority queue: interactive guest
+searches go before background work, and within a priority class waiters are
+served round-robin per queue so one busy party cannot starve the others.
+A 429 response pauses the whole governor for the Retry-After period.
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Optional
+
+from fastapi import HTTPException
+
+# Priority classes, lower is served first
+INTERACTIVE = 0
+BACKGROUND = 1
+
+DEFAULT_QUEUE_KEY = "global"
+
+
+class SpotifyRateLimitError(Exception):
+    """Raised when a call cannot be admitted or Spotify keeps answering 429"""
+
+    def __init__(self, retry_after: float, message: str = "Spotify rate limit reached"):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    def to_http_exception(self) -> HTTPException:
+        """Surface as a 429 with Retry-After instead of a generic 500"""
+        retry_after = max(1, math.ceil(self.retry_after))
+        return HTTPException(
+            status_code=429,
+            detail=f"{str(self)}, please retry in {retry_after}s",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+
+class SpotifyGovernor:
+    """Token bucket plus a fair, bounded priority queue of waiting callers"""
+
+    def __init__(
+        self,
+        rate: float = 20.0,
+        burst: int = 40,
+        max_waiting: int = 256,
+        max_wait: float = 10.0
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.max_waiting = max_waiting
+        self.max_wait = max_wait
+
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+
+        # priority -> queue key -> waiting futures; key order is the round-robin order
+        self._queues: Dict[int, "OrderedDict[str, Deque[asyncio.Future]]"] = {}
+        self._waiting = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.throttled = 0
+
+    async def acquire(self, priority: int = INTERACTIVE, queue_key: Optional[str] = None) -> None:
+        """Wait until a call may be sent. Raises SpotifyRateLimitError if it can't be admitted."""
+        queue_key = queue_key or DEFAULT_QUEUE_KEY
+        self._refill()
+
+        if not self._waiting and self._tokens >= 1 and not self._is_blocked():
+            self._tokens -= 1
+            self.admitted += 1
+            return
+
+        if self._waiting >= self.max_waiting:
+            self.rejected += 1
+            raise SpotifyRateLimitError(self._estimated_wait(), "Too many Spotify requests queued")
+
+        future = asyncio.get_running_loop().create_future()
+        waiters = self._queues.setdefault(priority, OrderedDict()).setdefault(queue_key, deque())
+        waiters.append(future)
+        self._waiting += 1
+        self.queued += 1
+        self._dispatch()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # Admitted just as we gave up; hand the slot to the next waiter
+                self._tokens += 1
+                self._dispatch()
+            else:
+                future.cancel()
+                self._remove_waiter(priority, queue_key, future)
+            if isinstance(e, asyncio.TimeoutError):
+                self.rejected += 1
+                raise SpotifyRateLimitError(self._estimated_wait(), "Timed out waiting for Spotify rate limit")
+            raise
+
+    def try_acquire(self) -> bool:
+        """Take a token only if one is free right now; for optional work such as hedges"""
+        self._refill()
+        if not self._waiting and self._tokens >= 1 and not self._is_blocked():
+            self._tokens -= 1
+            self.admitted += 1
+            return True
+        return False
+
+    def penalize(self, retry_after: float) -> None:
+        """Stop admitting calls for retry_after seconds after a 429"""
+        self.throttled += 1
+        self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+        self._tokens = 0.0
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    def blocked_for(self) -> float:
+        """Seconds until calls are admitted again after a 429, 0 if not blocked"""
+        return max(0.0, self._blocked_until - time.monotonic())
+
+    def stats(self) -> Dict[str, Any]:
+        self._refill()
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "tokens": round(self._tokens, 2),
+            "waiting": self._waiting,
+            "blocked_for": round(self.blocked_for(), 2),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "throttled": self.throttled
+        }
+
+    def _is_blocked(self) -> bool:
+        return time.monotonic() < self._blocked_until
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if now < self._blocked_until:
+            self._last_refill = now
+            return
+        elapsed = now - max(self._last_refill, self._blocked_until)
+        self._tokens = min(float(self.burst), self._tokens + elapsed * self.rate)
+        self._last_refill = now
+
+    def _estimated_wait(self) -> float:
+        return self.blocked_for() + (self._waiting + 1) / self.rate
+
+    def _next_waiter(self) -> Optional[asyncio.Future]:
+        for priority in sorted(self._queues):
+            queues = self._queues[priority]
+            while queues:
+                queue_key, waiters = next(iter(queues.items()))
+                future = waiters.popleft()
+                # Rotate so the next admission from this class goes to another queue
+                if waiters:
+                    queues.move_to_end(queue_key)
+                else:
+                    del queues[queue_key]
+                self._waiting -= 1
+                if not future.done():
+                    return future
+            del self._queues[priority]
+        return None
+
+    def _remove_waiter(self, priority: int, queue_key: str, future: asyncio.Future) -> None:
+        waiters = self._queues.get(priority, {}).get(queue_key)
+        if waiters is None or future not in waiters:
+            return
+        waiters.remove(future)
+        self._waiting -= 1
+        if not waiters:
+            del self._queues[priority][queue_key]
+            if not self._queues[priority]:
+                del self._queues[priority]
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        self._refill()
+
+        while self._waiting and self._tokens >= 1 and not self._is_blocked():
+            future = self._next_waiter()
+            if future is None:
+                break
+            self._tokens -= 1
+            self.admitted += 1
+            future.set_result(None)
+
+        if self._waiting and self._timer is None:
+            delay = max(self.blocked_for(), (1 - self._tokens) / self.rate, 0.001)
+            self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+
+
+_governor: Optional[SpotifyGovernor] = None
+
+
+def get_governor() -> SpotifyGovernor:
+    """Return the process-wide governor, sized from SPOTIFY_RATE_LIMIT_* settings"""
+    global _governor
+    if _governor is None:
+        _governor = SpotifyGovernor(
+            rate=float(os.environ.get("SPOTIFY_RATE_LIMIT_PER_SEC", "20")),
+            burst=int(os.environ.get("SPOTIFY_RATE_LIMIT_BURST", "40")),
+            max_waiting=int(os.environ.get("SPOTIFY_RATE_LIMIT_MAX_WAITING", "256")),
+            max_wait=float(os.environ.get("SPOTIFY_RATE_LIMIT_MAX_WAIT", "10"))
+        )
+    return _governor
+
+
+def parse_retry_after(value: Optional[str], default: float = 1.0) -> float:
+    """Parse a Retry-After header given in seconds"""
+    try:
+        return max(0.0, float(value)) if value is not None else default
+    except ValueError:
+        return default
@@ -0,0 +1,129 @@
+"""
+Spotify client-credentials token cache for QueueBeats backend
+Obtains an app access token once and reuses it across requests until shortly
+before it expires. Refreshes happen in the background so no request waits on
+them, and concurrent requests share a single in-flight refresh.
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+from fastapi import HTTPException
+
+from app.utils.spotify_client import get_spotify_client
+from app.utils.spotify_rate_limit import (
+    BACKGROUND,
+    INTERACTIVE,
+    SpotifyGovernor,
+    SpotifyRateLimitError
+)
+
+# Start refreshing this many seconds before the token expires
+DEFAULT_REFRESH_MARGIN = 300.0
+
+
+class SpotifyTokenManager:
+    """Caches a client-credentials access token for one Spotify app"""
+
+    def __init__(
+        self,
+        client_id: str,
+        client_secret: str,
+        refresh_margin: float = DEFAULT_REFRESH_MARGIN,
+        governor: Optional[SpotifyGovernor] = None
+    ):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.refresh_margin = refresh_margin
+        # Token calls count against the same app's rate limit as its searches
+        self.governor = governor
+
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._refresh_at = 0.0
+
+        # The one in-flight request to the token endpoint, if any
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def get_token(self) -> str:
+        """
+        Return a valid access token.
+
+        Served from cache while fresh. Inside the refresh window the cached
+        token is still returned and a single background refresh is started.
+        Only when there is no usable token does the caller wait, and then
+        all concurrent callers await the same fetch.
+        """
+        now = time.monotonic()
+        token = self._token
+
+        if token and now < self._refresh_at:
+            return token
+
+        if token and now < self._expires_at:
+            # Proactive refresh is background work for the rate governor
+            self._ensure_refresh(BACKGROUND)
+            return token
+
+        task = self._ensure_refresh(INTERACTIVE)
+
+        # shield() so one caller going away doesn't cancel everyone's fetch
+        return await asyncio.shield(task)
+
+    def has_valid_token(self) -> bool:
+        return self._token is not None and time.monotonic() < self._expires_at
+
+    def invalidate(self) -> None:
+        """Drop the cached token, e.g. after Spotify rejected it with a 401"""
+        self._token = None
+        self._expires_at = 0.0
+        self._refresh_at = 0.0
+
+    def _ensure_refresh(self, priority: int) -> asyncio.Task:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self._fetch_token(priority))
+            self._refresh_task.add_done_callback(self._log_refresh_failure)
+        return self._refresh_task
+
+    @staticmethod
+    def _log_refresh_failure(task: asyncio.Task) -> None:
+        # Retrieve the exception so background failures don't go unobserved;
+        # the current token is still valid and the next request will retry
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Spotify token refresh failed: {str(task.exception())}")
+
+    async def _fetch_token(self, priority: int) -> str:
+        """Request a new token from Spotify"""
+        try:
+            auth_response = await get_spotify_client().post_token(
+                {"grant_type": "client_credentials"},
+                (self.client_id, self.client_secret),
+                priority=priority,
+                governor=self.governor
+            )
+        except SpotifyRateLimitError as e:
+            raise e.to_http_exception()
+        except Exception as e:
+            print(f"Exception during Spotify authentication: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error during Spotify authentication: {str(e)}")
+
+        print(f"Spotify auth response: status_code={auth_response.status_code}")
+
+        if auth_response.status_code != 200:
+            error_content = auth_response.text
+            print(f"Auth error content: {error_content}")
+            raise HTTPException(status_code=500, detail=f"Failed to authenticate with Spotify: {error_content}")
+
+        token_data = auth_response.json()
+        expires_in = float(token_data.get("expires_in", 3600))
+        margin = min(self.refresh_margin, expires_in / 2)
+
+        now = time.monotonic()
+        self._token = token_data["access_token"]
+        self._expires_at = now + expires_in
+        self._refresh_at = now + expires_in - margin
+        print(f"Obtained Spotify access token, expires in {int(expires_in)}s")
+
+        return self._token
+
@@ -0,0 +1,61 @@
+"""
+Search text normalization for QueueBeats backend
+One pipeline shared by the local catalog, the track catalog and the Spotify
+search cache, so "Beyoncé", "BEYONCE" and "ｂｅｙｏｎｃｅ" are the same search.
+Text is NFKD-folded (fullwidth and compatibility forms become plain
+characters), diacritics are stripped, case is folded, apostrophes are
+dropped ("don't" -> "dont"), "&" becomes "and", and any other punctuation or
+symbol separates tokens ("÷ (Divide)" -> "divide").
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+# Letters and digits in any script; underscores count as separators
+_SEPARATORS = re.compile(r"[\W_]+", re.UNICODE)
+_APOSTROPHES = re.compile(r"['‘’ʼ`´]")
+
+QUERY_CACHE_SIZE = 4096
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Normalized tokens of text joined by single spaces"""
+    return " ".join(tokenize(text))
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Split text into normalized search tokens"""
+    if not text:
+        return []
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(c for c in text if not unicodedata.combining(c))
+    text = text.casefold()
+    if "'" in text or not text.isascii():
+        text = _APOSTROPHES.sub("", text)
+    if "&" in text:
+        text = text.replace("&", " and ")
+    return [token for token in _SEPARATORS.split(text) if token]
+
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def query_tokens(query: str) -> Tuple[str, ...]:
+    """tokenize() for incoming queries, which repeat a lot, behind an LRU"""
+    return tuple(tokenize(query))
+
+
+def query_key(query: str) -> str:
+    """Canonical form of a query, for cache keys and logs"""
+    return " ".join(query_tokens(query))
+
+
+def query_cache_stats() -> dict:
+    info = query_tokens.cache_info()
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "size": info.currsize,
+        "max_size": info.maxsize
+    }
@@ -0,0 +1,463 @@
+"""
+Persistent local track catalog for QueueBeats backend
+Keeps every Spotify track the backend has seen in an on-disk SQLite database
+with an FTS5 full-text index, so repeated searches and track lookups can be
+answered locally instead of asking Spotify for the same metadata again.
+Writes are queued and applied in batches by a background thread, so request
+handlers never wait on the disk.
+"""
+
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.utils.canonical import canonical_key
+from app.utils.text_normalize import normalize_text, query_tokens
+
+DEFAULT_CATALOG_PATH = Path(__file__).resolve().parent.parent.parent / "data" / "track_catalog.sqlite3"
+
+TRACK_COLUMNS = ("id", "name", "uri", "artists", "album", "album_art", "duration_ms", "popularity", "preview_url", "isrc")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    rowid INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    uri TEXT,
+    artists TEXT NOT NULL,
+    artist_names TEXT NOT NULL,
+    album TEXT,
+    album_art TEXT,
+    duration_ms INTEGER,
+    popularity INTEGER,
+    preview_url TEXT,
+    content_hash TEXT,
+    updated_at REAL NOT NULL,
+    isrc TEXT,
+    canonical_key TEXT
+);
+-- Other releases of a recording, pointing at its one stored row
+CREATE TABLE IF NOT EXISTS track_aliases (
+    id TEXT PRIMARY KEY,
+    canonical_id TEXT NOT NULL
+);
+"""
+
+# Columns added after the first schema, created on open if missing
+ADDED_COLUMNS = (("content_hash", "TEXT"), ("isrc", "TEXT"), ("canonical_key", "TEXT"))
+
+INDEX_SCHEMA = """
+CREATE INDEX IF NOT EXISTS tracks_canonical_key ON tracks(canonical_key);
+"""
+
+# Search text is stored already normalized by the shared pipeline
+# (qb_normalize), so the catalog matches queries exactly like the in-memory index
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS tracks_search USING fts5(
+    name, artist_names, album, tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS tracks_search_ai AFTER INSERT ON tracks BEGIN
+    INSERT INTO tracks_search(rowid, name, artist_names, album)
+    VALUES (new.rowid, qb_normalize(new.name), qb_normalize(new.artist_names), qb_normalize(new.album));
+END;
+CREATE TRIGGER IF NOT EXISTS tracks_search_ad AFTER DELETE ON tracks BEGIN
+    DELETE FROM tracks_search WHERE rowid = old.rowid;
+END;
+CREATE TRIGGER IF NOT EXISTS tracks_search_au AFTER UPDATE ON tracks BEGIN
+    DELETE FROM tracks_search WHERE rowid = old.rowid;
+    INSERT INTO tracks_search(rowid, name, artist_names, album)
+    VALUES (new.rowid, qb_normalize(new.name), qb_normalize(new.artist_names), qb_normalize(new.album));
+END;
+"""
+
+# The first catalog schema indexed raw text through an external-content table
+LEGACY_FTS_SCHEMA = """
+DROP TRIGGER IF EXISTS tracks_ai;
+DROP TRIGGER IF EXISTS tracks_ad;
+DROP TRIGGER IF EXISTS tracks_au;
+DROP TABLE IF EXISTS tracks_fts;
+"""
+
+BACKFILL_SQL = """
+INSERT INTO tracks_search(rowid, name, artist_names, album)
+SELECT rowid, qb_normalize(name), qb_normalize(artist_names), qb_normalize(album) FROM tracks
+"""
+
+UPSERT_SQL = """
+INSERT INTO tracks (id, name, uri, artists, artist_names, album, album_art, duration_ms, popularity, preview_url, isrc, canonical_key, content_hash, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(id) DO UPDATE SET
+    name = excluded.name,
+    uri = excluded.uri,
+    artists = excluded.artists,
+    artist_names = excluded.artist_names,
+    album = excluded.album,
+    album_art = excluded.album_art,
+    duration_ms = excluded.duration_ms,
+    popularity = excluded.popularity,
+    preview_url = excluded.preview_url,
+    isrc = excluded.isrc,
+    canonical_key = excluded.canonical_key,
+    content_hash = excluded.content_hash,
+    updated_at = excluded.updated_at
+WHERE tracks.content_hash IS NOT excluded.content_hash
+"""
+
+ALIAS_SQL = """
+INSERT INTO track_aliases (id, canonical_id) VALUES (?, ?)
+ON CONFLICT(id) DO UPDATE SET canonical_id = excluded.canonical_id
+WHERE track_aliases.canonical_id IS NOT excluded.canonical_id
+"""
+
+
+def connect_catalog(path: str) -> sqlite3.Connection:
+    connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    connection.row_factory = sqlite3.Row
+    connection.create_function("qb_normalize", 1, normalize_text, deterministic=True)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+def create_catalog_schema(connection: sqlite3.Connection) -> bool:
+    """Create or upgrade the catalog tables; returns whether FTS5 is available"""
+    connection.executescript(SCHEMA)
+    columns = {row[1] for row in connection.execute("PRAGMA table_info(tracks)")}
+    for column, column_type in ADDED_COLUMNS:
+        if column not in columns:
+            connection.execute(f"ALTER TABLE tracks ADD COLUMN {column} {column_type}")
+    connection.executescript(INDEX_SCHEMA)
+    try:
+        connection.executescript(LEGACY_FTS_SCHEMA)
+        connection.executescript(FTS_SCHEMA)
+        with connection:
+            if connection.execute("SELECT 1 FROM tracks_search LIMIT 1").fetchone() is None:
+                connection.execute(BACKFILL_SQL)
+        return True
+    except sqlite3.OperationalError as e:
+        # SQLite builds without FTS5 fall back to LIKE matching
+        print(f"Track catalog: FTS5 unavailable ({str(e)}), using LIKE search")
+        return False
+
+
+def upsert_tracks(connection: sqlite3.Connection, tracks: Iterable[Dict[str, Any]]) -> int:
+    """
+    Insert or update tracks inside the caller's transaction. Tracks whose
+    content is unchanged are skipped, and another release of a recording
+    that is already stored (same ISRC, or same title and artist) is recorded
+    as an alias of the stored row instead of a row of its own. Returns how
+    many rows changed.
+    """
+    now = time.time()
+    tracks = list(tracks)
+    keys = [
+        canonical_key(track.get("isrc"), track.get("name"), list(track.get("artists") or []))
+        for track in tracks
+    ]
+    # Canonical key -> id of the row that holds it, including rows added by this batch
+    canonical_ids = _stored_canonical_ids(connection, [key for key in keys if key is not None])
+    own_keys = _stored_keys(connection, [track["id"] for track in tracks])
+
+    rows = []
+    aliases = []
+    for track, key in zip(tracks, keys):
+        if key is not None:
+            canonical_id = canonical_ids.get(key)
+            # A track that already has its own row for this key keeps it
+            if canonical_id is not None and canonical_id != track["id"] and own_keys.get(track["id"]) != key:
+                aliases.append((track["id"], canonical_id))
+                continue
+            canonical_ids.setdefault(key, track["id"])
+
+        artists = list(track.get("artists") or [])
+        values = (
+            track["id"],
+            track.get("name") or "",
+            track.get("uri"),
+            json.dumps(artists),
+            ", ".join(artists),
+            track.get("album"),
+            track.get("album_art"),
+            track.get("duration_ms"),
+            track.get("popularity"),
+            track.get("preview_url"),
+            track.get("isrc"),
+            key
+        )
+        content_hash = hashlib.blake2b(json.dumps(values).encode("utf-8"), digest_size=16).hexdigest()
+        rows.append(values + (content_hash, now))
+
+    # rowcount leaves out the FTS rows written by triggers
+    changed = connection.executemany(UPSERT_SQL, rows).rowcount
+    if aliases:
+        changed += connection.executemany(ALIAS_SQL, aliases).rowcount
+    return changed
+
+
+def _stored_canonical_ids(connection: sqlite3.Connection, keys: List[str]) -> Dict[str, str]:
+    found: Dict[str, str] = {}
+    for chunk in _chunks(list(set(keys))):
+        for key, track_id in connection.execute(
+            f"SELECT canonical_key, MIN(id) FROM tracks WHERE canonical_key IN ({', '.join('?' for _ in chunk)}) GROUP BY canonical_key",
+            chunk
+        ):
+            found[key] = track_id
+    return found
+
+
+def _stored_keys(connection: sqlite3.Connection, track_ids: List[str]) -> Dict[str, Optional[str]]:
+    found: Dict[str, Optional[str]] = {}
+    for chunk in _chunks(list(set(track_ids))):
+        for track_id, key in connection.execute(
+            f"SELECT id, canonical_key FROM tracks WHERE id IN ({', '.join('?' for _ in chunk)})", chunk
+        ):
+            found[track_id] = key
+    return found
+
+
+def _chunks(values: List[str], size: int = 500) -> Iterable[List[str]]:
+    # Stay under SQLite's limit on bound parameters
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class TrackCatalog:
+    """
+    SQLite-backed catalog of track metadata.
+
+    upsert() only queues tracks; a writer thread applies them in batches of
+    up to batch_size, or whatever has arrived after flush_interval seconds.
+    When the queue is full new tracks are dropped (and counted) rather than
+    blocking the caller. Reads use one connection per thread.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        max_pending: int = 50000
+    ):
+        self.path = str(path or DEFAULT_CATALOG_PATH)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._local = threading.local()
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max_pending)
+        self._closed = False
+
+        self.fts_enabled = self._create_schema()
+
+        self.queued = 0
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.write_errors = 0
+        # Queued tracks the writer has finished with, written or not
+        self._handled = 0
+
+        self._writer = threading.Thread(target=self._write_loop, name="track-catalog-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        return connect_catalog(self.path)
+
+    def _reader(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+        return connection
+
+    def _create_schema(self) -> bool:
+        connection = self._connect()
+        try:
+            return create_catalog_schema(connection)
+        finally:
+            connection.close()
+
+    # Writes
+
+    def upsert(self, tracks: Iterable[Dict[str, Any]]) -> None:
+        """Queue tracks for writing; never blocks"""
+        if self._closed:
+            return
+        for track in tracks:
+            try:
+                self._queue.put_nowait(track)
+                self.queued += 1
+            except queue.Full:
+                self.dropped += 1
+
+    def _write_loop(self) -> None:
+        connection = self._connect()
+        stopping = False
+        while not stopping:
+            batch: Dict[str, Dict[str, Any]] = {}
+            received = 0
+            deadline = None
+            while received < self.batch_size:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    track = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if track is None:
+                    stopping = True
+                    break
+                # Later copies of a track in the same batch replace earlier ones
+                batch[track["id"]] = track
+                received += 1
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            if batch:
+                self._write_batch(connection, list(batch.values()))
+            self._handled += received
+        connection.close()
+
+    def _write_batch(self, connection: sqlite3.Connection, tracks: List[Dict[str, Any]]) -> None:
+        try:
+            with connection:
+                upsert_tracks(connection, tracks)
+            self.written += len(tracks)
+            self.batches += 1
+        except sqlite3.Error as e:
+            self.write_errors += 1
+            print(f"Track catalog: failed to write batch of {len(tracks)} tracks: {str(e)}")
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until every track queued so far has been handled; for scripts and shutdown"""
+        target = self.queued
+        deadline = time.monotonic() + timeout
+        while self._handled < target:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join(timeout=10)
+
+    # Reads
+
+    def get(self, track_id: str) -> Optional[Dict[str, Any]]:
+        """The stored track for an id, following aliases to the canonical release"""
+        return self.get_many([track_id]).get(track_id)
+
+    def get_many(self, track_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Tracks by requested id; an alias maps to its canonical track"""
+        if not track_ids:
+            return {}
+        reader = self._reader()
+        placeholders = ", ".join("?" for _ in track_ids)
+        canonical = {track_id: track_id for track_id in track_ids}
+        for row in reader.execute(
+            f"SELECT id, canonical_id FROM track_aliases WHERE id IN ({placeholders})", list(track_ids)
+        ):
+            canonical[row["id"]] = row["canonical_id"]
+
+        lookup = list(set(canonical.values()))
+        rows = reader.execute(
+            f"SELECT {', '.join(TRACK_COLUMNS)} FROM tracks WHERE id IN ({', '.join('?' for _ in lookup)})", lookup
+        ).fetchall()
+        found = {row["id"]: _row_to_track(row) for row in rows}
+        return {
+            track_id: found[canonical_id]
+            for track_id, canonical_id in canonical.items()
+            if canonical_id in found
+        }
+
+    def search(self, query: str, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+        """Tracks matching every query token as a prefix, best first"""
+        tokens = query_tokens(query)
+        if not tokens:
+            return []
+        columns = ", ".join(f"tracks.{column}" for column in TRACK_COLUMNS)
+
+        if self.fts_enabled:
+            match = " ".join(f'"{token}"*' for token in tokens)
+            rows = self._reader().execute(
+                f"""
+                SELECT {columns} FROM tracks_search
+                JOIN tracks ON tracks.rowid = tracks_search.rowid
+                WHERE tracks_search MATCH ?
+                ORDER BY bm25(tracks_search, 3.0, 2.0, 1.0), tracks.popularity DESC
+                LIMIT ? OFFSET ?
+                """,
+                (match, limit, offset)
+            ).fetchall()
+        else:
+            conditions = " AND ".join(
+                "(qb_normalize(name) LIKE ? OR qb_normalize(artist_names) LIKE ? OR qb_normalize(album) LIKE ?)"
+                for _ in tokens
+            )
+            params: List[Any] = []
+            for token in tokens:
+                params.extend([f"%{token}%"] * 3)
+            rows = self._reader().execute(
+                f"SELECT {columns} FROM tracks WHERE {conditions} ORDER BY popularity DESC LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+
+        return [_row_to_track(row) for row in rows]
+
+    def count(self) -> int:
+        return self._reader().execute("SELECT COUNT(*) FROM tracks").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "fts": self.fts_enabled,
+            "tracks": self.count(),
+            "aliases": self._reader().execute("SELECT COUNT(*) FROM track_aliases").fetchone()[0],
+            "pending": self._queue.qsize(),
+            "queued": self.queued,
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "write_errors": self.write_errors
+        }
+
+
+def _row_to_track(row: sqlite3.Row) -> Dict[str, Any]:
+    track = {column: row[column] for column in TRACK_COLUMNS}
+    track["artists"] = json.loads(track["artists"]) if track["artists"] else []
+    return track
+
+
+_catalog: Optional[TrackCatalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_track_catalog() -> TrackCatalog:
+    """Return the process-wide track catalog, opening it on first use"""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = TrackCatalog(
+                    path=os.environ.get("TRACK_CATALOG_PATH"),
+                    batch_size=int(os.environ.get("TRACK_CATALOG_BATCH_SIZE", "500")),
+                    flush_interval=float(os.environ.get("TRACK_CATALOG_FLUSH_INTERVAL", "1.0"))
+                )
+    return _catalog
+
+
+def close_track_catalog() -> None:
+    """Write out queued tracks and stop the writer thread"""
+    global _catalog
+    if _catalog is not None:
+        _catalog.close()
+        _catalog = None
@@ -0,0 +1,243 @@
+"""
+Batched track metadata lookups for QueueBeats backend
+Resolves Spotify track ids to metadata through a by-id cache, the local track
+catalog and finally Spotify's multi-track endpoint (/v1/tracks?ids=, up to 50
+ids per call). Lookups arriving within a few milliseconds of each other are
+collected into one batch, so a burst of adds costs a handful of upstream
+calls instead of one per track.
+"""
+
+import asyncio
+import os
+import re
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from app.utils.search_cache import TTLCache
+from app.utils.spotify_client import SpotifyTimeoutError, get_spotify_client
+from app.utils.spotify_credentials import SpotifyCredential, get_credential_pool
+from app.utils.track_catalog import get_track_catalog
+
+# Spotify's /v1/tracks accepts at most 50 ids per call
+SPOTIFY_TRACKS_BATCH = 50
+
+# Spotify ids are 22 base62 characters; one malformed id fails the whole batch
+TRACK_ID_PATTERN = re.compile(r"^[0-9A-Za-z]{22}$")
+
+FetchBatch = Callable[[List[str]], Awaitable[Dict[str, Dict[str, Any]]]]
+
+
+def is_spotify_track_id(track_id: str) -> bool:
+    return bool(TRACK_ID_PATTERN.match(track_id))
+
+
+def track_from_spotify(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten a Spotify track object to the fields the catalog keeps"""
+    images = item.get("album", {}).get("images") or []
+    return {
+        "id": item["id"],
+        "name": item["name"],
+        "uri": item.get("uri"),
+        "artists": [artist["name"] for artist in item.get("artists", [])],
+        "album": item.get("album", {}).get("name"),
+        "album_art": images[0]["url"] if images else None,
+        "duration_ms": item.get("duration_ms"),
+        "popularity": item.get("popularity"),
+        "preview_url": item.get("preview_url"),
+        "isrc": (item.get("external_ids") or {}).get("isrc")
+    }
+
+
+class TrackResolver:
+    """
+    Coalesces concurrent track lookups into batched upstream calls.
+
+    A cache miss joins the pending batch and waits on a future. The batch is
+    sent `batch_window` seconds after its first id arrives, or as soon as it
+    holds `max_batch` ids. An id already pending is never requested twice.
+    Unknown ids are cached as negative entries for a short time.
+    """
+
+    def __init__(
+        self,
+        fetch_batch: FetchBatch,
+        batch_window: float = 0.005,
+        max_batch: int = SPOTIFY_TRACKS_BATCH,
+        cache: Optional[TTLCache] = None
+    ):
+        self.fetch_batch = fetch_batch
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.cache = cache or TTLCache(max_entries=20000, ttl=3600, stale_ttl=0, negative_ttl=300)
+
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._batch: List[str] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Strong references to running batch tasks
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.lookups = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.batched_ids = 0
+        self.errors = 0
+
+    async def resolve(self, track_id: str) -> Optional[Dict[str, Any]]:
+        """Metadata for one track, or None if Spotify doesn't know it"""
+        return (await self.resolve_many([track_id]))[track_id]
+
+    async def resolve_many(self, track_ids: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        results: Dict[str, Optional[Dict[str, Any]]] = {}
+        waiting: Dict[str, asyncio.Future] = {}
+
+        for track_id in dict.fromkeys(track_ids):
+            self.lookups += 1
+            track, state = self.cache.get(track_id)
+            if state is not None:
+                results[track_id] = track
+            elif not is_spotify_track_id(track_id):
+                results[track_id] = None
+            elif track_id in self._pending:
+                self.coalesced += 1
+                waiting[track_id] = self._pending[track_id]
+            else:
+                waiting[track_id] = self._enqueue(track_id)
+
+        if waiting:
+            # shield: one caller giving up must not cancel a lookup others share
+            tracks = await asyncio.gather(*(asyncio.shield(future) for future in waiting.values()))
+            results.update(zip(waiting.keys(), tracks))
+        return results
+
+    def _enqueue(self, track_id: str) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending[track_id] = future
+        self._batch.append(track_id)
+
+        if len(self._batch) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.batch_window, self._flush)
+        return future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._batch = self._batch, []
+        if not batch:
+            return
+
+        task = asyncio.ensure_future(self._run_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: List[str]) -> None:
+        self.batches += 1
+        self.batched_ids += len(batch)
+        try:
+            found = await self.fetch_batch(batch)
+        except Exception as e:
+            self.errors += 1
+            print(f"Track lookup failed for a batch of {len(batch)} ids: {str(e)}")
+            for track_id in batch:
+                future = self._pending.pop(track_id)
+                if not future.done():
+                    future.set_exception(e)
+                # Nobody may be awaiting it any more; don't warn about that
+                future.exception()
+            return
+
+        for track_id in batch:
+            track = found.get(track_id)
+            if track is not None:
+                self.cache.set(track_id, track)
+            else:
+                self.cache.set_negative(track_id)
+            future = self._pending.pop(track_id)
+            if not future.done():
+                future.set_result(track)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "lookups": self.lookups,
+            "coalesced": self.coalesced,
+            "batches": self.batches,
+            "batched_ids": self.batched_ids,
+            "average_batch": round(self.batched_ids / self.batches, 1) if self.batches else 0.0,
+            "errors": self.errors,
+            "pending": len(self._pending),
+            "cache": self.cache.stats()
+        }
+
+
+async def fetch_tracks_by_id(track_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Look up to 50 tracks: from the local track catalog where possible, the
+    rest with one /v1/tracks call. Tracks fetched from Spotify are added to
+    the catalog.
+    """
+    try:
+        found = await run_in_threadpool(get_track_catalog().get_many, track_ids)
+    except Exception as e:
+        print(f"Track catalog lookup failed: {str(e)}")
+        found = {}
+
+    missing = [track_id for track_id in track_ids if track_id not in found]
+    if missing:
+        fetched = await get_credential_pool().run(lambda credential: _fetch_with_credential(credential, missing))
+        get_track_catalog().upsert(fetched.values())
+        found.update(fetched)
+    return found
+
+
+async def _fetch_with_credential(credential: SpotifyCredential, track_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    client = get_spotify_client()
+    params = {"ids": ",".join(track_ids)}
+    try:
+        response = await client.get(
+            "/tracks", await credential.tokens.get_token(), params=params,
+            governor=credential.governor, hedge=True
+        )
+        if response.status_code == 401:
+            credential.tokens.invalidate()
+            response = await client.get(
+                "/tracks", await credential.tokens.get_token(), params=params,
+                governor=credential.governor
+            )
+    except SpotifyTimeoutError as e:
+        raise HTTPException(status_code=504, detail=f"Spotify track lookup timed out: {str(e)}")
+
+    if response.status_code != 200:
+        print(f"Spotify track lookup failed: status_code={response.status_code}, body={response.text}")
+        raise HTTPException(status_code=502, detail=f"Spotify track lookup failed with status {response.status_code}")
+
+    # Unknown ids come back as null entries
+    return {
+        item["id"]: track_from_spotify(item)
+        for item in response.json().get("tracks", [])
+        if item
+    }
+
+
+_resolver: Optional[TrackResolver] = None
+
+
+def get_track_resolver() -> TrackResolver:
+    """Return the process-wide track resolver"""
+    global _resolver
+    if _resolver is None:
+        _resolver = TrackResolver(
+            fetch_tracks_by_id,
+            batch_window=float(os.environ.get("TRACK_RESOLVER_BATCH_WINDOW_MS", "5")) / 1000,
+            cache=TTLCache(
+                max_entries=int(os.environ.get("TRACK_METADATA_CACHE_SIZE", "20000")),
+                ttl=float(os.environ.get("TRACK_METADATA_CACHE_TTL", "3600")),
+                stale_ttl=0,
+                negative_ttl=float(os.environ.get("TRACK_METADATA_CACHE_NEGATIVE_TTL", "300"))
+            )
+        )
+    return _resolver
@@ -0,0 +1,82 @@
+"""
+Typeahead session tracking for QueueBeats search endpoints
+A search box fires a request per keystroke, but only the newest query of a
+client session matters. Each session remembers its latest sequence number and
+in-flight search; a newer query cancels the older search, and a query that
+arrives after a newer one has started is rejected before doing any work. A
+seq far below the session's latest means the client restarted its counter
+(e.g. a page reload) and starts the session over.
+"""
+
+import asyncio
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class _Session:
+    __slots__ = ("seq", "task")
+
+    def __init__(self, seq: int, task: Optional[asyncio.Task]):
+        self.seq = seq
+        self.task = task
+
+
+class TypeaheadSessions:
+    """Latest search per client session, bounded by LRU eviction"""
+
+    def __init__(self, max_sessions: int = 10000, reset_gap: int = 32):
+        self.max_sessions = max_sessions
+        # Out-of-order queries are a few keystrokes apart; a bigger step back is a reset
+        self.reset_gap = reset_gap
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+
+        self.started = 0
+        self.superseded = 0
+        self.cancelled = 0
+        self.resets = 0
+
+    def next_seq(self, session_id: str) -> int:
+        """The session's next seq in arrival order, for clients that don't send one"""
+        session = self._sessions.get(session_id)
+        return session.seq + 1 if session is not None else 1
+
+    def is_superseded(self, session_id: str, seq: int) -> bool:
+        """True if a newer query from this session has already started"""
+        session = self._sessions.get(session_id)
+        if session is None or seq >= session.seq:
+            return False
+        if session.seq - seq > self.reset_gap:
+            # begin() replaces the session's seq with this one
+            self.resets += 1
+            return False
+        self.superseded += 1
+        return True
+
+    def begin(self, session_id: str, seq: int, task: asyncio.Task) -> None:
+        """Record task as the session's latest search, cancelling the previous one"""
+        session = self._sessions.get(session_id)
+        if session is not None and session.task is not None and not session.task.done():
+            session.task.cancel()
+            self.cancelled += 1
+
+        self._sessions[session_id] = _Session(seq, task)
+        self._sessions.move_to_end(session_id)
+        self.started += 1
+
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def finish(self, session_id: str, task: asyncio.Task) -> None:
+        """Forget a finished search but keep its seq for ordering checks"""
+        session = self._sessions.get(session_id)
+        if session is not None and session.task is task:
+            session.task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._sessions),
+            "started": self.started,
+            "superseded": self.superseded,
+            "cancelled": self.cancelled,
+            "resets": self.resets
+        }
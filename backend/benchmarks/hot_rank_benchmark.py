@@ -0,0 +1,75 @@
+"""
+Benchmark for hot-score queue ranking
+Builds synthetic queues (1k, 10k and 100k songs by default, with a few
+votes per song spread over the last hours) and compares a full re-rank with
+the pure-Python loop against HotRanker's vectorized NumPy pass.
+
+Run from the backend directory:
+    python -m benchmarks.hot_rank_benchmark --songs 1000 10000 100000
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.utils.hot_ranking import HotRanker, python_hot_order  # noqa: E402
+
+
+def make_queue(songs: int, votes_per_song: float, seed: int = 7) -> Tuple[List[str], List[Tuple[str, str, int, float]]]:
+    """Song ids and (song_id, user_id, vote_count, voted_at) votes"""
+    rng = random.Random(seed)
+    now = time.time()
+    song_ids = [f"song-{i}" for i in range(songs)]
+    votes = []
+    for _ in range(int(songs * votes_per_song)):
+        # Popularity is skewed: a few songs collect most votes
+        song_id = song_ids[min(songs - 1, int(rng.paretovariate(1.1)) - 1 + rng.randrange(songs) // 50)]
+        votes.append((song_id, f"user-{rng.randrange(songs)}", rng.randint(1, 3), now - rng.expovariate(1 / 3600)))
+    return song_ids, votes
+
+
+def time_call(call, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--songs", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--votes-per-song", type=float, default=5.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'songs':>8}{'votes':>10}{'python ms':>12}{'numpy ms':>12}{'speedup':>10}  same order")
+    for songs in args.songs:
+        song_ids, votes = make_queue(songs, args.votes_per_song)
+        ranker = HotRanker()
+        for song_id in song_ids:
+            ranker.add(song_id, 200000)
+        for song_id, user_id, count, voted_at in votes:
+            ranker.vote(song_id, user_id, count, voted_at)
+
+        # The ranker keeps one vote per (song, user), latest wins; give the loop the same input
+        latest = {(song_id, user_id): (count, voted_at) for song_id, user_id, count, voted_at in votes}
+        python_votes = [(song_id, count, voted_at) for (song_id, _), (count, voted_at) in latest.items()]
+
+        now = time.time()
+        python_ms = time_call(lambda: python_hot_order(python_votes, song_ids, now), args.repeat)
+        numpy_ms = time_call(lambda: ranker.rank(now), args.repeat)
+
+        same = python_hot_order(python_votes, song_ids, now) == ranker.song_ids()
+        print(f"{songs:>8,}{len(python_votes):>10,}{python_ms:>12.2f}{numpy_ms:>12.2f}{python_ms / numpy_ms:>9.1f}x  {same}")
+
+
+if __name__ == "__main__":
+    main()
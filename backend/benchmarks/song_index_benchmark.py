@@ -0,0 +1,117 @@
+"""
+Benchmark for the local song search index
+Builds a synthetic catalog (1M tracks by default) and compares query latency
+of the inverted prefix index against the previous linear substring scan, and
+of exact mode against fuzzy (typo-tolerant) mode.
+
+Run from the backend directory:
+    python -m benchmarks.song_index_benchmark --tracks 1000000
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.utils.song_index import SongIndex  # noqa: E402
+
+SYLLABLES = [
+    "la", "mo", "ri", "sa", "ve", "no", "ka", "di", "lu", "te", "zo", "me",
+    "ba", "shi", "ro", "ne", "ta", "vi", "qu", "el", "an", "or", "is", "um"
+]
+
+QUERIES = ["l", "lo", "love", "night", "the we", "shape of", "dance monkey", "ro ka", "zzzz"]
+TYPO_QUERIES = ["lvoe", "nigth", "teh weeknd", "shaep of", "dacne monkye", "weekend lihgts"]
+
+
+def make_word(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 4)))
+
+
+def make_catalog(count: int, seed: int = 7) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    # Real words mixed in so the sample queries have realistic hit rates
+    words = [make_word(rng) for _ in range(50000)] + [
+        "love", "night", "the", "weeknd", "shape", "of", "you", "dance", "monkey", "lights"
+    ] * 200
+    artists = [" ".join(rng.choice(words) for _ in range(rng.randint(1, 3))) for _ in range(count // 20 + 1)]
+    albums = [" ".join(rng.choice(words) for _ in range(rng.randint(1, 4))) for _ in range(count // 10 + 1)]
+
+    return [
+        {
+            "id": str(i),
+            "title": " ".join(rng.choice(words) for _ in range(rng.randint(1, 5))).title(),
+            "artist": rng.choice(artists).title(),
+            "album": rng.choice(albums).title(),
+            "popularity": int(rng.paretovariate(1.2)) % 100
+        }
+        for i in range(count)
+    ]
+
+
+def linear_scan(catalog: List[Dict[str, Any]], query: str, limit: int) -> List[Dict[str, Any]]:
+    """The search that songs.search_songs used before the index"""
+    query = query.lower()
+    results = []
+    for song in catalog:
+        if query in song["title"].lower() or query in song["artist"].lower():
+            results.append(song)
+    return results[:limit]
+
+
+def time_queries(search, queries: List[str], repeat: int) -> Dict[str, float]:
+    timings = {}
+    for query in queries:
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            search(query)
+            samples.append((time.perf_counter() - started) * 1000)
+        timings[query] = statistics.median(samples)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tracks", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--skip-linear", action="store_true", help="Skip the (slow) linear scan baseline")
+    args = parser.parse_args()
+
+    print(f"Generating {args.tracks:,} tracks...")
+    catalog = make_catalog(args.tracks)
+
+    started = time.perf_counter()
+    index = SongIndex(catalog)
+    print(f"Index built in {time.perf_counter() - started:.1f}s: {index.stats()}")
+
+    started = time.perf_counter()
+    index.fuzzy
+    print(f"Trigram index built in {time.perf_counter() - started:.1f}s: {index.fuzzy.stats()}")
+
+    indexed = time_queries(lambda q: index.search(q, args.limit), QUERIES, args.repeat)
+    fuzzy = time_queries(lambda q: index.fuzzy_search(q, args.limit), QUERIES + TYPO_QUERIES, args.repeat)
+    linear = {} if args.skip_linear else time_queries(
+        lambda q: linear_scan(catalog, q, args.limit), QUERIES, max(1, args.repeat // 5)
+    )
+
+    print(f"\n{'query':<16}{'hits':>6}{'index ms':>12}{'fuzzy ms':>12}{'linear ms':>12}")
+    for query in QUERIES:
+        hits = len(index.search(query, args.limit))
+        linear_ms = f"{linear[query]:.2f}" if query in linear else "-"
+        print(f"{query:<16}{hits:>6}{indexed[query]:>12.3f}{fuzzy[query]:>12.3f}{linear_ms:>12}")
+
+    print(f"\n{'typo query':<16}{'hits':>6}{'fuzzy ms':>12}  did you mean")
+    for query in TYPO_QUERIES:
+        results, suggestion = index.fuzzy_search(query, args.limit)
+        print(f"{query:<16}{len(results):>6}{fuzzy[query]:>12.3f}  {suggestion or '-'}")
+
+
+if __name__ == "__main__":
+    main()
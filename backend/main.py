@@ -62,6 +62,8 @@ def get_router_config() -> dict:
                 "spotify_auth": {"disableAuth": True},
                 "spotify_search": {"disableAuth": True},
                 "songs": {"disableAuth": True},
+                "search": {"disableAuth": True},
+                "queue": {"disableAuth": True},
                 "debug": {"disableAuth": True},
                 "setup": {"disableAuth": True}
             }
@@ -205,6 +207,27 @@ def create_app() -> FastAPI:
     
     app.include_router(import_api_routers())
 
+    # Open the track catalog (schema setup, search index backfill) in a worker
+    # thread before serving, so the first search doesn't do it on the event loop
+    @app.on_event("startup")
+    async def open_track_catalog():
+        from fastapi.concurrency import run_in_threadpool
+        from app.utils.track_catalog import get_track_catalog
+        try:
+            await run_in_threadpool(get_track_catalog)
+        except Exception as e:
+            print(f"Track catalog could not be opened at startup: {str(e)}")
+
+    # Close pooled Spotify connections and flush the track catalog on shutdown
+    @app.on_event("shutdown")
+    async def close_shared_clients():
+        from app.utils.spotify_client import close_spotify_client
+        await close_spotify_client()
+        from app.utils.track_catalog import close_track_catalog
+        close_track_catalog()
+        from app.utils.queue_engine import close_queue_engine
+        close_queue_engine()
+
     # Middleware to add default headers to all responses
     @app.middleware("http")
     async def add_default_headers(request: Request, call_next):
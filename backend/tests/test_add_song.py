@@ -0,0 +1,78 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import app.utils.queue_engine as queue_engine
+from app.apis.songs import router
+from app.utils.queue_engine import QueueEngine
+
+QUEUE_ID = "00000000-0000-0000-0000-00000000000a"
+USER_ID = "00000000-0000-0000-0000-00000000000b"
+
+
+class ProfileStore:
+    """Empty queues; USER_ID is the only profile. Inserted rows are kept"""
+
+    def __init__(self):
+        self.inserted = []
+
+    def profile_exists(self, profile_id):
+        return profile_id == USER_ID
+
+    def load_queue(self, queue_id):
+        return []
+
+    def load_settings(self, queue_id):
+        return {}
+
+    def insert_song(self, song):
+        self.inserted.append(song)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    store = ProfileStore()
+    engine = QueueEngine(store=store)
+    monkeypatch.setattr(queue_engine, "_engine", engine)
+    app = FastAPI()
+    app.include_router(router)
+    yield TestClient(app), store
+    engine.persister.close()
+
+
+def add(client, user_id, song_id="1"):
+    return client.post("/songs/add", json={"queue_id": QUEUE_ID, "song_id": song_id, "user_id": user_id})
+
+
+def test_add_writes_the_adding_profile(client):
+    client, store = client
+    response = add(client, USER_ID)
+    assert response.status_code == 200
+    assert response.json()["added_by"] == USER_ID
+    queue_engine._engine.persister.flush()
+    assert [song["added_by"] for song in store.inserted] == [USER_ID]
+
+
+def test_add_rejects_unknown_profiles_before_queueing(client):
+    client, store = client
+    assert add(client, "not-a-uuid").status_code == 400
+    assert add(client, "00000000-0000-0000-0000-0000000000ff").status_code == 404
+    assert len(queue_engine._engine.queue(QUEUE_ID)) == 0
+
+
+def test_add_keeps_the_resolved_spotify_uri(client, monkeypatch):
+    import app.apis.songs as songs
+
+    client, store = client
+    track_id = "4uLU6hMCjMI75M1A2tKUQC"
+    resolve_song = songs.resolve_song
+    monkeypatch.setattr(songs, "resolve_song", lambda song_id: {
+        "id": song_id, "title": "Never Gonna Give You Up", "artist": "Rick Astley", "duration_ms": 213573
+    } if song_id == track_id else resolve_song(song_id))
+    response = add(client, USER_ID, track_id)
+    assert response.json()["track_uri"] == f"spotify:track:{track_id}"
+    queue_engine._engine.persister.flush()
+    assert store.inserted[-1]["track_uri"] == f"spotify:track:{track_id}"
+
+    # Mock songs aren't Spotify tracks
+    assert add(client, USER_ID, "2").json()["track_uri"] is None
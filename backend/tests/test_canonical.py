@@ -0,0 +1,56 @@
+import pytest
+
+from app.utils.canonical import base_title, canonical_key, group_duplicates
+
+
+@pytest.mark.parametrize("title, expected", [
+    ("Help! - Remastered 2009", "Help!"),
+    ("Song (2011 Remaster)", "Song"),
+    ("Song - Remastered", "Song"),
+    ("Song [Deluxe Edition]", "Song"),
+    ("Song - Single Version", "Song"),
+    ("Song (Explicit)", "Song"),
+    ("Song - Clean", "Song"),
+    ("Song - 2015 Digital Remaster", "Song"),
+    ("Song (Remastered 2011) - Deluxe Edition", "Song"),
+])
+def test_base_title_strips_edition_markers(title, expected):
+    assert base_title(title) == expected
+
+
+@pytest.mark.parametrize("title", [
+    "Song - Clean Bandit Remix",
+    "Song - Explicit Remix",
+    "Song - Remastered 2011 Radio Edit Remix",
+    "Song - Live at Wembley",
+    "Song (Acoustic)",
+    "Clean",
+])
+def test_base_title_keeps_different_recordings(title):
+    assert base_title(title) == title
+
+
+def test_canonical_key_prefers_isrc():
+    assert canonical_key(" usrc17607839 ", "Song", ["Artist"]) == "isrc:USRC17607839"
+
+
+def test_canonical_key_groups_editions_by_title_and_artist():
+    single = canonical_key(None, "Song", ["Artist"])
+    assert single is not None
+    assert canonical_key(None, "Song - Remastered 2011", ["Artist", "Guest"]) == single
+    assert canonical_key(None, "Song - Clean Bandit Remix", ["Artist"]) != single
+    assert canonical_key(None, "Song", ["Someone Else"]) != single
+    assert canonical_key(None, "Song", []) is None
+
+
+def test_group_duplicates_keeps_first_of_each_recording():
+    tracks = [
+        ("a", "Song", "Artist"),
+        ("b", "Other", "Artist"),
+        ("c", "Song - Remastered", "Artist"),
+        ("d", "Song - Explicit Remix", "Artist"),
+        ("e", "", ""),
+        ("f", "", ""),
+    ]
+    groups = group_duplicates(tracks, lambda track: canonical_key(None, track[1], [track[2]] if track[2] else []))
+    assert [[track[0] for track in group] for group in groups] == [["a", "c"], ["b"], ["d"], ["e"], ["f"]]
@@ -0,0 +1,28 @@
+import json
+
+from app.utils.catalog_ingest import ingest_dump
+
+
+def write_rows(path, start, count, mode="w"):
+    with open(path, mode) as f:
+        for i in range(start, start + count):
+            f.write(json.dumps({"id": f"track{i}", "name": f"Song {i}", "artists": ["Artist"]}) + "\n")
+
+
+def test_small_dump_appended_to_resumes_after_the_last_row(tmp_path):
+    dump, catalog = tmp_path / "dump.ndjson", str(tmp_path / "catalog.db")
+    write_rows(dump, 0, 20)
+    assert ingest_dump(str(dump), catalog)["read"] == 20
+
+    write_rows(dump, 20, 5, mode="a")
+    assert ingest_dump(str(dump), catalog)["read"] == 5
+    assert ingest_dump(str(dump), catalog)["skipped"]
+
+
+def test_small_dump_rewritten_is_read_again(tmp_path):
+    dump, catalog = tmp_path / "dump.ndjson", str(tmp_path / "catalog.db")
+    write_rows(dump, 0, 20)
+    ingest_dump(str(dump), catalog)
+
+    write_rows(dump, 100, 25)
+    assert ingest_dump(str(dump), catalog)["read"] == 25
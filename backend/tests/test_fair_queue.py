@@ -0,0 +1,53 @@
+from app.utils.queue_engine import LiveQueue, QueueEntry
+
+
+def fair_queue(songs):
+    live = LiveQueue("queue")
+    live.set_ranking("fair")
+    for song_id, added_by in songs:
+        live.add(QueueEntry(song_id, "queue", f"Title {song_id}", "Artist", added_by=added_by))
+    return live
+
+
+def test_users_take_turns():
+    live = fair_queue([("a1", "alice"), ("a2", "alice"), ("a3", "alice"), ("b1", "bob"), ("c1", "carol"), ("b2", "bob")])
+    assert [entry.song_id for entry in live.top()] == ["a1", "b1", "c1", "a2", "b2", "a3"]
+
+
+def test_popping_follows_the_listed_order():
+    live = fair_queue([(f"a{i}", "alice") for i in range(5)] + [("b0", "bob"), ("b1", "bob")])
+    listed = [entry.song_id for entry in live.top()]
+    popped = [live.pop_next().song_id for _ in listed]
+    assert popped == listed
+    assert live.pop_next() is None
+
+
+def test_votes_move_a_song_up_its_users_turns():
+    live = fair_queue([("a1", "alice"), ("a2", "alice"), ("b1", "bob"), ("b2", "bob")])
+    live.vote("b2", "guest", 3)
+    order = [entry.song_id for entry in live.top()]
+    # b2 leads bob's songs and, costing less, gets bob served first
+    assert order.index("b2") < order.index("b1")
+    assert order[0] == "b2"
+    assert live.position("b2") == (0, 0)
+
+
+def test_a_user_who_was_idle_does_not_bank_turns():
+    live = fair_queue([(f"a{i}", "alice") for i in range(4)])
+    live.pop_next()
+    live.pop_next()
+    live.add(QueueEntry("b1", "queue", "Title b1", "Artist", added_by="bob"))
+    live.add(QueueEntry("b2", "queue", "Title b2", "Artist", added_by="bob"))
+    assert [entry.song_id for entry in live.top()] == ["a2", "b1", "a3", "b2"]
+
+
+def test_users_without_songs_are_dropped():
+    live = fair_queue([("a1", "alice"), ("b1", "bob"), ("b2", "bob")])
+    live.pop_next()
+    assert live.fair.stats()["users"] == 1
+    live.remove("b1")
+    live.remove("b2")
+    assert live.fair.stats()["users"] == 0
+    assert live.peek() is None
+    live.add(QueueEntry("a2", "queue", "Title a2", "Artist", added_by="alice"))
+    assert [entry.song_id for entry in live.top()] == ["a2"]
@@ -0,0 +1,44 @@
+import asyncio
+
+from app.utils.spotify_client import SpotifyClient
+
+
+class SlowTracker:
+    def hedge_delay(self):
+        return 0.001
+
+
+class Governor:
+    def __init__(self, free):
+        self.free = free
+
+    def try_acquire(self):
+        return self.free
+
+
+def hedge(free_tokens):
+    client = SpotifyClient(hedge_ratio=0.0)
+    sent = []
+
+    async def timed_request(tracker, method, url, **kwargs):
+        sent.append(url)
+        await asyncio.sleep(0.01)
+        return url
+
+    client._timed_request = timed_request
+    result = asyncio.run(client._hedged_request(SlowTracker(), Governor(free_tokens), "GET", "/v1/search"))
+    return client.hedge_budget, result, sent
+
+
+def test_refused_hedge_keeps_its_credit():
+    budget, result, sent = hedge(free_tokens=False)
+    assert result == "/v1/search" and len(sent) == 1
+    assert budget.hedges == 0 and budget.denied == 1
+    assert budget.stats()["credit"] == budget.burst
+
+
+def test_sent_hedge_spends_credit():
+    budget, _, sent = hedge(free_tokens=True)
+    assert len(sent) == 2
+    assert budget.hedges == 1 and budget.stats()["credit"] == budget.burst - 1
+
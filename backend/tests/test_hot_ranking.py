@@ -0,0 +1,76 @@
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from app.utils.hot_ranking import HotRanker, python_hot_order  # noqa: E402
+
+
+def build(songs, votes_per_song, seed):
+    rng = random.Random(seed)
+    now = 1_000_000.0
+    song_ids = [f"song-{i}" for i in range(songs)]
+    ranker = HotRanker(capacity=4)
+    for song_id in song_ids:
+        ranker.add(song_id, rng.randint(100000, 300000))
+    latest = {}
+    for _ in range(int(songs * votes_per_song)):
+        song_id = rng.choice(song_ids)
+        user_id = f"user-{rng.randrange(songs)}"
+        count = rng.randint(1, 3)
+        voted_at = now - rng.uniform(0, 7200)
+        ranker.vote(song_id, user_id, count, voted_at)
+        latest[(song_id, user_id)] = (count, voted_at)
+    votes = [(song_id, count, voted_at) for (song_id, _), (count, voted_at) in latest.items()]
+    return ranker, song_ids, votes, now
+
+
+@pytest.mark.parametrize("songs, votes_per_song, seed", [(1, 0, 1), (50, 0.5, 2), (500, 3, 3)])
+def test_matches_python_order(songs, votes_per_song, seed):
+    ranker, song_ids, votes, now = build(songs, votes_per_song, seed)
+    ranker.rank(now)
+    assert ranker.song_ids() == python_hot_order(votes, song_ids, now)
+
+
+def test_matches_python_order_after_removals_and_compaction():
+    ranker, song_ids, votes, now = build(300, 2, 4)
+    removed = set(song_ids[::2])
+    for song_id in removed:
+        ranker.remove(song_id)
+    kept = [song_id for song_id in song_ids if song_id not in removed]
+    ranker.rank(now + 600)
+    assert len(ranker) == len(kept)
+    assert ranker.song_ids() == python_hot_order([vote for vote in votes if vote[0] not in removed], kept, now + 600)
+
+
+def test_recent_votes_outrank_an_older_pile():
+    ranker = HotRanker()
+    for song_id in ("old", "new"):
+        ranker.add(song_id, 1000)
+    for i in range(5):
+        ranker.vote("old", f"user-{i}", 1, 0.0)
+    ranker.vote("new", "user-9", 2, 36000.0)
+    ranker.rank(36000.0)
+    assert ranker.song_ids() == ["new", "old"]
+    assert ranker.position("old") == (1, 1000)
+    assert ranker.offsets_ms() == [0, 1000]
+
+
+def test_live_queue_hot_mode_follows_the_ranker():
+    from app.utils.queue_engine import LiveQueue, QueueEntry
+
+    now = [36000.0]
+    live = LiveQueue("queue", lambda: now[0])
+    for song_id in ("a", "b", "c"):
+        live.add(QueueEntry(song_id, "queue", f"Title {song_id}", "Artist", duration_ms=1000))
+    now[0] = 0.0
+    for i in range(3):
+        live.vote("a", f"user-{i}")
+    now[0] = 36000.0
+    live.vote("c", "user-9")
+    live.set_ranking("hot")
+    assert [entry.song_id for entry in live.top()] == ["c", "a", "b"]
+    assert live.position("b") == (2, 2000)
+    live.set_ranking("votes")
+    assert [entry.song_id for entry in live.top()] == ["a", "c", "b"]
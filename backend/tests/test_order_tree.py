@@ -0,0 +1,83 @@
+import random
+
+import pytest
+
+from app.utils.order_tree import OrderTree
+
+
+def test_items_stay_sorted_through_inserts_and_removes():
+    rng = random.Random(3)
+    tree = OrderTree(seed=1)
+    reference = set()
+    for _ in range(3000):
+        key = rng.randrange(1000)
+        if key in reference and rng.random() < 0.5:
+            assert tree.remove(key) == f"v{key}"
+            reference.discard(key)
+        elif key not in reference:
+            tree.insert(key, f"v{key}")
+            reference.add(key)
+
+    keys = sorted(reference)
+    assert len(tree) == len(keys)
+    assert [key for key, _ in tree.items()] == keys
+    assert list(tree.values(3)) == [f"v{key}" for key in keys[:3]]
+
+
+def test_neighbours_and_missing_keys():
+    tree = OrderTree(seed=2)
+    for key in (10, 20, 30):
+        tree.insert(key, str(key))
+    assert tree.first() == (10, "10")
+    assert tree.last() == (30, "30")
+    assert tree.before(20) == (10, "10")
+    assert tree.after(20) == (30, "30")
+    assert tree.before(10) is None
+    assert tree.after(30) is None
+    with pytest.raises(KeyError):
+        tree.insert(20, "again")
+    with pytest.raises(KeyError):
+        tree.remove(25)
+    assert tree.pop_first() == (10, "10")
+    assert tree.first() == (20, "20")
+
+
+def test_rekey_keeps_order():
+    tree = OrderTree(seed=3)
+    for i in range(50):
+        tree.insert(i, i)
+    tree.rekey(lambda value: value * 10)
+    assert [key for key, _ in tree.items()] == [i * 10 for i in range(50)]
+    assert tree.after(250) == (260, 26)
+
+
+def test_rank_counts_keys_and_weights_below():
+    rng = random.Random(4)
+    tree = OrderTree(seed=4)
+    reference = {}
+    for _ in range(3000):
+        key = rng.randrange(1000)
+        if key in reference and rng.random() < 0.5:
+            tree.remove(key)
+            del reference[key]
+        elif key not in reference:
+            reference[key] = rng.randint(1, 500)
+            tree.insert(key, key, reference[key])
+
+    keys = sorted(reference)
+    assert tree.total_weight == sum(reference.values())
+    below = 0
+    for i, key in enumerate(keys):
+        assert tree.rank(key) == (i, below)
+        below += reference[key]
+    with pytest.raises(KeyError):
+        tree.rank(1000)
+
+
+def test_weights_survive_rekeying():
+    tree = OrderTree(seed=5)
+    for i in range(50):
+        tree.insert(i, i, 2)
+    tree.rekey(lambda value: value * 10)
+    assert tree.rank(250) == (25, 50)
+    assert tree.total_weight == 100
@@ -0,0 +1,39 @@
+import heapq
+import random
+
+from app.utils import query_log
+from app.utils.query_log import SpaceSaving
+
+
+def brute_top(log, prefix, limit):
+    matches = sorted(query for query in log._counts if query.startswith(prefix))
+    return heapq.nlargest(limit, matches, key=lambda query: log._counts[query][0])
+
+
+def test_short_prefixes_match_a_full_scan():
+    rng = random.Random(7)
+    log = SpaceSaving(capacity=1000, half_life=3600, clock=lambda: 0.0)
+    words = [f"{rng.choice('abc')}{rng.randrange(3000)}" for _ in range(3000)]
+    for _ in range(5):
+        for _ in range(2000):
+            log.record(rng.choice(words[:rng.randrange(1, len(words))]), now=0.0)
+        for prefix in ("", "a", "b", "c"):
+            assert [query for query, _ in log.top(prefix, 10, now=0.0)] == brute_top(log, prefix, 10)
+
+
+def test_wide_prefixes_reuse_the_head_until_many_queries_change():
+    log = SpaceSaving(capacity=1000, half_life=3600, clock=lambda: 0.0)
+    for i in range(600):
+        for _ in range(i % 7 + 1):
+            log.record(f"q{i}", now=0.0)
+    log.top("", 5, now=0.0)
+    head = log._head
+
+    for _ in range(10):
+        log.record("q1", now=0.0)
+    assert [query for query, _ in log.top("q", 5, now=0.0)] == brute_top(log, "q", 5)
+    assert log._head is head
+
+    for i in range(query_log.HEAD_SIZE + 1):
+        log.record(f"new{i}", now=0.0)
+    assert log._head is None
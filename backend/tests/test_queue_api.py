@@ -0,0 +1,91 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import app.utils.queue_engine as queue_engine
+from app.apis.queue import router
+from app.utils.queue_engine import QueueEngine
+
+QUEUE_ID = "00000000-0000-0000-0000-00000000000a"
+USER_ID = "00000000-0000-0000-0000-00000000000b"
+ROWS = [
+    {"id": "a", "title": "A", "artist": "X", "added_by": USER_ID, "duration": 1000, "rank_key": "V", "votes": []},
+    {"id": "b", "title": "B", "artist": "X", "added_by": USER_ID, "duration": 2000, "rank_key": "W", "votes": []},
+]
+
+
+class Store:
+    """Serves ROWS after `failures` failed loads; USER_ID is the only profile"""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+
+    def profile_exists(self, profile_id):
+        return profile_id == USER_ID
+
+    def load_queue(self, queue_id):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("store unavailable")
+        return ROWS
+
+    def load_settings(self, queue_id):
+        return {}
+
+    def set_vote(self, song_id, user_id, vote_count):
+        pass
+
+
+@pytest.fixture
+def client(monkeypatch):
+    def make(store):
+        engine = QueueEngine(store=store)
+        monkeypatch.setattr(queue_engine, "_engine", engine)
+        engines.append(engine)
+        app = FastAPI()
+        app.include_router(router)
+        return TestClient(app)
+
+    engines = []
+    yield make
+    for engine in engines:
+        engine.persister.close()
+
+
+def test_queue_lists_songs_in_play_order(client):
+    response = client(Store()).get(f"/queue/{QUEUE_ID}")
+    assert response.status_code == 200
+    body = response.json()
+    assert [song["id"] for song in body["songs"]] == ["a", "b"]
+    assert [song["wait_ms"] for song in body["songs"]] == [0, 1000]
+    assert body["total_duration_ms"] == 3000
+
+
+def test_unavailable_store_answers_503_then_recovers(client):
+    api = client(Store(failures=1))
+    response = api.get(f"/queue/{QUEUE_ID}")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert api.get(f"/queue/{QUEUE_ID}").status_code == 200
+
+
+def test_vote_reorders_the_queue(client):
+    api = client(Store())
+    response = api.post(f"/queue/{QUEUE_ID}/songs/b/vote", json={"user_id": USER_ID})
+    assert response.status_code == 200
+    assert response.json()["position"] == 0
+    assert response.json()["total_votes"] == 1
+    assert api.post(f"/queue/{QUEUE_ID}/songs/missing/vote", json={"user_id": USER_ID}).status_code == 404
+
+
+@pytest.mark.parametrize("vote_count", [-1, 2, 1000000])
+def test_vote_count_is_limited(client, vote_count):
+    response = client(Store()).post(f"/queue/{QUEUE_ID}/songs/a/vote", json={"user_id": USER_ID, "vote_count": vote_count})
+    assert response.status_code == 422
+
+
+def test_votes_need_a_known_profile(client):
+    api = client(Store())
+    assert api.post(f"/queue/{QUEUE_ID}/songs/a/vote", json={"user_id": "anyone"}).status_code == 400
+    assert api.post(f"/queue/{QUEUE_ID}/songs/a/vote", json={"user_id": "00000000-0000-0000-0000-0000000000ff"}).status_code == 404
+    assert api.get(f"/queue/{QUEUE_ID}").json()["songs"][0]["total_votes"] == 0
@@ -0,0 +1,193 @@
+import pytest
+
+from app.utils.queue_engine import LiveQueue, QueueEngine, QueueEntry, QueueLoadError
+
+
+def entry(song_id, title=None, artist="Artist", **fields):
+    return QueueEntry(song_id, "queue", title or f"Title {song_id}", artist, **fields)
+
+
+def test_votes_order_the_queue_and_ties_keep_insertion_order():
+    live = LiveQueue("queue")
+    for song_id in ("a", "b", "c"):
+        live.add(entry(song_id))
+    assert [queued.song_id for queued in live.top()] == ["a", "b", "c"]
+
+    live.vote("c", "user-1", 2)
+    live.vote("b", "user-2")
+    assert [queued.song_id for queued in live.top()] == ["c", "b", "a"]
+
+    # A user's vote is replaced, not added to; 0 withdraws it
+    live.vote("c", "user-1", 0)
+    assert live.get("c").total_votes == 0
+    assert [queued.song_id for queued in live.top()] == ["b", "a", "c"]
+
+
+def test_pop_next_and_remove():
+    live = LiveQueue("queue")
+    for song_id in ("a", "b", "c"):
+        live.add(entry(song_id))
+    live.vote("b", "user-1")
+    assert live.pop_next().song_id == "b"
+    assert live.playing.song_id == "b"
+    assert live.remove("c").song_id == "c"
+    with pytest.raises(KeyError):
+        live.remove("c")
+    assert [queued.song_id for queued in live.top()] == ["a"]
+    assert live.pop_next().song_id == "a"
+    assert live.pop_next() is None
+
+
+def test_other_releases_of_a_queued_recording_are_found():
+    live = LiveQueue("queue")
+    live.add(entry("a", "Help!", "The Beatles"))
+    assert live.find_recording(entry("b", "Help! - Remastered 2009", "The Beatles").canonical_key).song_id == "a"
+    assert live.find_recording(entry("c", "Help! - Live", "The Beatles").canonical_key) is None
+    live.remove("a")
+    assert live.find_recording(entry("d", "Help!", "The Beatles").canonical_key) is None
+
+    live.add(entry("e"))
+    with pytest.raises(ValueError):
+        live.add(entry("e"))
+
+
+class RecordingStore:
+    """An in-memory store: load_queue fails `failures` times, writes are recorded"""
+
+    def __init__(self, rows=(), failures=0):
+        self.rows = list(rows)
+        self.failures = failures
+        self.writes = []
+
+    def load_queue(self, queue_id):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("store unavailable")
+        return self.rows
+
+    def load_settings(self, queue_id):
+        return {}
+
+    def insert_song(self, song):
+        self.writes.append(("insert", song["id"]))
+
+    def set_vote(self, song_id, user_id, vote_count):
+        self.writes.append(("vote", song_id, user_id, vote_count))
+
+    def delete_song(self, song_id):
+        self.writes.append(("delete", song_id))
+
+    def mark_played(self, song_id, played_at):
+        self.writes.append(("played", song_id))
+
+    def set_ranks(self, ranks):
+        self.writes.append(("ranks", len(ranks)))
+
+
+@pytest.fixture
+def engine_with():
+    engines = []
+
+    def make(store):
+        engine = QueueEngine(store=store)
+        engines.append(engine)
+        return engine
+
+    yield make
+    for engine in engines:
+        engine.persister.close()
+
+
+def test_loads_songs_and_votes(engine_with):
+    rows = [
+        {"id": "a", "title": "A", "artist": "X", "added_by": "alice", "duration": 1000, "rank_key": "V", "votes": []},
+        {"id": "b", "title": "B", "artist": "X", "added_by": "bob", "duration": 1000, "rank_key": "W",
+         "votes": [{"profile_id": "carol", "vote_count": 1, "created_at": None}]},
+    ]
+    live = engine_with(RecordingStore(rows)).queue("queue")
+    assert [queued.song_id for queued in live.top()] == ["b", "a"]
+    assert live.get("b").votes == {"carol": 1}
+    assert live.get("a").added_by == "alice"
+
+
+def test_changes_are_written_behind_in_order(engine_with):
+    store = RecordingStore()
+    engine = engine_with(store)
+    engine.queue("queue")
+    engine.add(entry("a"))
+    engine.vote("queue", "a", "user-1", 2)
+    engine.add(entry("b"))
+    engine.remove("queue", "b")
+    engine.pop_next("queue")
+    assert engine.persister.flush()
+    assert store.writes == [("insert", "a"), ("vote", "a", "user-1", 2), ("insert", "b"), ("delete", "b"), ("played", "a")]
+
+
+def test_failed_load_is_not_cached(engine_with):
+    engine = engine_with(RecordingStore([{"id": "a", "title": "A", "artist": "X", "duration": 1000, "votes": []}], failures=1))
+    with pytest.raises(QueueLoadError) as raised:
+        engine.queue("queue")
+    assert raised.value.to_http_exception().status_code == 503
+    assert engine.load_errors == 1
+
+    live = engine.queue("queue")
+    assert [queued.song_id for queued in live.top()] == ["a"]
+    assert engine.queue("queue") is live
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_position_counts_songs_and_time_ahead():
+    clock = Clock()
+    live = LiveQueue("queue", clock)
+    for song_id, duration_ms in (("a", 1000), ("b", 2000), ("c", 3000)):
+        live.add(entry(song_id, duration_ms=duration_ms))
+    assert live.total_duration_ms() == 6000
+    assert live.position("c") == (2, 3000)
+
+    live.vote("c", "user-1")
+    assert live.position("c") == (0, 0)
+    assert live.position("b") == (2, 4000)
+
+    # The rest of the playing song comes first
+    live.pop_next()
+    clock.now += 1
+    assert live.remaining_ms() == 2000
+    assert live.position("b") == (1, 3000)
+    assert [(queued.song_id, position, wait_ms) for queued, position, wait_ms in live.schedule()] == [("a", 0, 2000), ("b", 1, 3000)]
+    assert live.total_duration_ms() == 3000
+    with pytest.raises(KeyError):
+        live.position("c")
+
+
+def test_idle_queues_are_evicted_after_their_writes():
+    clock = Clock()
+    store = RecordingStore()
+    engine = QueueEngine(store=store, clock=clock, idle_ttl=60, max_queues=2)
+    try:
+        old = engine.queue("old")
+        engine.add(QueueEntry("a", "old", "A", "X"))
+        clock.now += 120
+        engine.queue("busy")
+        assert engine.persister.flush()
+        assert store.writes == [("insert", "a")]
+        assert engine.stats()["queues"] == 1
+        assert engine.queue("old") is not old
+
+        # Beyond max_queues the least recently used one goes, unless it is used again first
+        engine.queue("busy")
+        clock.now += 1
+        engine.queue("old")
+        clock.now += 1
+        engine.queue("third")
+        assert engine.persister.flush()
+        assert sorted(engine._queues) == ["old", "third"]
+        assert engine.evictions == 2
+    finally:
+        engine.persister.close()
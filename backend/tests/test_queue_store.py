@@ -0,0 +1,52 @@
+import pytest
+
+import app.utils.queue_store as queue_store
+from app.utils.queue_store import SupabaseQueueStore
+
+
+class Response:
+    def __init__(self, status_code=200, body=None, text=""):
+        self.status_code = status_code
+        self._body = body if body is not None else []
+        self.text = text
+
+    def json(self):
+        return self._body
+
+
+@pytest.fixture
+def store(monkeypatch):
+    """A store whose PostgREST calls are recorded; songs.rank_key exists"""
+    calls = []
+
+    def get(url, params=None, **kwargs):
+        calls.append(("get", url, params))
+        return Response()
+
+    def post(url, json=None, **kwargs):
+        calls.append(("sql", json["sql"]))
+        return Response()
+
+    monkeypatch.setattr(queue_store.requests, "get", get)
+    monkeypatch.setattr(queue_store.requests, "post", post)
+    store = SupabaseQueueStore()
+    store._connection = lambda: ("https://db.example", {})
+    store.calls = calls
+    return store
+
+
+def test_insert_writes_the_song_row(store):
+    store.insert_song({
+        "id": "song-1", "queue_id": "queue-1", "title": "Don't Stop", "artist": "Fleetwood Mac",
+        "duration_ms": 193000, "added_by": "user-1", "rank_key": "V", "track_uri": "spotify:track:abc"
+    })
+    sql = store.calls[-1][1]
+    assert "'Don''t Stop'" in sql
+    assert "added_by" in sql and "'user-1'" in sql
+    assert "track_uri" in sql and "'spotify:track:abc'" in sql
+    assert "'V'" in sql
+
+
+def test_load_selects_the_track_uri(store):
+    store.load_queue("queue-1")
+    assert "track_uri" in store.calls[-1][2]["select"]
@@ -0,0 +1,84 @@
+import random
+
+import pytest
+
+from app.utils.queue_engine import LiveQueue, QueueEntry
+from app.utils.rank_keys import key_after, key_between, spread_keys, validate_key
+
+
+def test_key_between_sorts_between_bounds():
+    rng = random.Random(5)
+    keys = [key_between(None, None)]
+    for _ in range(2000):
+        i = rng.randrange(len(keys) + 1)
+        lower = keys[i - 1] if i > 0 else None
+        upper = keys[i] if i < len(keys) else None
+        key = key_between(lower, upper)
+        validate_key(key)
+        assert (lower is None or lower < key) and (upper is None or key < upper)
+        keys.insert(i, key)
+    assert keys == sorted(keys)
+
+
+def test_key_between_rejects_bad_bounds():
+    with pytest.raises(ValueError):
+        key_between("b", "a")
+    with pytest.raises(ValueError):
+        key_between("a", "a")
+    with pytest.raises(ValueError):
+        key_between("a0", None)
+
+
+def test_key_after_keeps_width():
+    key = spread_keys(1)[0]
+    following = key_after(key, 3)
+    assert key < following
+    assert len(following) <= 3
+    assert key_after("zzz") > "zzz"
+
+
+def test_spread_keys_are_ascending_and_valid():
+    for count in (1, 2, 61, 62, 1000):
+        keys = spread_keys(count)
+        assert len(keys) == count
+        assert keys == sorted(set(keys))
+        for key in keys:
+            validate_key(key)
+
+
+def test_rebalance_keeps_order_and_shortens_keys():
+    live = LiveQueue("queue")
+    for i in range(20):
+        live.add(QueueEntry(f"s{i}", "queue", f"Title {i}", "Artist"))
+    # Keep squeezing songs into the same gap until keys grow long
+    anchor = "s0"
+    moved = 1
+    while not live.needs_rebalance:
+        song_id = f"s{moved % 19 + 1}"
+        live.move(song_id, before=anchor)
+        anchor = song_id
+        moved += 1
+    order = [entry.song_id for entry in live.top()]
+
+    ranks = live.rebalance()
+    assert [entry.song_id for entry in live.top()] == order
+    assert not live.needs_rebalance
+    assert set(ranks) == set(order)
+    assert [ranks[song_id] for song_id in order] == sorted(ranks.values())
+    assert max(len(key) for key in ranks.values()) <= live.key_width
+
+
+def test_move_places_a_song_among_equal_votes():
+    live = LiveQueue("queue")
+    for song_id in ("a", "b", "c", "d"):
+        live.add(QueueEntry(song_id, "queue", f"Title {song_id}", "Artist"))
+    live.move("d", before="a")
+    live.move("a", after="b")
+    assert [entry.song_id for entry in live.top()] == ["d", "b", "a", "c"]
+    # Votes still come first
+    live.vote("c", "user-1")
+    assert [entry.song_id for entry in live.top()] == ["c", "d", "b", "a"]
+    with pytest.raises(ValueError):
+        live.move("a", before="a")
+    with pytest.raises(KeyError):
+        live.move("a", before="missing")
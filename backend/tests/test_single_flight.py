@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from app.utils.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_result():
+    async def scenario():
+        flight = SingleFlight()
+        calls = []
+
+        async def work(value):
+            calls.append(value)
+            await asyncio.sleep(0.01)
+            return value
+
+        results = await asyncio.gather(*(flight.do("key", work, i) for i in range(5)))
+        return results, calls, flight.stats()
+
+    results, calls, stats = asyncio.run(scenario())
+    assert results == [0] * 5
+    assert calls == [0]
+    assert stats == {"in_flight": 0, "leaders": 1, "coalesced": 4, "abandoned": 0}
+
+
+def test_cancelling_one_waiter_keeps_the_call_for_the_others():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        first = asyncio.ensure_future(flight.do("key", work))
+        second = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0.005)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second, flight.abandoned
+
+    assert asyncio.run(scenario()) == ("done", 0)
+
+
+def test_cancelling_the_last_waiter_cancels_the_call_and_the_next_caller_starts_fresh():
+    async def scenario():
+        flight = SingleFlight()
+        started = []
+        cancelled = []
+
+        async def work(value):
+            started.append(value)
+            try:
+                await asyncio.sleep(0.02)
+            except asyncio.CancelledError:
+                cancelled.append(value)
+                raise
+            return value
+
+        first = asyncio.ensure_future(flight.do("key", work, 1))
+        await asyncio.sleep(0.005)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        # Arrives before the cancelled call has finished unwinding
+        result = await flight.do("key", work, 2)
+        return result, started, cancelled, flight.stats()
+
+    result, started, cancelled, stats = asyncio.run(scenario())
+    assert result == 2
+    assert started == [1, 2]
+    assert cancelled == [1]
+    assert stats["abandoned"] == 1
+    assert stats["in_flight"] == 0
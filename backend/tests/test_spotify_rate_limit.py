@@ -0,0 +1,27 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import app.apis.spotify_search as spotify_search
+from app.apis.spotify_search import router
+from app.utils.spotify_rate_limit import SpotifyRateLimitError
+
+
+class ThrottledPool:
+    size = 1
+
+    async def run(self, call, key=None):
+        raise SpotifyRateLimitError(2.5)
+
+
+def test_throttled_search_returns_429_with_retry_after(monkeypatch):
+    monkeypatch.setattr(spotify_search, "get_credential_pool", ThrottledPool)
+    spotify_search.search_cache.clear()
+    app = FastAPI()
+    app.include_router(router)
+
+    response = TestClient(app).get("/spotify/search", params={"query": "throttled"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "3"
+
+    # Rate limiting is transient, so the failure isn't cached
+    assert spotify_search.search_cache.get(("throttled", 10, 0)) == (None, None)
@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+import app.apis.spotify_search as spotify_search
+from app.apis.spotify_search import SpotifyTrack
+
+
+class Catalog:
+    def search(self, query, limit):
+        return [{"id": f"local-{i}", "name": f"Song {i}"} for i in range(limit)]
+
+
+@pytest.fixture
+def search(monkeypatch):
+    upstream = []
+
+    async def fetch(query, limit, offset, queue_id):
+        upstream.append(query)
+        return [SpotifyTrack(id=f"spotify-{i}", name=f"Song {i}", uri="", artists=["A"], album="", album_art="", duration_ms=1)
+                for i in range(limit)]
+
+    monkeypatch.setattr(spotify_search, "fetch_spotify_track_pages", fetch)
+    monkeypatch.setattr(spotify_search, "get_track_catalog", Catalog)
+    monkeypatch.setattr(spotify_search, "_upstream_answered", type(spotify_search._upstream_answered)())
+
+    def run(query):
+        tracks = asyncio.run(spotify_search._search_and_cache(query, 2, 0, ("test", query)))
+        return {track.source for track in tracks}
+
+    run.upstream = upstream
+    return run
+
+
+def test_catalog_first_is_off_by_default(search):
+    assert spotify_search.CATALOG_FIRST is False
+    assert search("song") == {"spotify"}
+    assert search("song") == {"spotify"}
+    assert search.upstream == ["song", "song"]
+
+
+def test_catalog_only_answers_queries_spotify_answered_recently(search, monkeypatch):
+    monkeypatch.setattr(spotify_search, "CATALOG_FIRST", True)
+    assert search("song") == {"spotify"}
+    assert search("Song ") == {"catalog"}
+    assert search("other") == {"spotify"}
+
+    monkeypatch.setattr(spotify_search, "CATALOG_MAX_AGE", 0)
+    assert search("song") == {"spotify"}
+    assert search.upstream == ["song", "other", "song"]
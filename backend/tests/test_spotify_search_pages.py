@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+import app.apis.spotify_search as spotify_search
+from app.apis.spotify_search import SPOTIFY_PAGE_SIZE, SpotifyTrack
+
+
+def ranking(total):
+    """Spotify's ranking where every recording is listed twice in a row (album and single)"""
+    tracks = []
+    for i in range(total // 2):
+        for release in ("album", "single"):
+            tracks.append(SpotifyTrack(
+                id=f"{release}-{i}", name=f"Song {i}", uri="", artists=["Artist"],
+                album=release, album_art="", duration_ms=1, isrc=f"ISRC{i:08d}"
+            ))
+    return tracks
+
+
+@pytest.fixture
+def spotify(monkeypatch):
+    upstream = ranking(300)
+    requested = []
+
+    async def fetch(query, limit, queue_id=None, offset=0):
+        requested.append(offset)
+        return upstream[offset:offset + limit]
+
+    monkeypatch.setattr(spotify_search, "fetch_spotify_tracks", fetch)
+    spotify_search.search_cache.clear()
+    yield requested
+    spotify_search.search_cache.clear()
+
+
+def pages(query, limit, offset=0):
+    return asyncio.run(spotify_search.fetch_spotify_track_pages(query, limit, offset))
+
+
+def test_limit_counts_recordings_after_collapsing(spotify):
+    tracks = pages("song", 120)
+    assert len(tracks) == 120
+    assert [track.name for track in tracks[:2]] == ["Song 0", "Song 1"]
+    assert tracks[0].aliases == ["single-0"]
+
+
+def test_offsets_page_through_recordings_without_gaps_or_repeats(spotify):
+    names = [track.name for offset in range(0, 60, 10) for track in pages("song", 10, offset)]
+    assert names == [f"Song {i}" for i in range(60)]
+
+
+def test_later_pages_reuse_cached_spotify_pages(spotify):
+    pages("song", 10)
+    pages("song", 10, 10)
+    assert spotify == [0]
+    pages("song", 10, 50)
+    assert spotify == [0, SPOTIFY_PAGE_SIZE, 2 * SPOTIFY_PAGE_SIZE]
+
+
+def test_stops_when_spotify_runs_out(spotify):
+    assert len(pages("song", 50, 140)) == 10
+    assert len(pages("song", 10, 150)) == 0
@@ -0,0 +1,56 @@
+import asyncio
+
+from app.utils.typeahead import TypeaheadSessions
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+async def idle():
+    await asyncio.sleep(0)
+
+
+def test_next_seq_counts_per_session():
+    async def scenario():
+        sessions = TypeaheadSessions()
+        for session_id in ("a", "a", "b", "a"):
+            seq = sessions.next_seq(session_id)
+            task = asyncio.ensure_future(idle())
+            sessions.begin(session_id, seq, task)
+            await task
+            sessions.finish(session_id, task)
+        return sessions.next_seq("a"), sessions.next_seq("b"), sessions.next_seq("c")
+
+    assert run(scenario()) == (4, 2, 1)
+
+
+def test_older_query_is_superseded():
+    async def scenario():
+        sessions = TypeaheadSessions()
+        first = asyncio.ensure_future(asyncio.sleep(10))
+        sessions.begin("a", 5, first)
+        second = asyncio.ensure_future(idle())
+        sessions.begin("a", 6, second)
+        await second
+        await asyncio.sleep(0)
+        return first.cancelled(), sessions.is_superseded("a", 4), sessions.is_superseded("b", 1)
+
+    assert run(scenario()) == (True, True, False)
+
+
+def test_seq_far_below_latest_resets_session():
+    async def scenario():
+        sessions = TypeaheadSessions(reset_gap=10)
+        task = asyncio.ensure_future(idle())
+        sessions.begin("a", 50, task)
+        await task
+        sessions.finish("a", task)
+        if sessions.is_superseded("a", 1):
+            return None
+        restarted = asyncio.ensure_future(idle())
+        sessions.begin("a", 1, restarted)
+        await restarted
+        return sessions.is_superseded("a", 2), sessions.stats()["resets"]
+
+    assert run(scenario()) == (False, 1)
@@ -103,6 +103,7 @@ export interface Database {
           played: boolean
           played_at: string | null
           position: number | null
+          rank_key: string | null
         }
         Insert: {
           id?: string
@@ -117,6 +118,7 @@ export interface Database {
           cover_url?: string | null
           played?: boolean
           played_at?: string | null
+          rank_key?: string | null
         }
         Update: {
           id?: string
@@ -131,6 +133,7 @@ export interface Database {
           cover_url?: string | null
           played?: boolean
           played_at?: string | null
+          rank_key?: string | null
         }
         Relationships: [
           {
@@ -38,9 +38,12 @@ CREATE TABLE IF NOT EXISTS public.songs (
   cover_url TEXT,
   played BOOLEAN DEFAULT FALSE,
   played_at TIMESTAMP WITH TIME ZONE,
-  position INTEGER
+  position INTEGER,
+  rank_key TEXT COLLATE "C"
 );
 
+CREATE INDEX IF NOT EXISTS songs_queue_rank_key_idx ON public.songs (queue_id, rank_key) WHERE NOT played;
+
 -- Create votes table
 CREATE TABLE IF NOT EXISTS public.votes (
   id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
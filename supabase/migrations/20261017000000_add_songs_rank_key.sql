@@ -0,0 +1,8 @@
+-- Fractional rank keys for ordering songs with equal votes.
+-- Keys are base-62 strings compared byte-wise, so the column uses the "C"
+-- collation; moving a song rewrites only its own key.
+ALTER TABLE public.songs ADD COLUMN IF NOT EXISTS rank_key TEXT COLLATE "C";
+
+CREATE INDEX IF NOT EXISTS songs_queue_rank_key_idx
+  ON public.songs (queue_id, rank_key)
+  WHERE NOT played;